@@ -1,10 +1,18 @@
 import os
+import time
+
 from flask import Flask
 from config import DevConfig, ProdConfig
 
 
 def create_app() -> Flask:
-    """Application factory."""
+    """Application factory.
+
+    Cheap by design: torch, ultralytics and OpenCV are only imported when a
+    model or image is first needed (see ``app.services.lazy_imports``), unless
+    PRELOAD_MODEL loads the model here.
+    """
+    started = time.perf_counter()
     app = Flask(__name__, template_folder="../templates", static_folder="../static")
 
     # Choose config class based on ENV
@@ -25,6 +33,11 @@ def create_app() -> Flask:
     app.register_blueprint(web_bp)
     app.register_blueprint(api_bp)
 
+    if app.config.get("METRICS_ENABLED"):
+        from app.routes.metrics import metrics_bp
+
+        app.register_blueprint(metrics_bp)
+
     # Inject common template vars
     from datetime import datetime
 
@@ -32,6 +45,18 @@ def create_app() -> Flask:
     def inject_globals():
         return {"current_year": datetime.now().year}
 
+    # Load and warm the model now rather than on the first request. Under gunicorn
+    # with preload_app this runs once in the master and workers share the weights.
+    if app.config.get("PRELOAD_MODEL"):
+        from app.services.model_service import preload_model
+
+        with app.app_context():
+            preload_model()
+
+    from app.services.lazy_imports import mark_app_created
+
+    mark_app_created(time.perf_counter() - started)
+    print(f"[OK] App created in {time.perf_counter() - started:.2f}s")
     return app
 
 
@@ -1,44 +1,258 @@
-from flask import Blueprint, jsonify, request
+import json
+import os
+import re
+import time
+import uuid
+import zipfile
+from pathlib import Path
+from typing import Any, List, Optional, Tuple
 
-from app.services.model_service import load_model, decode_base64_image
-from app.services.model_service import get_last_model_error
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context, url_for
+from werkzeug.utils import secure_filename
+
+from app.services import batch_inference, metrics, video_pipeline
+from app.services.admission import AdmissionController, get_admission_controller, retry_after_seconds
+from app.services.jobs import get_job, jobs_enabled, submit_image_job, wait_for_job
+from app.services.lazy_imports import import_report
+from app.services.model_registry import UnknownModelError, get_registry
+from app.services.model_service import (
+    boxes_to_arrays,
+    decode_base64_payload,
+    decode_frame,
+    detections_from_arrays,
+    encode_jpeg_base64,
+    get_concurrency_info,
+    get_last_model_error,
+    get_model_info,
+    get_warmup_state,
+    load_model,
+    predict_many,
+    predict_one,
+    predict_tiled_arrays,
+    render_detections,
+    scale_boxes,
+)
+from app.services.motion import new_gate
+from app.services.resolution import AdaptiveResolution, auto_imgsz, fixed_input_size, get_choices, parse_imgsz, resolve_imgsz
+from app.services.response_format import compact_detections, make_payload_response, normalize_format, wants_msgpack
+from app.services.tracking import get_session_store, process_stream_frame
+from app.services.upload_store import get_upload_store
 
 api_bp = Blueprint("api", __name__, url_prefix="/api")
 
+# Request bodies accepted as a raw encoded frame instead of a JSON data URL
+BINARY_FRAME_MIMETYPES = ("image/jpeg", "image/png", "image/webp", "application/octet-stream")
+
+# Accepted uploads for /api/jobs (same rules as the web upload form)
+UPLOAD_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+UPLOAD_MIMETYPES = ("image/jpeg", "image/png", "image/webp")
+
+# Client-chosen stream session ids for /api/live_detect
+SESSION_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def _flag(value: Any, default: bool = False) -> bool:
+    """Interpret a JSON bool or query-string value such as "1"/"true"/"yes"."""
+    if value is None:
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("1", "true", "yes", "on")
+
+
+def _log(message: str) -> None:
+    """Per-frame progress lines, printed only with VERBOSE_REQUEST_LOGS (stdout is not free at 30 fps)."""
+    if current_app.config.get("VERBOSE_REQUEST_LOGS", False):
+        print(message)
+
+
+def _load_requested_model(route: str, spec: Any) -> Tuple[Optional[Any], Optional[Tuple[Response, int]]]:
+    """``(model, None)`` for the requested ``name[@version]`` (default if empty), or ``(None, error response)``."""
+    try:
+        model = load_model(str(spec).strip() if spec else None)
+    except UnknownModelError as e:
+        metrics.ERRORS_TOTAL.inc(route, "unknown_model")
+        return None, (jsonify({"success": False, "error": str(e)}), 404)
+    if model is None:
+        print(f"[ERROR] {route}: Model not loaded.")
+        metrics.ERRORS_TOTAL.inc(route, "model_unavailable")
+        return None, (jsonify({"success": False, "error": "Model not loaded"}), 503)
+    return model, None
+
+
+def _detect_full_frame(model: Any, img: Any, conf_threshold: float, imgsz: int) -> Tuple[Any, Any, Any, Any]:
+    """Return ``(xyxy, scores, class_ids, names)`` for one frame."""
+    metrics.IMGSZ_TOTAL.inc(imgsz)
+    with metrics.timed("forward"):
+        result = predict_one(model, img, imgsz=imgsz, conf=conf_threshold)
+
+    with metrics.timed("box_extract"):
+        xyxy, scores, classes = boxes_to_arrays(result)
+    _log(f"[INFO] Found {len(scores)} boxes in detection results")
+    return xyxy, scores, classes, getattr(result, "names", None)
+
 
 @api_bp.route("/live_detect", methods=["POST"])
 def live_detect():
-    print("[INFO] Live detect: Received API request.")
-    if not request.is_json:
-        print("[ERROR] Live detect: Request not JSON.")
-        return jsonify({"success": False, "error": "Request must be JSON"}), 400
-
-    data = request.get_json(silent=True) or {}
-    image_b64 = data.get("image")
-    if not image_b64:
-        print("[ERROR] Live detect: Missing image field.")
-        return jsonify({"success": False, "error": "Missing image field"}), 400
-
-    model = load_model()
-    if model is None:
-        print("[ERROR] Live detect: Model not loaded.")
-        return jsonify({"success": False, "error": "Model not loaded"}), 503
+    """Detect objects in one frame.
+
+    Accepts either JSON ``{"image": "data:image/...;base64,..."}`` or the encoded
+    frame itself as the request body (``Content-Type: image/jpeg``), with options
+    in the query string. Responses carry detections only unless ``return_image``
+    is set (JSON requests default to ``LIVE_DETECT_RETURN_IMAGE``). ``format``
+    selects ``full`` detection dicts or the ``compact``/``packed`` columnar forms;
+    ``Accept: application/msgpack`` switches the encoding to MessagePack.
+    ``model`` picks a registry model (``name`` or ``name@version``), and
+    ``imgsz`` the input size (one of INFERENCE_IMGSZ_CHOICES or ``auto``, see
+    ``resolution``).
+
+    With a ``session`` id the request is one frame of a stream: the detector only
+    runs on keyframes and boxes carry a stable ``track_id`` (see ``tracking``).
+    With STREAM_LATENCY_BUDGET_MS set, the stream's input size also follows its
+    keyframe latency, and with ``motion`` (default STREAM_MOTION_GATING) keyframes
+    only run the detector on what changed since the last detections (see ``motion``).
+    """
+    _log("[INFO] Live detect: Received API request.")
+    binary = request.mimetype in BINARY_FRAME_MIMETYPES
+    frame_bytes, image_b64 = None, None
+    with metrics.timed("request_parse"):
+        if binary:
+            data = request.args
+            frame_bytes = request.get_data(cache=False)
+        elif request.is_json:
+            data = request.get_json(silent=True) or {}
+            image_b64 = data.get("image")
+    if binary:
+        if not frame_bytes:
+            print("[ERROR] Live detect: Empty image body.")
+            metrics.ERRORS_TOTAL.inc("live_detect", "bad_request")
+            return jsonify({"success": False, "error": "Empty image body"}), 400
+    elif request.is_json:
+        if not image_b64:
+            print("[ERROR] Live detect: Missing image field.")
+            metrics.ERRORS_TOTAL.inc("live_detect", "bad_request")
+            return jsonify({"success": False, "error": "Missing image field"}), 400
+    else:
+        print("[ERROR] Live detect: Unsupported content type.")
+        metrics.ERRORS_TOTAL.inc("live_detect", "bad_request")
+        return jsonify({"success": False, "error": "Request must be JSON or an image/jpeg body"}), 400
+
+    response_format = normalize_format(data.get("format"), current_app.config.get("LIVE_DETECT_RESPONSE_FORMAT", "full"))
+    if response_format is None:
+        metrics.ERRORS_TOTAL.inc("live_detect", "bad_request")
+        return jsonify({"success": False, "error": "format must be full, compact or packed"}), 400
+    use_msgpack = wants_msgpack(request)
+    session_id = data.get("session")
+    session_id = str(session_id) if session_id is not None else None
+    if session_id is not None and not SESSION_ID_RE.match(session_id):
+        metrics.ERRORS_TOTAL.inc("live_detect", "bad_request")
+        return jsonify({"success": False, "error": "session must be 1-64 letters, digits, '-' or '_'"}), 400
+
+    # Slots are per model, so the model is resolved (not loaded) first
+    try:
+        model_key = get_registry().resolve(data.get("model"))
+    except UnknownModelError as e:
+        metrics.ERRORS_TOTAL.inc("live_detect", "unknown_model")
+        return jsonify({"success": False, "error": str(e)}), 404
+
+    # Admission happens before decode so a rejected frame costs next to nothing
+    admission = get_admission_controller(model_key)
+    ticket = admission.admit(session_id) if admission is not None else None
+    if ticket is not None and not ticket.admitted:
+        return _busy_response(admission, ticket.reason)
+    try:
+        return _detect_frame(data, frame_bytes, image_b64, response_format, use_msgpack, session_id, admission)
+    finally:
+        if ticket is not None:
+            admission.release(ticket)
+
 
-    print("[INFO] Live detect: Model loaded, decoding image...")
-    img = decode_base64_image(image_b64)
+def _stream_imgsz(session: Any, model: Any, requested: Any, imgsz: int) -> int:
+    """Input size for a stream frame: STREAM_IMGSZ unless the client chose, adapted to the latency budget.
+
+    Called with ``session.lock`` held.
+    """
+    config = current_app.config
+    fixed = fixed_input_size(model)
+    if requested is None and config.get("STREAM_IMGSZ") and not fixed:
+        imgsz = int(config["STREAM_IMGSZ"])
+    budget = float(config.get("STREAM_LATENCY_BUDGET_MS", 0))
+    if not budget or fixed:
+        session.resolution = None
+        return imgsz
+    if session.resolution is None:
+        session.resolution = AdaptiveResolution(get_choices(), imgsz, budget, floor=config.get("STREAM_MIN_IMGSZ", 320))
+    else:
+        # The size the client asks for (or auto picks) is the stream's ceiling
+        session.resolution.configure(imgsz, budget)
+    return session.resolution.imgsz
+
+
+def _busy_response(admission: AdmissionController, reason: Optional[str]) -> Response:
+    interval = admission.suggested_interval_ms()
+    _log(f"[INFO] Live detect: frame rejected ({reason}), suggesting {interval} ms between frames")
+    response = jsonify({
+        "success": False,
+        "skipped": True,
+        "reason": reason,
+        "error": "Frame superseded by a newer one" if reason == "superseded" else "Server busy",
+        "retry_after_ms": interval,
+        "hints": admission.hints(),
+    })
+    response.status_code = 429
+    response.headers["Retry-After"] = retry_after_seconds(interval)
+    return response
+
+
+def _detect_frame(
+    data: Any,
+    frame_bytes: Optional[bytes],
+    image_b64: Optional[str],
+    response_format: str,
+    use_msgpack: bool,
+    session_id: Optional[str],
+    admission: Optional[AdmissionController],
+) -> Any:
+    """The admitted part of live_detect: decode, detect (or track) and serialize."""
+    model, error = _load_requested_model("live_detect", data.get("model"))
+    if error is not None:
+        return error
+    model_name = get_model_info(model).get("model")
+    try:
+        requested_imgsz = parse_imgsz(data.get("imgsz"))
+    except ValueError as e:
+        metrics.ERRORS_TOTAL.inc("live_detect", "bad_request")
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    tiled = _flag(data.get("tiled"))
+    # Detections-only by default: the browser draws the boxes itself. Binary
+    # clients only get an image when they explicitly ask for one.
+    default_image = False if frame_bytes is not None else current_app.config.get("LIVE_DETECT_RETURN_IMAGE", False)
+    return_image = _flag(data.get("return_image"), default_image)
+    # Large JPEGs are decoded straight at a size near imgsz unless tiles or the
+    # annotated image need the full-resolution pixels; boxes are scaled back after
+    min_side = 0
+    if not (tiled or return_image) and current_app.config.get("DECODE_REDUCED_JPEG", True):
+        min_side = requested_imgsz if isinstance(requested_imgsz, int) else current_app.config.get("INFERENCE_IMGSZ", 640)
+
+    _log("[INFO] Live detect: Model loaded, decoding image...")
+    payload = frame_bytes if frame_bytes is not None else decode_base64_payload(image_b64)
+    img, scale = decode_frame(payload, min_side) if payload is not None else (None, None)
     if img is None:
         print("[ERROR] Live detect: Invalid image data after decode.")
+        metrics.ERRORS_TOTAL.inc("live_detect", "decode_failed")
         return jsonify({"success": False, "error": "Invalid image data"}), 400
     
     # Validate image dimensions
     if len(img.shape) != 3 or img.shape[2] != 3:
         print(f"[ERROR] Live detect: Invalid image shape: {img.shape}")
+        metrics.ERRORS_TOTAL.inc("live_detect", "decode_failed")
         return jsonify({"success": False, "error": f"Invalid image format: expected 3-channel image, got shape {img.shape}"}), 400
     
     if img.shape[0] < 32 or img.shape[1] < 32:
-        print(f"[WARN] Live detect: Image is very small: {img.shape}, may affect detection accuracy")
+        _log(f"[WARN] Live detect: Image is very small: {img.shape}, may affect detection accuracy")
     
-    print(f"[OK] Live detect: Image decoded successfully. Shape: {img.shape}, dtype: {img.dtype}")
+    _log(f"[OK] Live detect: Image decoded successfully. Shape: {img.shape}, dtype: {img.dtype}")
 
     try:
         # Confidence threshold: lower = more detections (but more false positives)
@@ -46,99 +260,411 @@ def live_detect():
         # For camouflaged object detection, 0.25-0.3 is usually good
         conf_threshold = float(data.get("confidence", 0.25))
         conf_threshold = max(0.1, min(0.9, conf_threshold))  # Clamp between 0.1 and 0.9
-        print(f"[INFO] Running detection with confidence threshold: {conf_threshold}")
+        _log(f"[INFO] Running detection with confidence threshold: {conf_threshold}")
         
+        imgsz = resolve_imgsz(model, requested_imgsz, img.shape)
+        detect_seconds = None
+
         # Ensure image is in correct format (BGR for OpenCV, which YOLO expects)
-        # The decode_base64_image already returns BGR format from cv2.imdecode
-        results = model(img, imgsz=640, conf=conf_threshold, verbose=False)
-        
-        detections = []
-        boxes = getattr(results[0], "boxes", None)
-        print(f"[INFO] Found {len(boxes) if boxes is not None else 0} boxes in detection results")
-        if boxes is not None and len(boxes) > 0:
-            for box in boxes:
-                try:
-                    x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                    conf_val = float(box.conf[0].cpu().numpy())
-                    cls = int(box.cls[0].cpu().numpy())
-                    class_name = (
-                        results[0].names[cls] if hasattr(results[0], "names") and cls < len(results[0].names) else f"class_{cls}"
-                    )
-                    detections.append(
-                        {
-                            "bbox": [float(x1), float(y1), float(x2), float(y2)],
-                            "confidence": conf_val,
-                            "class": class_name,
-                            "class_id": cls,
-                        }
-                    )
-                except Exception as box_error:
-                    print(f"[WARN] Error processing box: {box_error}")
-                    continue
-
-        # Get annotated image from YOLO (this is resized to 640x640)
-        annotated = results[0].plot(line_width=3)
-        
-        # Resize annotated image back to original video frame dimensions
-        # This ensures the annotated image matches the video frame exactly
-        original_height, original_width = img.shape[:2]
-        annotated_resized = None
-        
-        try:
-            from app.services.model_service import cv2, Image
-            if cv2 is not None:
-                # Resize annotated image to match original frame dimensions
-                annotated_resized = cv2.resize(annotated, (original_width, original_height), interpolation=cv2.INTER_LINEAR)
-                print(f"[INFO] Resized annotated image from {annotated.shape} to ({original_height}, {original_width})")
-            
-            # Convert to PIL for base64 encoding
-            if annotated_resized is not None and Image is not None:
-                annotated_rgb = cv2.cvtColor(annotated_resized, cv2.COLOR_BGR2RGB)
-                annotated_pil = Image.fromarray(annotated_rgb)
-            elif Image is not None:
-                annotated_pil = Image.fromarray(annotated)
-            else:
-                annotated_pil = None
-        except Exception as annotate_error:
-            print(f"[WARN] Error creating annotated image: {annotate_error}")
-            import traceback
-            print(f"   Traceback: {traceback.format_exc()}")
-            annotated_pil = None
-
-        annotated_base64 = None
-        if annotated_pil is not None:
-            import base64
-            import io
-
-            buffer = io.BytesIO()
-            annotated_pil.save(buffer, format="JPEG", quality=90)
-            annotated_base64 = base64.b64encode(buffer.getvalue()).decode("utf-8")
-            print(f"[OK] Created base64 annotated image: {len(annotated_base64)} bytes")
-
-        print(f"[OK] Live detect: Detection completed. Detections: {len(detections)}")
-        return jsonify(
-            {
+        # Both decoders already return BGR format from cv2.imdecode
+        def detect(frame: Any) -> Tuple[Any, Any, Any, Any]:
+            nonlocal detect_seconds
+            if tiled:
+                # Sliced inference keeps small targets at native resolution (TILE_* settings)
+                with metrics.timed("forward_tiled"):
+                    return predict_tiled_arrays(model, frame, conf=conf_threshold)
+            started = time.perf_counter()
+            detected = _detect_full_frame(model, frame, conf_threshold, imgsz)
+            detect_seconds = time.perf_counter() - started
+            return detected
+
+        def detect_crops(crops: List[Any]) -> List[Tuple[Any, Any, Any, Any]]:
+            # Changed regions of a motion-gated stream: no larger input than the crops need
+            largest = (max(c.shape[0] for c in crops), max(c.shape[1] for c in crops))
+            crop_imgsz = imgsz if fixed_input_size(model) else auto_imgsz(largest, get_choices(), imgsz)
+            metrics.IMGSZ_TOTAL.inc(crop_imgsz, amount=len(crops))
+            with metrics.timed("forward_roi"):
+                results = predict_many(model, crops, imgsz=crop_imgsz, conf=conf_threshold)
+            return [(*boxes_to_arrays(r), getattr(r, "names", None)) for r in results]
+
+        track_ids = None
+        stream = None
+        if session_id is not None:
+            config = current_app.config
+            session = get_session_store().get(
+                session_id,
+                iou_threshold=config.get("STREAM_TRACK_IOU", 0.3),
+                max_misses=config.get("STREAM_TRACK_MAX_MISSES", 2),
+            )
+            motion_gated = _flag(data.get("motion"), config.get("STREAM_MOTION_GATING", False)) and not tiled
+            gate_decision = None
+            with session.lock:
+                # Tracks from another model (or version) are not carried over
+                force_keyframe = _flag(data.get("keyframe")) or session.model != model_name
+                if session.motion is not None and (session.model != model_name or not motion_gated):
+                    session.motion = None
+                session.model = model_name
+                if not tiled:
+                    imgsz = _stream_imgsz(session, model, requested_imgsz, imgsz)
+                stream_detect = detect
+                if motion_gated:
+                    if session.motion is None:
+                        session.motion = new_gate()
+
+                    def stream_detect(frame: Any) -> Tuple[Any, Any, Any, Any]:
+                        nonlocal gate_decision
+                        detected, gate_decision, _ = session.motion.run(frame, detect, detect_crops)
+                        metrics.MOTION_GATE_TOTAL.inc(gate_decision)
+                        return detected
+
+                state = process_stream_frame(session, img, stream_detect, force_keyframe=force_keyframe)
+                if detect_seconds is not None and session.resolution is not None:
+                    adapted = session.resolution.observe(detect_seconds)
+                    if adapted is not None:
+                        _log(f"[INFO] Live detect: session {session_id} now runs at imgsz={adapted}")
+                        metrics.STREAM_IMGSZ_CHANGES_TOTAL.inc("down" if adapted < imgsz else "up")
+            xyxy, scores, classes, names = state["xyxy"], state["scores"], state["classes"], state["names"]
+            track_ids = state["track_ids"].tolist()
+            stream = {"session": session_id, "frame": state["frame"], "keyframe": state["keyframe"]}
+            if gate_decision is not None:
+                stream["motion"] = gate_decision
+            metrics.STREAM_FRAMES_TOTAL.inc("keyframe" if state["keyframe"] else "tracked")
+        else:
+            xyxy, scores, classes, names = detect(img)
+        if scale is not None:
+            # Back to the coordinates of the frame the client sent (tracks stay in decoded-frame space)
+            xyxy = scale_boxes(xyxy, scale)
+
+        detections = None
+        if response_format == "full":
+            with metrics.timed("box_extract"):
+                detections = detections_from_arrays(xyxy, scores, classes, names)
+                if track_ids is not None:
+                    for det, track_id in zip(detections, track_ids):
+                        det["track_id"] = track_id
+            response = {"success": True, "detections": detections, "count": len(detections), "model": model_name}
+        else:
+            response = {
                 "success": True,
-                "detections": detections,
-                "count": len(detections),
-                "annotated_image": f"data:image/jpeg;base64,{annotated_base64}" if annotated_base64 else None,
+                "model": model_name,
+                **compact_detections(
+                    xyxy, scores, classes, names,
+                    packed=response_format == "packed",
+                    binary=use_msgpack,
+                    known_token=data.get("classes_token"),
+                ),
             }
-        )
+            if track_ids is not None:
+                response["track_ids"] = track_ids
+        if not tiled:
+            response["imgsz"] = imgsz
+        if stream is not None:
+            response["stream"] = stream
+        if admission is not None:
+            # Adaptive FPS: clients pace their frames by this instead of a fixed rate
+            response["hints"] = admission.hints()
+
+        if return_image:
+            annotated_base64 = None
+            try:
+                if detections is None:
+                    detections = detections_from_arrays(xyxy, scores, classes, names)
+                with metrics.timed("plot"):
+                    annotated = render_detections(img, detections)
+                annotated_base64 = encode_jpeg_base64(annotated, current_app.config.get("LIVE_DETECT_JPEG_QUALITY", 80))
+            except Exception as annotate_error:
+                print(f"[WARN] Error creating annotated image: {annotate_error}")
+                metrics.ERRORS_TOTAL.inc("live_detect", "annotate")
+            response["annotated_image"] = f"data:image/jpeg;base64,{annotated_base64}" if annotated_base64 else None
+
+        _log(f"[OK] Live detect: Detection completed. Detections: {len(scores)}")
+        with metrics.timed("json_serialize"):
+            return make_payload_response(response, use_msgpack)
     except Exception as e:
         print(f"[ERROR] Live detection error: {e}")
+        metrics.ERRORS_TOTAL.inc("live_detect", "inference_failed")
         import traceback
         print(f"   Traceback: {traceback.format_exc()}")
         return jsonify({"success": False, "error": f"Detection failed: {str(e)}"}), 500
 
 
+@api_bp.route("/jobs", methods=["POST"])
+def submit_job():
+    """Queue an uploaded image (multipart field ``image``) for inference in the worker pool.
+
+    An optional ``model`` field picks a registry model; it is resolved to its
+    current version here, so a promotion does not change queued jobs. ``imgsz``
+    is an input size from INFERENCE_IMGSZ_CHOICES or ``auto``.
+    """
+    if not jobs_enabled():
+        return jsonify({"success": False, "error": "Job queue disabled (set INFERENCE_WORKERS)"}), 503
+    model_key = None
+    if request.form.get("model"):
+        try:
+            model_key = get_registry().resolve(request.form["model"])
+        except UnknownModelError as e:
+            metrics.ERRORS_TOTAL.inc("jobs", "unknown_model")
+            return jsonify({"success": False, "error": str(e)}), 404
+
+    file = request.files.get("image")
+    if file is None or not file.filename:
+        return jsonify({"success": False, "error": "Missing image file"}), 400
+    original_filename = secure_filename(file.filename) or "upload.jpg"
+    _, ext = os.path.splitext(original_filename)
+    if ext.lower() not in UPLOAD_EXTENSIONS or file.mimetype not in UPLOAD_MIMETYPES:
+        return jsonify({"success": False, "error": "Invalid file type. Upload JPG, JPEG, PNG, or WEBP."}), 400
+
+    try:
+        save_path, _ = get_upload_store().save(file.stream, ext)
+    except Exception as e:
+        return jsonify({"success": False, "error": f"Error saving file: {e}"}), 500
+
+    try:
+        conf_threshold = max(0.1, min(0.9, float(request.form.get("confidence", 0.25))))
+    except ValueError:
+        return jsonify({"success": False, "error": "Invalid confidence"}), 400
+    try:
+        imgsz = parse_imgsz(request.form.get("imgsz"))
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    try:
+        job_id = submit_image_job(
+            save_path, conf=conf_threshold, tiled=_flag(request.form.get("tiled")), model=model_key, imgsz=imgsz
+        )
+    except Exception as e:
+        metrics.ERRORS_TOTAL.inc("jobs", "pool_unavailable")
+        return jsonify({"success": False, "error": f"Could not queue job: {e}"}), 503
+    return (
+        jsonify({
+            "success": True,
+            "job_id": job_id,
+            "status": "queued",
+            "model": model_key,
+            "status_url": url_for("api.job_status", job_id=job_id),
+        }),
+        202,
+    )
+
+
+@api_bp.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id: str):
+    """Return a job's state; ``?wait=N`` long-polls up to N seconds (max 30) for completion."""
+    try:
+        wait = max(0.0, min(30.0, float(request.args.get("wait", 0))))
+    except ValueError:
+        wait = 0.0
+    job = wait_for_job(job_id, wait) if wait > 0 else get_job(job_id)
+    if job is None:
+        return jsonify({"success": False, "error": "Unknown job"}), 404
+    return jsonify({"success": True, "job": job})
+
+
+@api_bp.route("/batch_detect", methods=["POST"])
+def batch_detect():
+    """Bulk inference, streamed back as JSONL with a final ``{"summary": ...}`` line.
+
+    Inputs: multipart ``files`` (images) and/or ``archive`` (zip/tar), or JSON
+    ``{"paths": [...]}`` naming files, directories or archives under
+    ``BATCH_INPUT_ROOT`` on the server. ``model`` picks a registry model.
+    """
+    config = current_app.config
+    options = (request.get_json(silent=True) or {}) if request.is_json else request.form
+    model, error = _load_requested_model("batch_detect", options.get("model"))
+    if error is not None:
+        return error
+    sources: List[batch_inference.ImageSource] = []
+    for file in request.files.getlist("files"):
+        if file.filename:
+            sources.append((secure_filename(file.filename) or "upload", file.read))
+    archive_streams = []
+    for file in request.files.getlist("archive"):
+        if file.filename:
+            archive_streams.append((secure_filename(file.filename), file.stream))
+
+    server_paths: List[Path] = []
+    root = config.get("BATCH_INPUT_ROOT")
+    requested_paths = options.get("paths", []) if request.is_json else []
+    if isinstance(requested_paths, str):
+        requested_paths = [requested_paths]
+    if not isinstance(requested_paths, list):
+        return jsonify({"success": False, "error": "paths must be a list of paths under BATCH_INPUT_ROOT"}), 400
+    for requested in requested_paths:
+        resolved = batch_inference.resolve_server_path(root, str(requested))
+        if resolved is None:
+            return jsonify({"success": False, "error": f"Path not allowed or not found: {requested}"}), 400
+        server_paths.append(resolved)
+
+    if not sources and not archive_streams and not server_paths:
+        return jsonify({"success": False, "error": "No images supplied"}), 400
+
+    try:
+        conf_threshold = max(0.1, min(0.9, float(options.get("confidence", 0.25))))
+    except (TypeError, ValueError):
+        return jsonify({"success": False, "error": "Invalid confidence"}), 400
+    response_format = normalize_format(options.get("format"))
+    if response_format is None:
+        return jsonify({"success": False, "error": "format must be full, compact or packed"}), 400
+
+    def iter_all():
+        yield from sources
+        for label, stream in archive_streams:
+            if zipfile.is_zipfile(stream):
+                stream.seek(0)
+                yield from batch_inference.iter_zip(stream, f"{label}!")
+            else:
+                stream.seek(0)
+                yield from batch_inference.iter_tar(stream, f"{label}!")
+        yield from batch_inference.iter_sources(server_paths)
+
+    model_name = get_model_info(model).get("model")
+
+    def generate():
+        stats = batch_inference.BatchStats()
+        records = batch_inference.run_batch(
+            model,
+            iter_all(),
+            conf=conf_threshold,
+            imgsz=config.get("INFERENCE_IMGSZ", 640),
+            batch_size=config.get("BATCH_DETECT_BATCH_SIZE", 8),
+            prefetch=config.get("BATCH_DETECT_PREFETCH", 32),
+            decode_workers=config.get("BATCH_DETECT_DECODE_WORKERS", 4),
+            fast_preprocess=config.get("PREPROCESS_FAST_PATH", True),
+            stats=stats,
+            response_format=response_format,
+        )
+        try:
+            for record in records:
+                yield json.dumps(record) + "\n"
+        except Exception as e:
+            print(f"[ERROR] Batch detect failed: {e}")
+            yield json.dumps({"error": f"Batch failed: {e}"}) + "\n"
+        yield json.dumps({"summary": {**stats.as_dict(), "model": model_name}}) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+
+def _static_url(path: Path) -> Optional[str]:
+    """URL of a file written under the static folder (uploads), or None if it lives elsewhere."""
+    try:
+        relative = path.resolve().relative_to(Path(current_app.static_folder).resolve())
+    except ValueError:
+        return None
+    return url_for("static", filename=relative.as_posix())
+
+
+@api_bp.route("/video_detect", methods=["POST"])
+def video_detect():
+    """Run detection over a video, streamed back as one JSONL record per frame and a ``{"summary": ...}`` line.
+
+    Input: a multipart ``video`` upload, or ``url`` naming a stream (``rtsp://``,
+    ``http(s)://``; needs ``VIDEO_STREAM_URLS``) or a file under ``BATCH_INPUT_ROOT``.
+    Frames go through ``video_pipeline`` (decode, preprocess, infer and encode on
+    separate threads). The annotated video and the JSONL are also saved under
+    ``UPLOAD_FOLDER/videos``; the summary links them. ``max_frames`` caps the
+    frames read, never above ``VIDEO_MAX_FRAMES``.
+    """
+    config = current_app.config
+    options = (request.get_json(silent=True) or {}) if request.is_json else request.form
+    model, error = _load_requested_model("video_detect", options.get("model"))
+    if error is not None:
+        return error
+
+    output_dir = Path(config["UPLOAD_FOLDER"]) / "videos"
+    job_id = uuid.uuid4().hex[:12]
+    file = request.files.get("video")
+    url = str(options.get("url") or "").strip()
+    if file is not None and file.filename:
+        filename = secure_filename(file.filename) or "upload.mp4"
+        _, ext = os.path.splitext(filename)
+        if ext.lower() not in video_pipeline.VIDEO_EXTENSIONS:
+            return jsonify({"success": False, "error": f"Invalid video type {ext or '(none)'}"}), 400
+        try:
+            source_path, _ = get_upload_store().save(file.stream, ext)
+        except Exception as e:
+            return jsonify({"success": False, "error": f"Error saving file: {e}"}), 500
+        source, label = str(source_path), filename
+    elif video_pipeline.is_stream_url(url):
+        if not config.get("VIDEO_STREAM_URLS", False):
+            return jsonify({"success": False, "error": "Stream URLs are disabled (set VIDEO_STREAM_URLS)"}), 400
+        source, label = url, url
+    elif url:
+        resolved = batch_inference.resolve_server_path(config.get("BATCH_INPUT_ROOT"), video_pipeline.capture_target(url))
+        if resolved is None or not resolved.is_file():
+            return jsonify({"success": False, "error": f"Path not allowed or not found: {url}"}), 400
+        source, label = str(resolved), url
+    else:
+        return jsonify({"success": False, "error": "No video supplied"}), 400
+
+    try:
+        conf_threshold = max(0.1, min(0.9, float(options.get("confidence", 0.25))))
+        max_frames = int(options.get("max_frames") or 0)
+    except (TypeError, ValueError):
+        return jsonify({"success": False, "error": "Invalid confidence or max_frames"}), 400
+    cap = int(config.get("VIDEO_MAX_FRAMES", 0))
+    if cap > 0:
+        max_frames = min(max_frames, cap) if max_frames > 0 else cap
+
+    video_path = output_dir / f"{job_id}_annotated.mp4" if _flag(options.get("annotate"), True) else None
+    jsonl_path = output_dir / f"{job_id}.jsonl"
+    pipeline = video_pipeline.VideoPipeline(
+        model,
+        source,
+        video_path=video_path,
+        jsonl_path=jsonl_path,
+        conf=conf_threshold,
+        imgsz=config.get("INFERENCE_IMGSZ", 640),
+        batch_size=config.get("VIDEO_BATCH_SIZE", 4),
+        queue_size=config.get("VIDEO_QUEUE_SIZE", 8),
+        max_frames=max_frames,
+        fast_preprocess=config.get("PREPROCESS_FAST_PATH", True),
+    )
+    model_name = get_model_info(model).get("model")
+
+    def generate():
+        try:
+            for record in pipeline.run():
+                yield json.dumps(record) + "\n"
+        except Exception as e:
+            print(f"[ERROR] Video detect failed for {label}: {e}")
+            metrics.ERRORS_TOTAL.inc("video_detect", "pipeline")
+            pipeline.error = pipeline.error or str(e)
+        summary = {**pipeline.stats.as_dict(), "source": label, "model": model_name}
+        if pipeline.error:
+            summary["error"] = pipeline.error
+        if video_path is not None and video_path.exists():
+            summary["video_url"] = _static_url(video_path)
+        if jsonl_path.exists():
+            summary["jsonl_url"] = _static_url(jsonl_path)
+        yield json.dumps({"summary": summary}) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+
 @api_bp.route("/status", methods=["GET"])
 def status():
-    model = load_model()
-    last_error = get_last_model_error()
+    """Service health without side effects; ``?load=1`` loads the default model first.
+
+    A plain status call never imports torch or loads weights, so health checks
+    stay cheap on a cold worker.
+    """
+    if _flag(request.args.get("load")):
+        load_model()
+    info = get_model_info()
     return jsonify({
-        "success": model is not None,
-        "model_loaded": model is not None,
-        "last_error": last_error,
+        "success": bool(info) or get_last_model_error() is None,
+        "model_loaded": bool(info),
+        "last_error": get_last_model_error(),
+        "model": info,
+        "warmup": get_warmup_state(),
+        "concurrency": get_concurrency_info(),
+        "registry": get_registry().describe(),
+        "startup": import_report(),
     })
 
 
+@api_bp.route("/models", methods=["GET"])
+def list_models():
+    """Models in MODELS_DIR with their versions, the default and current versions, and what is loaded."""
+    return jsonify({"success": True, **get_registry().describe()})
+
+
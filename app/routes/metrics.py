@@ -0,0 +1,58 @@
+import time
+
+from flask import Blueprint, Response, g, request
+
+from app.services import metrics
+from app.services.admission import admission_controllers
+from app.services.model_registry import peek_registry
+from app.services.model_service import get_model_info
+from app.services.result_cache import get_result_cache
+from app.services.upload_store import peek_upload_store
+
+metrics_bp = Blueprint("metrics", __name__)
+
+
+@metrics_bp.before_app_request
+def _start_timer():
+    g.metrics_started = time.perf_counter()
+
+
+@metrics_bp.after_app_request
+def _record_request(response: Response) -> Response:
+    started = g.pop("metrics_started", None)
+    route = request.endpoint or "unknown"
+    if started is not None and route not in ("static", "metrics.metrics_endpoint"):
+        # Streaming responses (batch_detect) are timed until the stream starts
+        metrics.REQUEST_SECONDS.observe(time.perf_counter() - started, route)
+        metrics.REQUESTS_TOTAL.inc(route, response.status_code)
+    return response
+
+
+@metrics_bp.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    """Prometheus text exposition of this worker's counters and histograms."""
+    registry = peek_registry()
+    loaded, loaded_bytes = registry.loaded_stats() if registry is not None else (0, 0)
+    extra = metrics.render_gauge("camo_model_loaded", "1 if this worker holds the default model.", 1 if get_model_info() else 0)
+    extra += metrics.render_gauge("camo_models_loaded", "Models this worker holds in memory.", loaded)
+    extra += metrics.render_gauge("camo_models_loaded_bytes", "Estimated memory of the loaded models.", loaded_bytes)
+    controllers = admission_controllers()
+    if controllers:
+        extra += ["# HELP camo_live_in_flight live_detect frames currently admitted, per model.", "# TYPE camo_live_in_flight gauge"]
+        extra += [f'camo_live_in_flight{{model="{key}"}} {controller.in_flight}' for key, controller in sorted(controllers.items())]
+    cache = get_result_cache()
+    if cache is not None:
+        stats = cache.stats()
+        extra += metrics.render_gauge("camo_result_cache_entries", "Entries in the in-memory result cache.", stats["entries"])
+        extra += [
+            "# HELP camo_result_cache_total Result cache lookups by outcome.",
+            "# TYPE camo_result_cache_total counter",
+            f'camo_result_cache_total{{result="hit"}} {stats["hits"]}',
+            f'camo_result_cache_total{{result="miss"}} {stats["misses"]}',
+        ]
+    store = peek_upload_store()
+    if store is not None and store.last_eviction:
+        # As of the last eviction pass, so scraping never walks the upload folder
+        extra += metrics.render_gauge("camo_upload_store_bytes", "Bytes under UPLOAD_FOLDER.", store.last_eviction["bytes"])
+        extra += metrics.render_gauge("camo_upload_store_files", "Files under UPLOAD_FOLDER.", store.last_eviction["files"])
+    return Response(metrics.render_all(extra), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,12 +1,13 @@
 import os
-import uuid
-from pathlib import Path
-from typing import Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, current_app, render_template, request, redirect, url_for, flash
 from werkzeug.utils import secure_filename
 
+from app.services.jobs import TERMINAL_STATES, get_job, jobs_enabled, submit_image_job, wait_for_job
 from app.services.model_service import load_model, run_inference_on_path
+from app.services.resolution import get_choices, parse_imgsz
+from app.services.upload_store import get_upload_store
 
 web_bp = Blueprint("web", __name__)
 
@@ -37,7 +38,10 @@ def performance():
 @web_bp.route("/predict", methods=["GET", "POST"])
 def predict():
     if request.method == "GET":
-        return render_template("predict.html")
+        job_message, pending_job = _job_status(request.args.get("job", ""))
+        return render_template(
+            "predict.html", imgsz_choices=get_choices(), job_message=job_message, pending_job=pending_job
+        )
 
     if "image" not in request.files:
         flash("No file part")
@@ -57,34 +61,70 @@ def predict():
         flash("Invalid file mimetype. Please upload a valid image.")
         return redirect(request.url)
 
-    base, ext = os.path.splitext(original_filename)
+    _, ext = os.path.splitext(original_filename)
     if not ext:
         ext = ".jpg"
-    filename = f"{base}_{uuid.uuid4().hex[:6]}{ext}"
-    save_path = Path(web_bp.root_path).parent.parent / "static" / "uploads" / filename
 
     try:
-        save_path.parent.mkdir(parents=True, exist_ok=True)
-        file.save(save_path)
+        # Stored once per distinct content, under UPLOAD_FOLDER (see upload_store)
+        save_path, _ = get_upload_store().save(file.stream, ext)
     except Exception as e:
         flash(f"Error saving file: {e}")
         return redirect(request.url)
 
+    # Sliced inference for large drone / trail-camera images
+    tiled = request.form.get("tiled", "").lower() in ("1", "true", "on", "yes")
+    try:
+        imgsz = parse_imgsz(request.form.get("imgsz"))
+    except ValueError as e:
+        flash(str(e))
+        return redirect(request.url)
+
+    if jobs_enabled():
+        # Inference runs in the worker pool. By default this request returns at once and the
+        # page polls /api/jobs/<id>; JOB_WAIT_TIMEOUT > 0 holds it for the result instead
+        try:
+            job_id = submit_image_job(save_path, conf=0.25, tiled=tiled, imgsz=imgsz)
+        except Exception as e:
+            flash(f"Error queueing detection: {e}")
+            return redirect(request.url)
+        wait = float(current_app.config.get("JOB_WAIT_TIMEOUT", 0))
+        job = wait_for_job(job_id, wait) if wait > 0 else None
+        if job is None or job.get("status") not in TERMINAL_STATES:
+            return redirect(url_for("web.predict", job=job_id))
+        flash(_job_status(job_id, job)[0])
+        return redirect(url_for("web.predict"))
+
     model = load_model()
     if model is None:
         flash("Model not loaded. Ensure ultralytics is installed and best (1).pt is in models/.")
         return redirect(request.url)
 
     try:
-        detections, _ = run_inference_on_path(model, str(save_path), conf=0.25)
-        if detections:
-            unique = sorted({d["class"] for d in detections})
-            flash(f"Detection successful! Found {len(detections)} object(s): {', '.join(unique)}")
-        else:
-            flash("No objects detected. Try another image or verify the model.")
+        detections, _ = run_inference_on_path(model, str(save_path), conf=0.25, tiled=tiled, imgsz=imgsz)
+        flash(_detections_message(detections))
     except Exception as e:
         flash(f"Error running model: {e}")
 
     return redirect(url_for("web.predict"))
 
 
+def _job_status(job_id: str, job: Optional[Dict[str, Any]] = None) -> Tuple[Optional[str], Optional[str]]:
+    """``(message, pending_job_id)`` for the job a ``/predict?job=<id>`` page shows."""
+    if not job_id or not jobs_enabled():
+        return None, None
+    job = job if job is not None else get_job(job_id)
+    if job is None:
+        return None, None
+    if job.get("status") == "failed":
+        return f"Error running model: {job.get('error')}", None
+    if job.get("status") == "done":
+        return _detections_message(job.get("detections", [])), None
+    return f"Image queued for detection (job {job_id}). Results appear here when it finishes.", job_id
+
+
+def _detections_message(detections: List[Dict[str, Any]]) -> str:
+    if detections:
+        unique = sorted({d["class"] for d in detections})
+        return f"Detection successful! Found {len(detections)} object(s): {', '.join(unique)}"
+    return "No objects detected. Try another image or verify the model."
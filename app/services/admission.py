@@ -0,0 +1,167 @@
+"""Admission control for /api/live_detect.
+
+At most ``ADMISSION_MAX_IN_FLIGHT`` frames per model are processed at once in
+this worker: each registry model (``name@version``) has its own controller, so
+frames for a slow model cannot take the slots of a fast one. A frame that
+cannot get a slot within ``ADMISSION_MAX_WAIT_MS`` is rejected with a 429
+instead of queueing behind the others, so latency stays bounded under load.
+Frames of the same stream session are latest-frame-wins: a frame still waiting
+for a slot when a newer frame of its session arrives is dropped, since its
+result would be stale anyway.
+
+Every answer carries a suggested client frame interval. It is based on the
+smoothed per-frame service time and the number of sessions sharing the slots.
+"""
+import itertools
+import math
+import threading
+import time
+from typing import Dict, Optional
+
+from flask import current_app
+
+from app.services import metrics
+
+# Sessions not seen for this long no longer count towards the fair-share interval
+ACTIVE_SESSION_WINDOW = 5.0
+# ...and are forgotten entirely after this long
+SESSION_FORGET_AFTER = 60.0
+
+
+class Ticket:
+    __slots__ = ("number", "session_id", "admitted", "reason", "started")
+
+    def __init__(self, number: int, session_id: Optional[str]) -> None:
+        self.number = number
+        self.session_id = session_id
+        self.admitted = False
+        self.reason: Optional[str] = None  # "overloaded" or "superseded" when rejected
+        self.started = 0.0
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        max_in_flight: int = 8,
+        max_wait_ms: float = 50.0,
+        min_interval_ms: float = 66.0,
+        max_interval_ms: float = 2000.0,
+        model: str = "",
+    ) -> None:
+        self.model = model
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.min_interval_ms = float(min_interval_ms)
+        self.max_interval_ms = max(float(max_interval_ms), self.min_interval_ms)
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._tickets = itertools.count(1)
+        self._latest: Dict[str, int] = {}  # session -> newest ticket number
+        self._last_seen: Dict[str, float] = {}
+        self._service_seconds: Optional[float] = None  # EWMA of admitted frame time
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def admit(self, session_id: Optional[str] = None) -> Ticket:
+        """Wait up to ``max_wait`` for a slot; the returned ticket says whether one was granted."""
+        now = time.monotonic()
+        with self._cond:
+            ticket = Ticket(next(self._tickets), session_id)
+            if session_id is not None:
+                self._latest[session_id] = ticket.number
+                self._last_seen[session_id] = now
+                # Older frames of this session that are still waiting can give up now
+                self._cond.notify_all()
+            deadline = now + self.max_wait
+            while True:
+                if session_id is not None and self._latest.get(session_id) != ticket.number:
+                    ticket.reason = "superseded"
+                    break
+                if self._in_flight < self.max_in_flight:
+                    self._in_flight += 1
+                    ticket.admitted = True
+                    ticket.started = time.monotonic()
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    ticket.reason = "overloaded"
+                    break
+                self._cond.wait(remaining)
+        metrics.ADMISSION_TOTAL.inc(self.model, "admitted" if ticket.admitted else ticket.reason)
+        return ticket
+
+    def release(self, ticket: Ticket) -> None:
+        if not ticket.admitted:
+            return
+        elapsed = time.monotonic() - ticket.started
+        with self._cond:
+            self._in_flight -= 1
+            if self._service_seconds is None:
+                self._service_seconds = elapsed
+            else:
+                self._service_seconds = 0.8 * self._service_seconds + 0.2 * elapsed
+            self._cond.notify_all()
+        ticket.admitted = False
+
+    def _active_sessions(self, now: float) -> int:
+        stale = [sid for sid, seen in self._last_seen.items() if now - seen > SESSION_FORGET_AFTER]
+        for sid in stale:
+            self._last_seen.pop(sid, None)
+            self._latest.pop(sid, None)
+        return sum(1 for seen in self._last_seen.values() if now - seen <= ACTIVE_SESSION_WINDOW)
+
+    def suggested_interval_ms(self) -> int:
+        """Client frame interval that shares this worker's slots fairly between active sessions."""
+        with self._cond:
+            sessions = max(1, self._active_sessions(time.monotonic()))
+            # Until the first frame completes, assume a typical CPU forward pass
+            service_ms = (self._service_seconds if self._service_seconds is not None else 0.1) * 1000.0
+            busy = self._in_flight >= self.max_in_flight
+        interval = service_ms * sessions / self.max_in_flight
+        if busy:
+            interval *= 2
+        return int(min(self.max_interval_ms, max(self.min_interval_ms, interval)))
+
+    def hints(self) -> Dict[str, int]:
+        return {
+            "suggested_interval_ms": self.suggested_interval_ms(),
+            "in_flight": self._in_flight,
+            "max_in_flight": self.max_in_flight,
+        }
+
+
+def retry_after_seconds(interval_ms: int) -> str:
+    """``Retry-After`` header value (whole seconds, at least 1)."""
+    return str(max(1, math.ceil(interval_ms / 1000.0)))
+
+
+_controllers: Dict[str, AdmissionController] = {}
+_controllers_lock = threading.Lock()
+
+
+def get_admission_controller(model: str = "") -> Optional[AdmissionController]:
+    """Return this process's controller for the registry key ``model``, or None when ADMISSION_ENABLED is off."""
+    config = current_app.config
+    if not config.get("ADMISSION_ENABLED", True):
+        return None
+    controller = _controllers.get(model)
+    if controller is None:
+        with _controllers_lock:
+            controller = _controllers.get(model)
+            if controller is None:
+                controller = _controllers[model] = AdmissionController(
+                    max_in_flight=config.get("ADMISSION_MAX_IN_FLIGHT", 8),
+                    max_wait_ms=config.get("ADMISSION_MAX_WAIT_MS", 50.0),
+                    min_interval_ms=config.get("LIVE_MIN_FRAME_INTERVAL_MS", 66.0),
+                    max_interval_ms=config.get("LIVE_MAX_FRAME_INTERVAL_MS", 2000.0),
+                    model=model,
+                )
+    return controller
+
+
+def admission_controllers() -> Dict[str, AdmissionController]:
+    """Snapshot of the controllers created so far, by model key."""
+    with _controllers_lock:
+        return dict(_controllers)
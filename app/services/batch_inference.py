@@ -0,0 +1,302 @@
+"""Bulk inference over directories, archives and file lists.
+
+Images stream through a bounded-prefetch decode stage (a small thread pool, so
+``cv2.imdecode`` runs off the main thread and at most ``prefetch`` decoded
+images are held in memory) into batched forward passes. Results are produced as
+one record per image and can be written as JSONL or, with ``pyarrow``
+installed, Parquet.
+"""
+import json
+import os
+import tarfile
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.services import model_service
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp", ".tif", ".tiff")
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+# Archive members larger than this are skipped rather than read into memory
+MAX_MEMBER_BYTES = 64 * 1024 * 1024
+
+# (name, loader) pairs: the loader returns the encoded image bytes when called
+ImageSource = Tuple[str, Callable[[], bytes]]
+
+
+def _is_image_name(name: str) -> bool:
+    return name.lower().endswith(IMAGE_EXTENSIONS)
+
+
+def is_archive(path: Path) -> bool:
+    return str(path).lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def iter_directory(directory: Path) -> Iterator[ImageSource]:
+    for path in sorted(directory.rglob("*")):
+        if path.is_file() and _is_image_name(path.name):
+            yield str(path), path.read_bytes
+
+
+def iter_zip(fileobj: Any, label: str = "") -> Iterator[ImageSource]:
+    with zipfile.ZipFile(fileobj) as zf:
+        for info in zf.infolist():
+            if info.is_dir() or not _is_image_name(info.filename):
+                continue
+            if info.file_size > MAX_MEMBER_BYTES:
+                print(f"[WARN] Batch: skipping oversized archive member {info.filename}")
+                continue
+            # Members are read straight into memory, never extracted to disk
+            data = zf.read(info)
+            yield f"{label}{info.filename}", (lambda d=data: d)
+
+
+def iter_tar(fileobj: Any, label: str = "") -> Iterator[ImageSource]:
+    with tarfile.open(fileobj=fileobj, mode="r:*") as tf:
+        for member in tf:
+            if not member.isfile() or not _is_image_name(member.name):
+                continue
+            if member.size > MAX_MEMBER_BYTES:
+                print(f"[WARN] Batch: skipping oversized archive member {member.name}")
+                continue
+            extracted = tf.extractfile(member)
+            if extracted is None:
+                continue
+            data = extracted.read()
+            yield f"{label}{member.name}", (lambda d=data: d)
+
+
+def iter_archive(path: Path) -> Iterator[ImageSource]:
+    label = f"{path}!"
+    with open(path, "rb") as f:
+        if zipfile.is_zipfile(f):
+            f.seek(0)
+            yield from iter_zip(f, label)
+        else:
+            f.seek(0)
+            yield from iter_tar(f, label)
+
+
+def iter_sources(sources: Iterable[Path]) -> Iterator[ImageSource]:
+    """Expand directories, archives and plain image files into image sources."""
+    for source in sources:
+        source = Path(source)
+        if source.is_dir():
+            yield from iter_directory(source)
+        elif source.is_file() and is_archive(source):
+            yield from iter_archive(source)
+        elif source.is_file():
+            yield str(source), source.read_bytes
+        else:
+            print(f"[WARN] Batch: no such file or directory: {source}")
+
+
+def _decode(source: ImageSource) -> Tuple[str, Optional[Any], Optional[str]]:
+    name, load = source
+    try:
+        img = model_service.decode_image_bytes(load())
+    except Exception as e:
+        return name, None, str(e)
+    if img is None:
+        return name, None, "could not decode image"
+    return name, img, None
+
+
+def decode_pipeline(
+    sources: Iterable[ImageSource], prefetch: int = 32, workers: int = 4
+) -> Iterator[Tuple[str, Optional[Any], Optional[str]]]:
+    """Decode images in a thread pool, keeping at most ``prefetch`` in flight, in input order."""
+    pending: Deque = deque()
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="batch-decode") as pool:
+        for source in sources:
+            pending.append(pool.submit(_decode, source))
+            if len(pending) >= max(1, prefetch):
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+class BatchStats:
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.images = 0
+        self.errors = 0
+        self.batches = 0
+        self.detections = 0
+        self.inference_seconds = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        elapsed = time.perf_counter() - self.started
+        return {
+            "images": self.images,
+            "errors": self.errors,
+            "batches": self.batches,
+            "detections": self.detections,
+            "seconds": round(elapsed, 3),
+            "inference_seconds": round(self.inference_seconds, 3),
+            "images_per_sec": round(self.images / elapsed, 2) if elapsed > 0 else None,
+        }
+
+
+def run_batch(
+    model: Any,
+    sources: Iterable[ImageSource],
+    conf: float = 0.25,
+    imgsz: int = 640,
+    batch_size: int = 8,
+    prefetch: int = 32,
+    decode_workers: int = 4,
+    stats: Optional[BatchStats] = None,
+    response_format: str = "full",
+    fast_preprocess: bool = True,
+) -> Iterator[Dict[str, Any]]:
+    """Yield one ``{"file", "detections", "count"}`` (or ``{"file", "error"}``) record per image.
+
+    With ``response_format`` ``compact`` or ``packed`` the detections are columnar
+    (see ``response_format.compact_detections``) and the class table is only
+    attached to the first record.
+    """
+    from app.services.response_format import compact_detections
+
+    stats = stats if stats is not None else BatchStats()
+    batch: List[Tuple[str, Any]] = []
+    sent_token: Optional[str] = None
+
+    def flush() -> Iterator[Dict[str, Any]]:
+        nonlocal sent_token
+        started = time.perf_counter()
+        try:
+            results = model_service.run_model(
+                model, [img for _, img in batch], imgsz=imgsz, conf=conf, fast_preprocess=fast_preprocess
+            )
+        except Exception as e:
+            print(f"[ERROR] Batch: forward pass failed for {len(batch)} image(s): {e}")
+            stats.errors += len(batch)
+            for name, _ in batch:
+                yield {"file": name, "error": f"inference failed: {e}"}
+            return
+        stats.inference_seconds += time.perf_counter() - started
+        stats.batches += 1
+        for (name, _), result in zip(batch, results):
+            xyxy, scores, classes = model_service.boxes_to_arrays(result)
+            stats.images += 1
+            stats.detections += len(scores)
+            names = getattr(result, "names", None)
+            if response_format == "full":
+                detections = model_service.detections_from_arrays(xyxy, scores, classes, names)
+                yield {"file": name, "detections": detections, "count": len(detections)}
+            else:
+                payload = compact_detections(
+                    xyxy, scores, classes, names, packed=response_format == "packed", known_token=sent_token
+                )
+                sent_token = payload["classes_token"]
+                yield {"file": name, **payload}
+
+    for name, img, error in decode_pipeline(sources, prefetch=prefetch, workers=decode_workers):
+        if error is not None:
+            stats.errors += 1
+            yield {"file": name, "error": error}
+            continue
+        batch.append((name, img))
+        if len(batch) >= max(1, batch_size):
+            yield from flush()
+            batch = []
+    if batch:
+        yield from flush()
+
+
+class JsonlWriter:
+    def __init__(self, path: Path) -> None:
+        self._file = open(path, "w", encoding="utf-8")
+
+    def write(self, record: Dict[str, Any]) -> None:
+        self._file.write(json.dumps(record) + "\n")
+
+    def write_summary(self, summary: Dict[str, Any]) -> None:
+        self._file.write(json.dumps({"summary": summary}) + "\n")
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class ParquetWriter:
+    """One row per detection (plus a row for images without detections or with errors)."""
+
+    SCHEMA_FIELDS = ("file", "class_id", "class", "confidence", "x1", "y1", "x2", "y2", "error")
+
+    def __init__(self, path: Path, row_group_size: int = 10000) -> None:
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise RuntimeError("Parquet output requires pyarrow (pip install pyarrow)") from e
+        self._pa = pa
+        self._schema = pa.schema(
+            [
+                ("file", pa.string()),
+                ("class_id", pa.int32()),
+                ("class", pa.string()),
+                ("confidence", pa.float32()),
+                ("x1", pa.float32()),
+                ("y1", pa.float32()),
+                ("x2", pa.float32()),
+                ("y2", pa.float32()),
+                ("error", pa.string()),
+            ]
+        )
+        self._writer = pq.ParquetWriter(str(path), self._schema)
+        self._rows: Dict[str, List[Any]] = {k: [] for k in self.SCHEMA_FIELDS}
+        self._row_group_size = row_group_size
+
+    def _add_row(self, **row: Any) -> None:
+        for key in self.SCHEMA_FIELDS:
+            self._rows[key].append(row.get(key))
+
+    def write(self, record: Dict[str, Any]) -> None:
+        detections = record.get("detections") or []
+        if not detections:
+            self._add_row(file=record["file"], error=record.get("error"))
+        for det in detections:
+            x1, y1, x2, y2 = det["bbox"]
+            self._add_row(
+                file=record["file"], class_id=det["class_id"], **{"class": det["class"]},
+                confidence=det["confidence"], x1=x1, y1=y1, x2=x2, y2=y2,
+            )
+        if len(self._rows["file"]) >= self._row_group_size:
+            self._flush()
+
+    def write_summary(self, summary: Dict[str, Any]) -> None:
+        # Throughput stats do not fit the per-detection schema; callers report them separately
+        pass
+
+    def _flush(self) -> None:
+        if self._rows["file"]:
+            self._writer.write_table(self._pa.Table.from_pydict(self._rows, schema=self._schema))
+            self._rows = {k: [] for k in self.SCHEMA_FIELDS}
+
+    def close(self) -> None:
+        self._flush()
+        self._writer.close()
+
+
+def open_writer(path: Path, fmt: Optional[str] = None) -> Any:
+    fmt = (fmt or ("parquet" if str(path).lower().endswith(".parquet") else "jsonl")).lower()
+    if fmt == "parquet":
+        return ParquetWriter(path)
+    if fmt == "jsonl":
+        return JsonlWriter(path)
+    raise ValueError(f"Unknown output format: {fmt}")
+
+
+def resolve_server_path(root: Optional[Path], requested: str) -> Optional[Path]:
+    """Resolve a client-supplied path, refusing anything outside ``root`` (None disables)."""
+    if root is None or not requested:
+        return None
+    root = Path(root).resolve()
+    candidate = (root / requested).resolve()
+    if candidate != root and root not in candidate.parents:
+        return None
+    return candidate if os.path.exists(candidate) else None
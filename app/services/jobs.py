@@ -0,0 +1,276 @@
+"""Asynchronous inference jobs served by a pool of dedicated worker processes.
+
+Web workers only save the upload and enqueue a job; the forward pass and the
+annotated image save run in ``INFERENCE_WORKERS`` separate processes that each
+hold one model. Job state is kept as one JSON file per job in ``JOBS_DIR`` so
+any web worker on the host can answer a status poll. Finished jobs are deleted
+``JOB_TTL`` seconds after they finish, by a sweep that submissions trigger at
+most every ``SWEEP_INTERVAL_S``.
+"""
+import json
+import multiprocessing
+import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from concurrent.futures import wait as wait_futures
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from flask import Flask, current_app
+
+JOB_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+TERMINAL_STATES = ("done", "failed")
+SWEEP_INTERVAL_S = 60.0
+# Jobs that never finished (their pool died with the web worker) are dropped after this long
+ABANDONED_AGE_S = 24 * 3600.0
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_pid: Optional[int] = None
+_executor_lock = threading.Lock()
+_futures: Dict[str, Future] = {}
+_last_sweep = 0.0
+
+# Set in each pool process by _init_worker()
+_worker_app: Optional[Flask] = None
+_worker_model: Optional[Any] = None
+
+
+def jobs_enabled() -> bool:
+    return int(current_app.config.get("INFERENCE_WORKERS", 0)) > 0
+
+
+def _jobs_dir() -> Path:
+    jobs_dir = Path(current_app.config["JOBS_DIR"])
+    jobs_dir.mkdir(parents=True, exist_ok=True)
+    return jobs_dir
+
+
+def _write_job(jobs_dir: Path, job: Dict[str, Any]) -> None:
+    path = jobs_dir / f"{job['id']}.json"
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(job, f)
+    os.replace(tmp_path, path)
+
+
+def _read_job(jobs_dir: Path, job_id: str) -> Optional[Dict[str, Any]]:
+    if not JOB_ID_RE.match(job_id or ""):
+        return None
+    try:
+        with open(jobs_dir / f"{job_id}.json", "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"[WARN] Jobs: unreadable job {job_id}: {e}")
+        return None
+
+
+def sweep_jobs(jobs_dir: Path, ttl: float, now: Optional[float] = None) -> int:
+    """Delete jobs that finished more than ``ttl`` seconds ago; returns how many were removed."""
+    now = time.time() if now is None else now
+    removed = 0
+    for path in jobs_dir.glob("*.json"):
+        try:
+            # A job file is last written when the job finishes, so recent files are skipped unread
+            age = now - path.stat().st_mtime
+            if age <= ttl:
+                continue
+            job = _read_job(jobs_dir, path.stem)
+            if job is not None and job.get("status") not in TERMINAL_STATES and age <= ABANDONED_AGE_S:
+                continue
+            path.unlink()
+            removed += 1
+        except FileNotFoundError:
+            continue  # another web worker got there first
+    if removed:
+        print(f"[INFO] Jobs: removed {removed} finished job(s) older than {ttl:.0f}s")
+    return removed
+
+
+def _maybe_sweep(jobs_dir: Path) -> None:
+    global _last_sweep
+    ttl = float(current_app.config.get("JOB_TTL", 3600))
+    now = time.monotonic()
+    if ttl <= 0 or now - _last_sweep < SWEEP_INTERVAL_S:
+        return
+    _last_sweep = now
+    try:
+        sweep_jobs(jobs_dir, ttl)
+    except Exception as e:
+        print(f"[WARN] Jobs: sweep failed: {e}")
+
+
+def _worker_config(config: Dict[str, Any]) -> Dict[str, Any]:
+    """Picklable subset of the app config handed to pool processes."""
+    simple = (str, int, float, bool, Path, type(None))
+    worker_config = {k: v for k, v in config.items() if k.isupper() and isinstance(v, simple)}
+    # One job at a time per process: nothing to batch, and no nested pools
+    worker_config["INFERENCE_BATCHING"] = False
+    worker_config["INFERENCE_WORKERS"] = 0
+    worker_config["INFERENCE_REPLICAS"] = 1
+    if not worker_config.get("TORCH_NUM_THREADS"):
+        from app.services.model_service import default_thread_count
+
+        # Every web worker's pool processes share the host's cores
+        processes = int(config.get("WEB_CONCURRENCY", 1)) * max(1, int(config.get("INFERENCE_WORKERS", 1)))
+        worker_config["TORCH_NUM_THREADS"] = default_thread_count(worker_config, processes=processes)
+    return worker_config
+
+
+def _init_worker(config: Dict[str, Any]) -> None:
+    """Pool initializer: build a bare app context and load this process's model."""
+    global _worker_app, _worker_model
+    from app.services import model_service
+
+    _worker_app = Flask("inference-worker")
+    _worker_app.config.update(config)
+    _worker_app.app_context().push()
+    _worker_model = model_service.preload_model()
+    print(f"[OK] Inference worker {os.getpid()} ready (model loaded: {_worker_model is not None})")
+
+
+def _run_job(
+    jobs_dir: str,
+    job_id: str,
+    image_path: str,
+    conf: float,
+    tiled: bool = False,
+    model: Optional[str] = None,
+    imgsz: Any = None,
+) -> Dict[str, Any]:
+    """Executed in a pool process; ``model`` is a registry key, None for the default model."""
+    from app.services import model_service
+
+    jobs_path = Path(jobs_dir)
+    job = _read_job(jobs_path, job_id) or {"id": job_id, "image": image_path, "conf": conf}
+    job.update(status="running", started_at=time.time(), worker_pid=os.getpid())
+    _write_job(jobs_path, job)
+
+    try:
+        job_model = model_service.load_model(model) if model else _worker_model
+        if job_model is None:
+            raise RuntimeError(model_service.get_last_model_error() or "Model not loaded")
+        detections, annotated_path = model_service.run_inference_on_path(
+            job_model, image_path, conf=conf, tiled=tiled, imgsz=imgsz
+        )
+        job.update(status="done", detections=detections, count=len(detections), annotated_path=annotated_path)
+    except Exception as e:
+        print(f"[ERROR] Job {job_id} failed: {e}")
+        job.update(status="failed", error=str(e))
+    job["finished_at"] = time.time()
+    _write_job(jobs_path, job)
+    return job
+
+
+def _get_executor(stale: Optional[ProcessPoolExecutor] = None) -> ProcessPoolExecutor:
+    """This process's pool, rebuilt after a fork or once a worker death has broken it.
+
+    ``stale`` is a pool a submit just failed on; it is replaced even if it does
+    not know it is broken yet.
+    """
+    global _executor, _executor_pid
+    pid = os.getpid()
+
+    def usable() -> bool:
+        return (
+            _executor is not None
+            and _executor_pid == pid
+            and _executor is not stale
+            and not getattr(_executor, "_broken", False)
+        )
+
+    if usable():
+        return _executor
+    with _executor_lock:
+        if not usable():
+            if _executor is not None and _executor_pid == pid:
+                # A dead worker (OOM, crash in cv2/torch) breaks the whole pool for good
+                print("[WARN] Jobs: inference pool is broken - starting a new one")
+                _executor.shutdown(wait=False, cancel_futures=True)
+            workers = int(current_app.config.get("INFERENCE_WORKERS", 1))
+            # spawn, not fork: pool processes must not inherit the web worker's threads
+            # or a half-initialised torch runtime
+            _executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(_worker_config(dict(current_app.config)),),
+            )
+            _executor_pid = pid
+            print(f"[OK] Started inference pool with {workers} worker process(es)")
+    return _executor
+
+
+def submit_image_job(
+    image_path: Path, conf: float = 0.25, tiled: bool = False, model: Optional[str] = None, imgsz: Any = None
+) -> str:
+    """Queue inference on a saved image; returns the job id.
+
+    Raises if the worker pool cannot take the job even after being rebuilt; the
+    job is then recorded as failed.
+
+    ``model`` is a resolved registry key (``name@version``), so the job runs on
+    the version that was current when it was submitted. ``imgsz`` is a size,
+    ``"auto"`` or None (see ``resolution.parse_imgsz``).
+    """
+    jobs_dir = _jobs_dir()
+    _maybe_sweep(jobs_dir)
+    job_id = uuid.uuid4().hex
+    job = {
+        "id": job_id,
+        "status": "queued",
+        "image": str(image_path),
+        "conf": conf,
+        "tiled": tiled,
+        "model": model,
+        "imgsz": imgsz,
+        "submitted_at": time.time(),
+    }
+    _write_job(jobs_dir, job)
+
+    args = (_run_job, str(jobs_dir), job_id, str(image_path), conf, tiled, model, imgsz)
+    executor = _get_executor()
+    try:
+        try:
+            future = executor.submit(*args)
+        except BrokenProcessPool:
+            future = _get_executor(stale=executor).submit(*args)
+    except Exception as e:
+        _write_job(jobs_dir, {**job, "status": "failed", "error": str(e), "finished_at": time.time()})
+        raise
+    _futures[job_id] = future
+
+    def _on_done(fut: Future) -> None:
+        _futures.pop(job_id, None)
+        error = fut.exception()
+        if error is not None:
+            # The pool process died (e.g. BrokenProcessPool) before recording a result
+            _write_job(jobs_dir, {**job, "status": "failed", "error": str(error), "finished_at": time.time()})
+
+    future.add_done_callback(_on_done)
+    return job_id
+
+
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    return _read_job(_jobs_dir(), job_id)
+
+
+def wait_for_job(job_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+    """Return the job once it finishes, or its current state after ``timeout`` seconds."""
+    jobs_dir = _jobs_dir()
+    deadline = time.monotonic() + max(0.0, timeout)
+    future = _futures.get(job_id)
+    if future is not None:
+        wait_futures([future], timeout=max(0.0, timeout))
+        return _read_job(jobs_dir, job_id)
+    # Submitted by another web worker: poll the shared job file
+    while True:
+        job = _read_job(jobs_dir, job_id)
+        if job is None or job.get("status") in TERMINAL_STATES or time.monotonic() >= deadline:
+            return job
+        time.sleep(0.1)
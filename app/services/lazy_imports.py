@@ -0,0 +1,145 @@
+"""Lazy stand-ins for the heavy optional dependencies (ultralytics/torch, OpenCV, numpy, Pillow).
+
+``LazyImport("cv2")`` is a proxy that imports OpenCV the first time one of its
+attributes is used. Processes that only serve the HTML pages, health checks or
+``/api/status`` therefore never pay the few seconds that ultralytics and torch
+take to import. ``available(proxy)`` imports it and reports whether that
+worked; it replaces the old ``is None`` checks on the module globals.
+``loaded(proxy)`` answers without importing anything.
+
+Each import is timed. ``import_report()`` feeds the ``startup`` section of
+``/api/status`` and ``tools/startup_report.py``.
+"""
+import importlib
+import threading
+import time
+import traceback
+from typing import Any, Callable, Dict, List, Optional
+
+_lock = threading.Lock()
+_proxies: List["LazyImport"] = []
+
+# Set by create_app(): seconds spent building the app, and when it finished
+_app_created: Dict[str, Optional[float]] = {"seconds": None, "at": None}
+
+
+class LazyImport:
+    """A module (or one attribute of it, e.g. ``ultralytics.YOLO``) imported on first use.
+
+    Module attributes are copied onto the proxy once looked up, so after the
+    first access ``np.zeros`` costs the same as on the real module.
+    """
+
+    def __init__(
+        self, module: str, attr: Optional[str] = None, skip_reason: Optional[str] = None,
+        check: Optional[Callable[[Any], None]] = None,
+    ) -> None:
+        object.__setattr__(self, "_lazy_module", module)
+        object.__setattr__(self, "_lazy_attr", attr)
+        object.__setattr__(self, "_lazy_skip", skip_reason)
+        object.__setattr__(self, "_lazy_check", check)
+        object.__setattr__(self, "_lazy_target", None)
+        object.__setattr__(self, "_lazy_error", None)
+        object.__setattr__(self, "_lazy_seconds", None)
+        object.__setattr__(self, "_lazy_lock", threading.Lock())
+        with _lock:
+            _proxies.append(self)
+
+    @property
+    def _lazy_name(self) -> str:
+        return f"{self._lazy_module}.{self._lazy_attr}" if self._lazy_attr else self._lazy_module
+
+    def _lazy_load(self) -> Any:
+        target = self._lazy_target
+        if target is not None:
+            return target
+        if self._lazy_error is not None:
+            raise ImportError(self._lazy_error)
+        with self._lazy_lock:
+            if self._lazy_target is None and self._lazy_error is None:
+                self._lazy_import()
+        if self._lazy_error is not None:
+            raise ImportError(self._lazy_error)
+        return self._lazy_target
+
+    def _lazy_import(self) -> None:
+        """Import the target; called with ``_lazy_lock`` held."""
+        if self._lazy_skip:
+            print(f"[WARN] {self._lazy_skip} is set - skipping {self._lazy_name} import.")
+            object.__setattr__(self, "_lazy_error", f"{self._lazy_name} import skipped ({self._lazy_skip})")
+            return
+        started = time.perf_counter()
+        try:
+            target = importlib.import_module(self._lazy_module)
+            if self._lazy_attr:
+                target = getattr(target, self._lazy_attr)
+            if self._lazy_check is not None:
+                self._lazy_check(target)
+        except Exception as e:
+            object.__setattr__(self, "_lazy_error", f"{self._lazy_name} import failed: {e}")
+            print(f"[ERROR] {self._lazy_error}")
+            print(f"   Traceback: {traceback.format_exc()}")
+            return
+        finally:
+            object.__setattr__(self, "_lazy_seconds", time.perf_counter() - started)
+        object.__setattr__(self, "_lazy_target", target)
+        print(f"[INFO] Imported {self._lazy_name} in {self._lazy_seconds:.2f}s")
+
+    def __getattr__(self, item: str) -> Any:
+        if item.startswith("_lazy_"):
+            raise AttributeError(item)
+        value = getattr(self._lazy_load(), item)
+        if self._lazy_attr is None:
+            object.__setattr__(self, item, value)
+        return value
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        return self._lazy_load()(*args, **kwargs)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._lazy_target is not None else "failed" if self._lazy_error else "not loaded"
+        return f"<LazyImport {self._lazy_name} ({state})>"
+
+
+def available(proxy: LazyImport) -> bool:
+    """Import ``proxy`` if needed; True if the dependency can be used."""
+    try:
+        proxy._lazy_load()
+        return True
+    except ImportError:
+        return False
+
+
+def loaded(proxy: LazyImport) -> bool:
+    """True if ``proxy`` was already imported successfully; never triggers an import."""
+    return proxy._lazy_target is not None
+
+
+def import_error(proxy: LazyImport) -> Optional[str]:
+    return proxy._lazy_error
+
+
+def unwrap(proxy: Any) -> Any:
+    """The real module or attribute behind ``proxy`` (imported if needed); other values pass through."""
+    return proxy._lazy_load() if isinstance(proxy, LazyImport) else proxy
+
+
+def mark_app_created(seconds: float) -> None:
+    _app_created.update(seconds=round(seconds, 3), at=time.time())
+
+
+def import_report() -> Dict[str, Any]:
+    """App boot time and the state and import time of every lazy dependency."""
+    with _lock:
+        proxies = list(_proxies)
+    deps = {}
+    for proxy in proxies:
+        state = "loaded" if proxy._lazy_target is not None else "failed" if proxy._lazy_error else "not_loaded"
+        seconds = proxy._lazy_seconds
+        deps[proxy._lazy_name] = {"state": state, "seconds": round(seconds, 3) if seconds is not None else None}
+    created_at = _app_created["at"]
+    return {
+        "app_create_seconds": _app_created["seconds"],
+        "app_uptime_seconds": round(time.time() - created_at, 1) if created_at else None,
+        "dependencies": deps,
+    }
@@ -0,0 +1,169 @@
+"""Minimal in-process metrics with Prometheus text exposition.
+
+Counters and histograms live in this worker process only; under gunicorn each
+worker reports its own numbers (add the ``instance`` label when scraping
+several workers). No client library is required.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds: sub-millisecond decode steps up to multi-second forward passes
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{n}="{str(v)}"' for n, v in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        key = tuple(str(v) for v in labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(tuple(str(v) for v in labels), 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.label_names, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[LabelValues, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        key = tuple(str(v) for v in labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._values.items())
+        for key, series in items:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, ('le', repr(bound)))} {cumulative}")
+            cumulative += series[len(self.buckets)]
+            lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, ('le', '+Inf'))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {series[-1]}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+
+STAGE_SECONDS = Histogram(
+    "camo_stage_seconds",
+    "Time spent in each stage of the inference hot paths.",
+    labels=("stage",),
+)
+REQUEST_SECONDS = Histogram(
+    "camo_request_seconds",
+    "End-to-end handler time per API route.",
+    labels=("route",),
+)
+REQUESTS_TOTAL = Counter("camo_requests_total", "Requests handled per route and HTTP status.", labels=("route", "status"))
+ERRORS_TOTAL = Counter("camo_errors_total", "Errors per route and reason.", labels=("route", "reason"))
+MODEL_CACHE_TOTAL = Counter("camo_model_cache_total", "load_model() calls served from cache (hit) or loading (miss).", labels=("result",))
+MODEL_LOAD_SECONDS = Histogram("camo_model_load_seconds", "Time to load model weights.", buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60))
+MODEL_EVICTIONS_TOTAL = Counter("camo_model_evictions_total", "Models unloaded by the registry, per reason.", labels=("reason",))
+STREAM_FRAMES_TOTAL = Counter(
+    "camo_stream_frames_total",
+    "Stream-mode frames by whether the detector ran (keyframe) or boxes were tracked (tracked).",
+    labels=("kind",),
+)
+ADMISSION_TOTAL = Counter(
+    "camo_admission_total",
+    "live_detect admission decisions per model (admitted, overloaded, superseded).",
+    labels=("model", "result"),
+)
+IMGSZ_TOTAL = Counter("camo_inference_imgsz_total", "Images and live frames run by the detector, per input size.", labels=("imgsz",))
+STREAM_IMGSZ_CHANGES_TOTAL = Counter(
+    "camo_stream_imgsz_changes_total",
+    "Stream sessions stepping their input size down (over the latency budget) or up.",
+    labels=("direction",),
+)
+MOTION_GATE_TOTAL = Counter(
+    "camo_motion_gate_total",
+    "Motion-gated stream keyframes: detections reused (idle), changed regions run (roi) or whole frame (full).",
+    labels=("decision",),
+)
+UPLOADS_TOTAL = Counter("camo_uploads_total", "Uploads saved (stored) or matched to stored content (duplicate).", labels=("result",))
+UPLOAD_EVICTIONS_TOTAL = Counter("camo_upload_evictions_total", "Files removed from the upload folder, per reason (age, size).", labels=("reason",))
+BATCH_SIZE = Histogram(
+    "camo_batch_size",
+    "Frames per batched forward pass.",
+    buckets=(1, 2, 3, 4, 6, 8, 12, 16, 32),
+)
+
+REGISTRY = [
+    STAGE_SECONDS,
+    REQUEST_SECONDS,
+    REQUESTS_TOTAL,
+    ERRORS_TOTAL,
+    MODEL_CACHE_TOTAL,
+    MODEL_LOAD_SECONDS,
+    MODEL_EVICTIONS_TOTAL,
+    BATCH_SIZE,
+    STREAM_FRAMES_TOTAL,
+    IMGSZ_TOTAL,
+    STREAM_IMGSZ_CHANGES_TOTAL,
+    MOTION_GATE_TOTAL,
+    ADMISSION_TOTAL,
+    UPLOADS_TOTAL,
+    UPLOAD_EVICTIONS_TOTAL,
+]
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """Record the duration of the enclosed block under ``camo_stage_seconds{stage=...}``."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage)
+
+
+def render_gauge(name: str, help_text: str, value: float, labels: Optional[Dict[str, str]] = None) -> List[str]:
+    label_str = _format_labels(list(labels), list(labels.values())) if labels else ""
+    return [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name}{label_str} {value}"]
+
+
+def render_all(extra_lines: Sequence[str] = ()) -> str:
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    lines.extend(extra_lines)
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,436 @@
+"""Registry of the model artifacts in MODELS_DIR, addressed as ``name@version``.
+
+Artifact stems follow ``<name>@<version>``: ``camo@v3.safetensors``,
+``camo@v3.onnx`` and ``camo@v3_int8.onnx`` are all ``camo@v3``. A file without
+``@`` is an unversioned model named after its stem (``best (1).pt`` is
+``best (1)``). Requests name a model as ``name@version``, as ``name`` for that
+name's current version, or not at all for the default model.
+
+Current versions and the default model come from the manifest
+(``MODEL_REGISTRY_MANIFEST`` in MODELS_DIR)::
+
+    {"default": "camo", "current": {"camo": "v3"}}
+
+The manifest is replaced atomically (``tools/model_registry.py promote``), and
+every worker picks the change up within ``MODEL_REGISTRY_REFRESH_S`` without a
+restart. A request that already resolved its model finishes on it. Without a
+manifest, a name's current version is its highest one. The default is then
+``DEFAULT_MODEL``, or failing that the first artifact in the usual preference
+order.
+
+Models are loaded on first use and kept in LRU order. Once the loaded models
+together exceed ``MODEL_MEMORY_BUDGET_MB``, the least recently used ones are
+unloaded, but never the default model or the one just loaded. An artifact file
+replaced in place (new mtime or size) is reloaded on its next use.
+"""
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from flask import current_app
+
+from app.services import metrics, model_service
+
+
+class UnknownModelError(LookupError):
+    """No artifact in MODELS_DIR matches the requested model name or version."""
+
+
+def parse_model_key(key: str) -> Tuple[str, str]:
+    """``"camo@v3"`` -> ``("camo", "v3")``; unversioned names get version ``""``."""
+    name, sep, version = str(key).partition("@")
+    return name.strip(), version.strip() if sep else ""
+
+
+def model_key(name: str, version: str) -> str:
+    return f"{name}@{version}" if version else name
+
+
+def _version_order(version: str) -> List[Tuple[int, int, str]]:
+    """Natural sort key, so v10 ranks above v9."""
+    return [(0, int(part), "") if part.isdigit() else (1, 0, part) for part in re.split(r"(\d+)", version.lower()) if part]
+
+
+def _artifact_stem(path: Path, backend: str, int8: bool) -> str:
+    spec = model_service.MODEL_BACKENDS[backend]
+    name = path.name
+    for suffix in (spec.get("mmap_suffix"), spec["suffix"]):
+        if suffix and name.lower().endswith(suffix):
+            name = name[: -len(suffix)]
+            break
+    if int8 and name.lower().endswith(model_service.INT8_STEM_SUFFIX):
+        name = name[: -len(model_service.INT8_STEM_SUFFIX)]
+    return name
+
+
+def write_manifest(path: Path, manifest: Dict[str, Any]) -> None:
+    """Replace the manifest atomically, so workers never read a half-written file."""
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_text(json.dumps(manifest, indent=2, sort_keys=True))
+    os.replace(tmp_path, path)
+
+
+class LoadedModel:
+    __slots__ = ("key", "model", "info", "nbytes", "source")
+
+    def __init__(self, key: str, model: Any, info: Dict[str, Any], nbytes: int, source: str) -> None:
+        self.key = key
+        self.model = model
+        self.info = info
+        self.nbytes = nbytes
+        self.source = source  # artifact identity at load time, to notice in-place swaps
+
+
+class ModelRegistry:
+    def __init__(
+        self,
+        models_dir: Path,
+        backend: str = model_service.DEFAULT_BACKEND,
+        int8: bool = False,
+        memory_budget_bytes: int = 0,
+        manifest_name: str = "models.json",
+        refresh_interval: float = 2.0,
+        default_model: str = "",
+    ) -> None:
+        self.models_dir = Path(models_dir)
+        self.backend = backend
+        self.int8 = int8
+        self.memory_budget = max(0, int(memory_budget_bytes))
+        self.manifest_path = self.models_dir / manifest_name
+        self.refresh_interval = float(refresh_interval)
+        self.default_model = default_model
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._artifacts: "OrderedDict[str, List[Tuple[Path, str]]]" = OrderedDict()
+        self._manifest: Dict[str, Any] = {}
+        self._signature: Optional[Tuple[int, int]] = None
+        self._checked = float("-inf")
+        self._loaded: "OrderedDict[str, LoadedModel]" = OrderedDict()  # least recently used first
+        self._by_id: Dict[int, LoadedModel] = {}
+        self._default_key: Optional[str] = None
+        self._default_fallback: Dict[str, str] = {}  # default key that failed to load -> key used instead
+        self._warned_default: Optional[str] = None
+        self._registered: Dict[str, LoadedModel] = {}  # in-memory models, see register()
+
+    # -- discovery -------------------------------------------------------
+
+    def _scan(self) -> "OrderedDict[str, List[Tuple[Path, str]]]":
+        """Artifacts grouped by model key, each group in load-preference order."""
+        order = [(self.backend, True)] if self.int8 else []
+        order.append((self.backend, False))
+        if self.backend != model_service.DEFAULT_BACKEND:
+            # Same fallback as a single-model deployment: the .pt weights of that model
+            order.append((model_service.DEFAULT_BACKEND, False))
+        groups: "OrderedDict[str, List[Tuple[Path, str]]]" = OrderedDict((key, []) for key in self._registered)
+        for backend, int8 in order:
+            for path in model_service._discover_model_paths(self.models_dir, backend, int8=int8):
+                name, version = parse_model_key(_artifact_stem(path, backend, int8))
+                groups.setdefault(model_key(name, version), []).append((path, backend))
+        return groups
+
+    def _read_manifest(self) -> Dict[str, Any]:
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            if not isinstance(manifest, dict):
+                raise ValueError("manifest must be a JSON object")
+            return manifest
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"[WARN] Model registry: ignoring unreadable manifest {self.manifest_path}: {e}")
+            return self._manifest
+
+    def _stat_signature(self) -> Tuple[int, int]:
+        def mtime(path: Path) -> int:
+            try:
+                return path.stat().st_mtime_ns
+            except OSError:
+                return 0
+
+        return mtime(self.models_dir), mtime(self.manifest_path)
+
+    def refresh(self, force: bool = False) -> None:
+        """Rescan MODELS_DIR and the manifest if they changed (at most every ``refresh_interval``)."""
+        now = time.monotonic()
+        if not force and now - self._checked < self.refresh_interval:
+            return
+        stale: List[LoadedModel] = []
+        with self._lock:
+            if not force and now - self._checked < self.refresh_interval:
+                return
+            self._checked = now
+            signature = self._stat_signature()
+            if force or signature != self._signature:
+                self._signature = signature
+                self._artifacts = self._scan()
+                self._manifest = self._read_manifest()
+                self._default_fallback.clear()
+                self._warned_default = None
+            for key, entry in list(self._loaded.items()):
+                info = entry.info
+                if key in self._registered:
+                    continue
+                if key not in self._artifacts or model_service._artifact_identity(
+                    Path(info["path"]), info["backend"]
+                ) != entry.source:
+                    stale.append(self._unload_locked(key))
+        for entry in stale:
+            self._release(entry, "artifact_changed")
+
+    # -- resolution ------------------------------------------------------
+
+    def resolve(self, spec: Optional[str] = None) -> str:
+        """Registry key for ``spec`` (``name@version``, ``name`` or None for the default)."""
+        self.refresh()
+        with self._lock:
+            artifacts, manifest = self._artifacts, self._manifest
+        spec = str(spec or "").strip()
+        if spec:
+            return self._resolve_spec(spec, artifacts, manifest)
+        if not artifacts:
+            raise UnknownModelError(f"No model artifacts in {self.models_dir}")
+        default = str(manifest.get("default") or self.default_model or "").strip()
+        if default:
+            try:
+                return self._resolve_spec(default, artifacts, manifest)
+            except UnknownModelError:
+                # A stale default must not take the service down with it
+                if self._warned_default != default:
+                    self._warned_default = default
+                    print(f"[WARN] Model registry: default model '{default}' not found - using {next(iter(artifacts))}")
+        return next(iter(artifacts))
+
+    @staticmethod
+    def _resolve_spec(spec: str, artifacts: Dict[str, Any], manifest: Dict[str, Any]) -> str:
+        name, version = parse_model_key(spec)
+        if version:
+            if model_key(name, version) in artifacts:
+                return model_key(name, version)
+            raise UnknownModelError(f"Unknown model '{spec}'")
+        current = (manifest.get("current") or {}).get(name)
+        if current:
+            if model_key(name, str(current)) in artifacts:
+                return model_key(name, str(current))
+            print(f"[WARN] Model registry: manifest points {name} at missing version {current}")
+        if name in artifacts:
+            return name
+        versions = [key for key in artifacts if parse_model_key(key)[0] == name]
+        if not versions:
+            raise UnknownModelError(f"Unknown model '{spec}'")
+        return max(versions, key=lambda key: _version_order(parse_model_key(key)[1]))
+
+    # -- loading ---------------------------------------------------------
+
+    def get(self, spec: Optional[str] = None) -> Optional[Any]:
+        """The loaded model for ``spec``, loading it (and evicting others) if needed."""
+        key = self.resolve(spec)
+        is_default = not str(spec or "").strip()
+        if is_default:
+            key = self._default_fallback.get(key, key)
+            self._default_key = key
+        entry = self._touch(key)
+        if entry is not None:
+            metrics.MODEL_CACHE_TOTAL.inc("hit")
+            return entry.model
+
+        metrics.MODEL_CACHE_TOTAL.inc("miss")
+        keys = [key]
+        if is_default:
+            # Like a single-model deployment: the default falls back to the next loadable artifact
+            with self._lock:
+                keys += [k for k in self._artifacts if k != key]
+        for candidate in keys:
+            model = self._load(candidate)
+            if model is not None:
+                if candidate != key:
+                    print(f"[WARN] Default model {key} could not be loaded - serving {candidate}")
+                    self._default_fallback[key] = candidate
+                    self._default_key = candidate
+                return model
+        metrics.ERRORS_TOTAL.inc("model_service", "model_load")
+        return None
+
+    def _touch(self, key: str) -> Optional[LoadedModel]:
+        with self._lock:
+            entry = self._loaded.get(key)
+            if entry is not None:
+                self._loaded.move_to_end(key)
+            return entry
+
+    def _load(self, key: str) -> Optional[Any]:
+        with self._lock:
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+            candidates = list(self._artifacts.get(key, []))
+        # Per-key lock: concurrent requests for one model load it once, other models stay available
+        with load_lock:
+            entry = self._touch(key)
+            if entry is not None:
+                return entry.model
+            print(f"Loading model {key} from {self.models_dir}")
+            started = time.perf_counter()
+            model, info = model_service.load_artifact(candidates)
+            if model is None:
+                return None
+            metrics.MODEL_LOAD_SECONDS.observe(time.perf_counter() - started)
+            if info["backend"] != self.backend:
+                print(f"[WARN] No loadable {self.backend} artifact for {key} - serving its {info['backend']} weights")
+            info["model"] = key
+            entry = LoadedModel(
+                key,
+                model,
+                info,
+                model_service.estimate_model_bytes(model, info["path"]),
+                model_service._artifact_identity(Path(info["path"]), info["backend"]),
+            )
+            with self._lock:
+                self._loaded[key] = entry
+                self._by_id[id(model)] = entry
+                evicted = self._evict_locked(keep=key)
+            for old in evicted:
+                self._release(old, "memory_budget")
+            return model
+
+    # -- eviction --------------------------------------------------------
+
+    def _unload_locked(self, key: str) -> LoadedModel:
+        entry = self._loaded.pop(key)
+        if self._by_id.get(id(entry.model)) is entry:
+            del self._by_id[id(entry.model)]
+        return entry
+
+    def _evict_locked(self, keep: str) -> List[LoadedModel]:
+        if not self.memory_budget:
+            return []
+        total = sum(entry.nbytes for entry in self._loaded.values())
+        evicted = []
+        for key in list(self._loaded):
+            if total <= self.memory_budget:
+                break
+            if key in (keep, self._default_key) or key in self._registered:
+                continue
+            entry = self._unload_locked(key)
+            total -= entry.nbytes
+            evicted.append(entry)
+        return evicted
+
+    def _release(self, entry: LoadedModel, reason: str) -> None:
+        # In-flight requests keep their reference; the memory goes when they finish
+        model_service.release_batcher(entry.model)
+        model_service.release_pool(entry.model)
+        metrics.MODEL_EVICTIONS_TOTAL.inc(reason)
+        print(f"[INFO] Unloaded model {entry.key} ({reason}, {entry.nbytes / 1e6:.1f} MB)")
+
+    def register(self, key: str, model: Any, info: Optional[Dict[str, Any]] = None) -> None:
+        """Serve an in-memory ``model`` as ``key`` ahead of the artifacts (benchmarks, stand-in models).
+
+        Registered models are never evicted or reloaded, and the first one
+        registered is the default unless the manifest or DEFAULT_MODEL says otherwise.
+        """
+        info = {
+            "path": None,
+            "backend": "memory",
+            "precision": "fp32",
+            "identity": f"memory:{key}@{id(model)}",
+            **(info or {}),
+            "model": key,
+        }
+        entry = LoadedModel(key, model, info, model_service.estimate_model_bytes(model), info["identity"])
+        with self._lock:
+            self._registered[key] = entry
+            self._loaded[key] = entry
+            self._by_id[id(model)] = entry
+            self._signature = None  # rescan on the next lookup so ``key`` resolves
+            self._checked = float("-inf")
+
+    def unload(self, spec: str) -> bool:
+        key = self.resolve(spec)
+        with self._lock:
+            self._registered.pop(key, None)
+            entry = self._unload_locked(key) if key in self._loaded else None
+        if entry is not None:
+            self._release(entry, "requested")
+        return entry is not None
+
+    # -- introspection ---------------------------------------------------
+
+    def info(self, model: Any = None) -> Dict[str, Any]:
+        """Info of a loaded model (default: the default model); empty if not loaded."""
+        with self._lock:
+            if model is None:
+                entry = self._loaded.get(self._default_key) if self._default_key else None
+            else:
+                entry = self._by_id.get(id(model))
+                if entry is not None and entry.model is not model:
+                    entry = None
+            return dict(entry.info) if entry is not None else {}
+
+    def loaded_stats(self) -> Tuple[int, int]:
+        """``(models loaded, estimated bytes)``."""
+        with self._lock:
+            return len(self._loaded), sum(entry.nbytes for entry in self._loaded.values())
+
+    def describe(self) -> Dict[str, Any]:
+        """Every known model with its versions' artifacts and load state, for /api/models."""
+        self.refresh()
+        try:
+            default = self.resolve(None)
+        except UnknownModelError:
+            default = None
+        with self._lock:
+            artifacts, manifest = self._artifacts, self._manifest
+            loaded = {key: entry.nbytes for key, entry in self._loaded.items()}
+        models = []
+        for key, candidates in artifacts.items():
+            if all(path == model_service.FALLBACK_WEIGHTS and not path.exists() for path, _ in candidates):
+                continue  # the download-on-demand last resort is not a deployed model
+            name, version = parse_model_key(key)
+            models.append({
+                "key": key,
+                "name": name,
+                "version": version or None,
+                "artifacts": [{"path": str(path), "backend": backend} for path, backend in candidates],
+                "loaded": key in loaded,
+                "bytes": loaded.get(key),
+            })
+        return {
+            "default": default,
+            "current": dict(manifest.get("current") or {}),
+            "models": models,
+            "loaded_bytes": sum(loaded.values()),
+            "memory_budget_bytes": self.memory_budget or None,
+        }
+
+
+_registry: Optional[ModelRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> ModelRegistry:
+    """The process-wide registry, configured from the app config on first use."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                config = current_app.config
+                backend = model_service.get_backend_name()
+                _registry = ModelRegistry(
+                    config["MODELS_DIR"],
+                    backend=backend,
+                    int8=model_service.get_precision() == "int8" and backend == "onnx",
+                    memory_budget_bytes=int(float(config.get("MODEL_MEMORY_BUDGET_MB", 0)) * 1024 * 1024),
+                    manifest_name=config.get("MODEL_REGISTRY_MANIFEST", "models.json"),
+                    refresh_interval=config.get("MODEL_REGISTRY_REFRESH_S", 2.0),
+                    default_model=config.get("DEFAULT_MODEL", ""),
+                )
+    return _registry
+
+
+def peek_registry() -> Optional[ModelRegistry]:
+    """The registry if one was created in this process, without creating it."""
+    return _registry
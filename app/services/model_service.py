@@ -1,225 +1,1066 @@
 import base64
 import io
 import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple
 
 from flask import current_app
 
-# Optional heavy deps
-YOLO = None
-YOLO_AVAILABLE = False
-Image = None
-cv2 = None
-np = None
+from app.services import metrics
+from app.services.lazy_imports import LazyImport, available, import_error
+from app.services.result_cache import get_result_cache, make_cache_key
+from app.services.upload_store import get_upload_store
 
-# Environment flags
+# Optional heavy deps, imported on first use (see lazy_imports): serving the HTML
+# pages or /api/status never imports torch, ultralytics or OpenCV
 SKIP_YOLO_IMPORT = str(os.environ.get("SKIP_YOLO_IMPORT", "")).lower() in ("1", "true", "yes")
 SKIP_IMAGE_IMPORTS = (
     str(os.environ.get("SKIP_IMAGE_IMPORTS", "")).lower() in ("1", "true", "yes") or SKIP_YOLO_IMPORT
 )
 
 
-def _import_yolo() -> None:
-    global YOLO, YOLO_AVAILABLE, _last_error
-    if SKIP_YOLO_IMPORT:
-        print("[WARN] SKIP_YOLO_IMPORT is set - skipping YOLO import.")
-        return
-    try:
-        # Patch torch.load for PyTorch 2.6+ compatibility
-        import torch
-        # Patch torch.load to set weights_only=False by default for YOLO models
+def _check_callable(target: Any) -> None:
+    if not callable(target):
+        raise TypeError("YOLO class not callable")
+
+
+YOLO = LazyImport("ultralytics", "YOLO", skip_reason="SKIP_YOLO_IMPORT" if SKIP_YOLO_IMPORT else None, check=_check_callable)
+_image_skip = "SKIP_IMAGE_IMPORTS" if SKIP_IMAGE_IMPORTS else None
+Image = LazyImport("PIL.Image", skip_reason=_image_skip)
+cv2 = LazyImport("cv2", skip_reason=_image_skip)
+np = LazyImport("numpy", skip_reason=_image_skip)
+
+
+def yolo_available() -> bool:
+    """Import ultralytics if needed; False (with ``get_last_model_error()`` set) if it cannot be used."""
+    global _last_error
+    if available(YOLO):
+        return True
+    _last_error = import_error(YOLO)
+    return False
+
+
+_torch_load_lock = threading.Lock()
+
+
+@contextmanager
+def allow_pickle_checkpoints():
+    """Let ultralytics unpickle ``.pt`` checkpoints while the block runs.
+
+    torch 2.6+ loads with ``weights_only=True`` by default, which rejects the
+    pickled model objects in ultralytics checkpoints. Unpickling can run
+    arbitrary code, so this is scoped to loading trusted files.
+    ``.safetensors`` artifacts (tools/convert_ckpt.py) never need it.
+    """
+    import torch
+
+    with _torch_load_lock:
         original_torch_load = torch.load
+
         def patched_torch_load(*args, **kwargs):
-            # Only patch if weights_only is not explicitly set
-            if 'weights_only' not in kwargs:
-                kwargs['weights_only'] = False
+            kwargs.setdefault("weights_only", False)
             return original_torch_load(*args, **kwargs)
+
         torch.load = patched_torch_load
-        print("[OK] Patched torch.load for PyTorch 2.6+ compatibility (weights_only=False)")
+        try:
+            yield
+        finally:
+            torch.load = original_torch_load
 
-        from ultralytics import YOLO as _YOLO
 
-        YOLO = _YOLO
-        YOLO_AVAILABLE = True
-        if not callable(YOLO):
-            print("[WARN] YOLO class not callable")
-            YOLO_AVAILABLE = False
-    except Exception as e:
-        _last_error = f"YOLO import failed: {e}"
-        print(f"[ERROR] {_last_error}")
-        import traceback
-        print(f"   Traceback: {traceback.format_exc()}")
-        YOLO = None
-        YOLO_AVAILABLE = False
+_last_error: Optional[str] = None
 
 
-def _import_image_libs() -> None:
-    global Image, cv2, np
-    if SKIP_IMAGE_IMPORTS:
-        print("[WARN] SKIP_IMAGE_IMPORTS is set - skipping Pillow/OpenCV/numpy.")
-        return
-    try:
-        from PIL import Image as _Image
-        Image = _Image
-    except Exception:
-        Image = None
-    try:
-        import cv2 as _cv2
-        cv2 = _cv2
-    except Exception:
-        cv2 = None
-    try:
-        import numpy as _np
-        np = _np
-    except Exception:
-        np = None
+# Inference backends. Every backend is an artifact layout that ultralytics'
+# AutoBackend can load behind the same ``YOLO(...)`` call, so all of them return
+# the same ``Results`` objects and therefore the same detection dicts.
+MODEL_BACKENDS: Dict[str, Dict[str, Any]] = {
+    # .safetensors: memory-mapped artifact from tools/convert_ckpt.py, preferred over pickled .pt
+    "pytorch": {"suffix": ".pt", "mmap_suffix": ".safetensors", "export_format": None, "batching": True},
+    "torchscript": {"suffix": ".torchscript", "export_format": "torchscript", "batching": False},
+    "onnx": {"suffix": ".onnx", "export_format": "onnx", "batching": True},
+    "openvino": {"suffix": "_openvino_model", "export_format": "openvino", "batching": True},
+}
+DEFAULT_BACKEND = "pytorch"
 
+# MODEL_PRECISION values. fp16/bf16 apply to the pytorch backend; int8 selects a
+# statically quantized ONNX artifact (``<stem>_int8.onnx``, see tools/quantize_model.py).
+MODEL_PRECISIONS = ("fp32", "fp16", "bf16", "int8")
+INT8_STEM_SUFFIX = "_int8"
 
-_import_yolo()
-_import_image_libs()
+# Last-resort weights, downloaded by ultralytics when not present
+FALLBACK_WEIGHTS = Path("yolov8n.pt")
 
-# Model cache
-_model_cache: Optional[Any] = None
-_last_error: Optional[str] = None
 
+def get_backend_name() -> str:
+    """Return the configured MODEL_BACKEND, falling back to pytorch if unknown."""
+    name = str(current_app.config.get("MODEL_BACKEND", DEFAULT_BACKEND)).strip().lower()
+    if name not in MODEL_BACKENDS:
+        print(f"[WARN] Unknown MODEL_BACKEND '{name}' - using {DEFAULT_BACKEND}")
+        return DEFAULT_BACKEND
+    return name
 
-def _discover_model_paths(models_dir: Path) -> List[Path]:
+
+def get_precision() -> str:
+    """Return the configured MODEL_PRECISION, falling back to fp32 if unknown."""
+    name = str(current_app.config.get("MODEL_PRECISION", "fp32")).strip().lower()
+    if name not in MODEL_PRECISIONS:
+        print(f"[WARN] Unknown MODEL_PRECISION '{name}' - using fp32")
+        return "fp32"
+    return name
+
+
+def _discover_model_paths(models_dir: Path, backend: str = DEFAULT_BACKEND, int8: bool = False) -> List[Path]:
+    """Candidate artifacts for ``backend``; quantized ``*_int8`` files only when ``int8`` is set."""
+    spec = MODEL_BACKENDS[backend]
+    suffixes = [spec["mmap_suffix"], spec["suffix"]] if spec.get("mmap_suffix") and not int8 else [spec["suffix"]]
+    ordered: List[Path] = []
+    for suffix in suffixes:
+        ordered.extend(_discover_with_suffix(models_dir, suffix, int8))
+    if backend == DEFAULT_BACKEND and not int8:
+        ordered.append(FALLBACK_WEIGHTS)
+    return ordered
+
+
+def _discover_with_suffix(models_dir: Path, suffix: str, int8: bool) -> List[Path]:
     candidates: List[Path] = []
     try:
         for fname in os.listdir(models_dir):
-            if fname.lower().endswith(".pt"):
-                candidates.append(models_dir / fname)
+            if fname.lower().endswith(suffix):
+                is_int8 = fname.lower()[: -len(suffix)].endswith(INT8_STEM_SUFFIX)
+                if is_int8 == int8:
+                    candidates.append(models_dir / fname)
     except Exception:
         pass
+    if int8:
+        suffix = INT8_STEM_SUFFIX + suffix
 
-    preferred = ["best(1).pt", "best (1).pt", "best.pt", "model.pt", "last.pt", "custom_yolov8.pt"]
+    # Exported artifacts keep the stem of the weights they came from, so the
+    # preference order is matched on the stem for every backend.
+    preferred = ["best(1)", "best (1)", "best", "model", "last", "custom_yolov8"]
     ordered: List[Path] = []
 
     def norm_name(p: Path) -> str:
         return p.name.strip().lower().replace(" ", "")
 
     for key in preferred:
-        key_norm = key.replace(" ", "").lower()
+        key_norm = (key + suffix).replace(" ", "").lower()
         for c in list(candidates):
             if norm_name(c) == key_norm:
                 ordered.append(c)
                 candidates.remove(c)
     ordered.extend(candidates)
-    ordered.append(Path("yolov8n.pt"))
     return ordered
 
 
-def load_model() -> Optional[Any]:
-    """Load YOLO model with caching."""
-    global _model_cache
+def load_pytorch_weights(path: Path) -> Any:
+    """``YOLO`` for a ``.safetensors`` artifact (memory-mapped) or a pickled ``.pt`` checkpoint."""
+    if str(path).lower().endswith(MODEL_BACKENDS[DEFAULT_BACKEND]["mmap_suffix"]):
+        from app.services import weights_artifact
+
+        return weights_artifact.load_yolo(Path(path), YOLO)
+    with allow_pickle_checkpoints():
+        return YOLO(str(path))
+
+
+def _pickle_allowed(path: Path) -> bool:
+    if str(path).lower().endswith(".pt") and not current_app.config.get("ALLOW_PICKLE_WEIGHTS", True):
+        print(f"[WARN] Skipping pickled checkpoint {path} (ALLOW_PICKLE_WEIGHTS=0) - convert it with tools/convert_ckpt.py")
+        return False
+    return True
+
+
+def _artifact_identity(path: Path, backend: str) -> str:
+    """Identify a weights artifact by path, size and mtime so a swapped file is a new model."""
+    try:
+        st = path.stat()
+        return f"{backend}:{path}:{st.st_size}:{st.st_mtime_ns}"
+    except OSError:
+        return f"{backend}:{path}"
+
+
+def load_artifact(candidates: List[Tuple[Path, str]]) -> Tuple[Optional[Any], Dict[str, Any]]:
+    """Load the first loadable ``(path, backend)`` candidate; returns ``(model, info)`` or ``(None, {})``.
+
+    ``info`` has the artifact's ``path``, ``backend``, applied ``precision`` and
+    ``identity`` (used in result-cache keys).
+    """
     global _last_error
-    if not YOLO_AVAILABLE or YOLO is None:
-        _last_error = "Cannot load model: YOLO not available"
+    if not yolo_available():
+        _last_error = f"Cannot load model: YOLO not available ({_last_error})"
         print(f"[ERROR] {_last_error}")
+        metrics.ERRORS_TOTAL.inc("model_service", "yolo_unavailable")
+        return None, {}
+    configure_concurrency()
+    for path, backend in candidates:
+        # Resolve path to absolute before checking
+        resolved_path = path.resolve() if not path.is_absolute() else path
+        if not (resolved_path.exists() or path == FALLBACK_WEIGHTS) or not _pickle_allowed(resolved_path):
+            continue
+        try:
+            print(f"Attempting to load {backend} model from: {resolved_path}")
+            if backend == DEFAULT_BACKEND:
+                model = load_pytorch_weights(resolved_path if resolved_path.exists() else path)
+            else:
+                # Exported artifacts carry no task metadata ultralytics can trust
+                model = YOLO(str(resolved_path), task="detect")
+        except Exception as e:
+            _last_error = f"Error loading model from {resolved_path}: {e}"
+            print(f"[ERROR] {_last_error}")
+            import traceback
+            print(f"   Traceback: {traceback.format_exc()}")
+            continue
+        print(f"[OK] Model loaded: {resolved_path}")
+        info = {
+            "path": str(resolved_path),
+            "backend": backend,
+            "identity": _artifact_identity(resolved_path, backend),
+        }
+        return model, _configure_precision(model, info)
+    return None, {}
+
+
+def load_model(name: Optional[str] = None) -> Optional[Any]:
+    """Return a model from the registry, loading it on first use.
+
+    ``name`` is ``"name@version"``, a bare ``"name"`` (that name's current
+    version) or None for the default model (see ``model_registry``). Returns
+    None if the model cannot be loaded (``get_last_model_error()`` says why),
+    and raises ``UnknownModelError`` for names with no artifact in MODELS_DIR.
+    """
+    from app.services.model_registry import get_registry
+
+    return get_registry().get(name)
+
+
+def _configure_precision(model: Any, info: Dict[str, Any]) -> Dict[str, Any]:
+    """Apply MODEL_PRECISION / MODEL_CHANNELS_LAST to a freshly loaded model; returns the updated info."""
+    requested = get_precision()
+    channels_last = bool(current_app.config.get("MODEL_CHANNELS_LAST", False))
+    backend = info.get("backend", DEFAULT_BACKEND)
+    applied = "int8" if info.get("path", "").lower().endswith(INT8_STEM_SUFFIX + ".onnx") else "fp32"
+
+    if backend == DEFAULT_BACKEND and (requested in ("fp16", "bf16") or channels_last):
+        try:
+            from app.services import precision
+
+            applied = precision.enable_reduced_precision(
+                model, requested if requested in ("fp16", "bf16") else "fp32", channels_last
+            )
+            print(f"[OK] Model precision: {applied}{' (channels_last)' if channels_last else ''}")
+        except Exception as e:
+            print(f"[WARN] Could not switch model to {requested}: {e} - keeping fp32")
+            channels_last = False
+    elif requested != applied:
+        hint = " (int8 needs MODEL_BACKEND=onnx and tools/quantize_model.py)" if requested == "int8" else ""
+        print(f"[WARN] MODEL_PRECISION={requested} is not available for the {backend} backend - running {applied}{hint}")
+        channels_last = False
+    else:
+        channels_last = channels_last and backend == DEFAULT_BACKEND
+
+    # Precision changes the outputs slightly, so it is part of the result-cache identity
+    return {
+        **info,
+        "precision": applied,
+        "channels_last": channels_last,
+        "identity": f"{info.get('identity', '')}:{applied}{':cl' if channels_last else ''}",
+    }
+
+
+def estimate_model_bytes(model: Any, path: Optional[str] = None) -> int:
+    """Approximate memory held by a loaded model: tensor bytes for torch, artifact size otherwise."""
+    predictor = getattr(model, "predictor", None)
+    net = getattr(predictor, "model", None) or getattr(model, "model", None)
+    if hasattr(net, "parameters") and hasattr(net, "buffers"):
+        return sum(t.numel() * t.element_size() for t in (*net.parameters(), *net.buffers()))
+    if path:
+        artifact = Path(path)
+        if artifact.is_dir():
+            return sum(f.stat().st_size for f in artifact.rglob("*") if f.is_file())
+        if artifact.exists():
+            return artifact.stat().st_size
+    return 0
+
+
+def get_model_info(model: Any = None) -> Dict[str, Any]:
+    """Registry key, path, backend and precision of ``model`` (default: the default model).
+
+    Empty if that model is not loaded.
+    """
+    from app.services.model_registry import peek_registry
+
+    registry = peek_registry()
+    return registry.info(model) if registry is not None else {}
+
+
+def get_model_identity(model: Any) -> str:
+    """Return a string identifying the weights behind ``model``, for result cache keys."""
+    identity = get_model_info(model).get("identity")
+    return identity or f"{type(model).__name__}@{id(model)}"
+
+
+# Startup warm-up progress, reported by /api/status
+_warmup_state: Dict[str, Any] = {"status": "pending", "runs": 0, "imgsz": None, "sizes": [], "seconds": None, "error": None}
+
+
+def warmup_model(model: Any, imgsz: int = 640, runs: int = 2, sizes: Optional[List[int]] = None) -> Dict[str, Any]:
+    """Run ``runs`` throwaway inferences so the first real request is not the slow one.
+
+    Each of the other ``sizes`` (see ``resolution``) gets one more run at that size.
+    """
+    global _warmup_state
+    if not available(np):
+        _warmup_state = {**_warmup_state, "status": "skipped", "error": "numpy not available"}
+        return dict(_warmup_state)
+    _warmup_state = {"status": "running", "runs": 0, "imgsz": imgsz, "sizes": [], "seconds": None, "error": None}
+    started = time.perf_counter()
+    try:
+        for i in range(max(0, int(runs))):
+            model(np.zeros((imgsz, imgsz, 3), dtype=np.uint8), imgsz=imgsz, verbose=False)
+            _warmup_state["runs"] = i + 1
+        for size in sizes or []:
+            model(np.zeros((size, size, 3), dtype=np.uint8), imgsz=size, verbose=False)
+            _warmup_state["sizes"].append(size)
+    except Exception as e:
+        _warmup_state.update(status="failed", error=str(e), seconds=round(time.perf_counter() - started, 3))
+        print(f"[ERROR] Model warm-up failed: {e}")
+        return dict(_warmup_state)
+    _warmup_state.update(status="done", seconds=round(time.perf_counter() - started, 3))
+    extra = f" (+ {', '.join(str(s) for s in _warmup_state['sizes'])})" if _warmup_state["sizes"] else ""
+    print(f"[OK] Model warm-up: {_warmup_state['runs']} run(s) at imgsz={imgsz}{extra} in {_warmup_state['seconds']}s")
+    return dict(_warmup_state)
+
+
+def preload_model() -> Optional[Any]:
+    """Load the model and warm it up; called from create_app() when PRELOAD_MODEL is set."""
+    global _warmup_state
+    started = time.perf_counter()
+    model = load_model()
+    if model is None:
+        _warmup_state = {**_warmup_state, "status": "failed", "error": _last_error}
         return None
-    if _model_cache is not None:
-        return _model_cache
+    print(f"[OK] Model preloaded in {time.perf_counter() - started:.2f}s")
+    from app.services.resolution import warmup_sizes
 
-    models_dir: Path = current_app.config["MODELS_DIR"]
-    discovered = _discover_model_paths(models_dir)
-    print(f"Searching for model files in: {models_dir}")
-    print(f"Discovered models: {discovered}")
+    config = current_app.config
+    warmup_model(
+        model, imgsz=config.get("INFERENCE_IMGSZ", 640), runs=config.get("WARMUP_RUNS", 2), sizes=warmup_sizes(model)
+    )
+    return model
 
-    for path in discovered:
-        # Resolve path to absolute before checking
-        resolved_path = path.resolve() if not path.is_absolute() else path
-        if resolved_path.exists():
+
+def get_warmup_state() -> Dict[str, Any]:
+    """Return the current warm-up status (pending/running/done/failed/skipped)."""
+    return dict(_warmup_state)
+
+
+class _PendingInference:
+    """A single caller's frame waiting for a batched forward pass."""
+
+    __slots__ = ("source", "imgsz", "conf", "future")
+
+    def __init__(self, source: Any, imgsz: int, conf: float) -> None:
+        self.source = source
+        self.imgsz = imgsz
+        self.conf = conf
+        self.future: Future = Future()
+
+    @property
+    def key(self) -> Tuple[str, int, float]:
+        # Ultralytics cannot mix file paths and arrays in one call, and imgsz/conf
+        # apply to the whole batch, so only compatible frames are grouped.
+        kind = "path" if isinstance(self.source, (str, Path)) else "array"
+        return kind, self.imgsz, self.conf
+
+
+class InferenceBatcher:
+    """Gather frames from concurrent requests into one batched forward pass.
+
+    Callers block in ``predict()`` while a background thread collects up to
+    ``max_batch_size`` frames, or whatever arrived within ``max_wait_ms`` of the
+    first one, runs the model once and hands each caller back its own ``Results``.
+    """
+
+    def __init__(
+        self, model: Any, max_batch_size: int = 8, max_wait_ms: float = 10.0, fast_preprocess: bool = True
+    ) -> None:
+        self.model = model
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.fast_preprocess = fast_preprocess
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[_PendingInference]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._closed = False
+
+    def submit(self, source: Any, imgsz: int = 640, conf: float = 0.25) -> Future:
+        """Queue one image (array or path); the future resolves to its ``Results``."""
+        item = _PendingInference(source, int(imgsz), float(conf))
+        with self._lock:
+            closed = self._closed
+            if not closed:
+                self._ensure_worker()
+                self._queue.put(item)
+        if closed:
+            # The model was unloaded while this request held it: serve it inline
+            try:
+                item.future.set_result(
+                    run_model(self.model, [source], imgsz=imgsz, conf=conf, fast_preprocess=self.fast_preprocess)[0]
+                )
+            except Exception as e:
+                item.future.set_exception(e)
+        return item.future
+
+    def close(self) -> None:
+        """Stop the dispatch thread after the frames already queued (the model was unloaded)."""
+        with self._lock:
+            if not self._closed:
+                self._closed = True
+                self._queue.put(None)
+
+    def predict(self, source: Any, imgsz: int = 640, conf: float = 0.25, timeout: Optional[float] = None) -> Any:
+        """Submit one image and wait for its ``Results``."""
+        return self.submit(source, imgsz=imgsz, conf=conf).result(timeout=timeout)
+
+    def _ensure_worker(self) -> None:
+        """Start the dispatch thread if needed; called with ``self._lock`` held."""
+        pid = os.getpid()
+        if self._thread is not None and self._pid == pid and self._thread.is_alive():
+            return
+        if self._pid != pid:
+            # Threads do not survive fork(): a worker forked from a preloaded
+            # parent starts with a fresh queue and its own dispatch thread.
+            self._queue = queue.Queue()
+        self._pid = pid
+        self._thread = threading.Thread(target=self._run, name="inference-batcher", daemon=True)
+        self._thread.start()
+
+    def _collect(self) -> List[_PendingInference]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size and batch[-1] is not None:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            groups: Dict[Tuple[str, int, float], List[_PendingInference]] = {}
+            for item in batch:
+                if item is not None and item.future.set_running_or_notify_cancel():
+                    groups.setdefault(item.key, []).append(item)
+            for (_, imgsz, conf), items in groups.items():
+                self._dispatch(items, imgsz, conf)
+            if None in batch:
+                return
+
+    def _dispatch(self, items: List[_PendingInference], imgsz: int, conf: float) -> None:
+        metrics.BATCH_SIZE.observe(len(items))
+        try:
+            with metrics.timed("batch_forward"):
+                results = run_model(
+                    self.model, [item.source for item in items], imgsz=imgsz, conf=conf,
+                    fast_preprocess=self.fast_preprocess,
+                )
+            if len(results) != len(items):
+                raise RuntimeError(f"Batched inference returned {len(results)} results for {len(items)} inputs")
+        except Exception as e:
+            print(f"[ERROR] Batched inference failed for {len(items)} frame(s): {e}")
+            metrics.ERRORS_TOTAL.inc("batcher", "forward")
+            for item in items:
+                item.future.set_exception(e)
+            return
+        for item, result in zip(items, results):
+            item.future.set_result(result)
+
+
+_batchers: Dict[int, InferenceBatcher] = {}
+_batchers_lock = threading.Lock()
+
+
+def get_batcher(model: Any) -> Optional[InferenceBatcher]:
+    """Return the shared batcher for ``model``, or None when batching is disabled.
+
+    Only registry-held models get one: a model that was just unloaded is run
+    inline instead of getting a dispatch thread that would keep it alive.
+    """
+    config = current_app.config
+    if not config.get("INFERENCE_BATCHING", False):
+        return None
+    info = get_model_info(model)
+    if not info:
+        return None
+    key = id(model)
+    batcher = _batchers.get(key)
+    if batcher is None or batcher.model is not model:
+        with _batchers_lock:
+            batcher = _batchers.get(key)
+            if batcher is None or batcher.model is not model:
+                max_batch_size = config.get("INFERENCE_BATCH_MAX_SIZE", 8)
+                if not MODEL_BACKENDS.get(info.get("backend", DEFAULT_BACKEND), {}).get("batching", True):
+                    # Fixed-batch exports still go through the queue, one frame per pass
+                    max_batch_size = 1
+                batcher = InferenceBatcher(
+                    model,
+                    max_batch_size=max_batch_size,
+                    max_wait_ms=config.get("INFERENCE_BATCH_MAX_WAIT_MS", 10.0),
+                    fast_preprocess=config.get("PREPROCESS_FAST_PATH", True),
+                )
+                _batchers[key] = batcher
+    return batcher
+
+
+def release_batcher(model: Any) -> None:
+    """Stop and forget ``model``'s batcher; called when the registry unloads it."""
+    with _batchers_lock:
+        batcher = _batchers.get(id(model))
+        if batcher is not None and batcher.model is model:
+            del _batchers[id(model)]
+        else:
+            batcher = None
+    if batcher is not None:
+        batcher.close()
+
+
+# Concurrency settings of this process, applied by configure_concurrency() when a model
+# is loaded: how many instances of a model may run forward passes at once (see ModelPool),
+# and the torch / OpenCV thread counts
+_replicas = 1
+_thread_limits: Optional[Tuple[int, int]] = None
+_thread_limits_pid: Optional[int] = None
+
+
+def cpu_count() -> int:
+    """Cores this process may run on (its affinity mask where the OS has one)."""
+    if hasattr(os, "sched_getaffinity"):
+        return max(1, len(os.sched_getaffinity(0)))
+    return max(1, os.cpu_count() or 1)
+
+
+def default_thread_count(config: Any, processes: Optional[int] = None) -> int:
+    """Threads per forward pass: the cores split across worker processes and concurrent passes.
+
+    ``processes`` defaults to ``WEB_CONCURRENCY`` (gunicorn workers on the host).
+    """
+    if processes is None:
+        processes = int(config.get("WEB_CONCURRENCY", 1))
+    concurrent = max(1, int(config.get("INFERENCE_REPLICAS", 1)))
+    return max(1, cpu_count() // (max(1, processes) * concurrent))
+
+
+def configure_concurrency() -> Dict[str, Any]:
+    """Read INFERENCE_REPLICAS and the thread counts from the app config and apply them to this process."""
+    global _replicas, _thread_limits, _thread_limits_pid
+    config = current_app.config
+    _replicas = max(0, int(config.get("INFERENCE_REPLICAS", 1)))
+    torch_threads = int(config.get("TORCH_NUM_THREADS", 0)) or default_thread_count(config)
+    opencv_threads = int(config.get("OPENCV_NUM_THREADS", 0)) or torch_threads
+    if _thread_limits != (torch_threads, opencv_threads):
+        _thread_limits, _thread_limits_pid = (torch_threads, opencv_threads), None
+    _apply_thread_limits()
+    return get_concurrency_info()
+
+
+def _apply_thread_limits() -> None:
+    """Set the torch and OpenCV thread pools once per process (forked workers redo it)."""
+    global _thread_limits_pid
+    pid = os.getpid()
+    if _thread_limits is None or _thread_limits_pid == pid:
+        return
+    _thread_limits_pid = pid
+    torch_threads, opencv_threads = _thread_limits
+    try:
+        import torch
+
+        torch.set_num_threads(torch_threads)
+    except Exception as e:
+        print(f"[WARN] Could not set torch threads to {torch_threads}: {e}")
+    if available(cv2):
+        cv2.setNumThreads(opencv_threads)
+    print(f"[OK] Inference threads: torch={torch_threads} opencv={opencv_threads} replicas={_replicas} (pid {pid})")
+
+
+def get_concurrency_info() -> Dict[str, Any]:
+    torch_threads, opencv_threads = _thread_limits or (None, None)
+    return {"replicas": _replicas, "torch_threads": torch_threads, "opencv_threads": opencv_threads, "cpus": cpu_count()}
+
+
+def replicate_model(model: Any) -> Any:
+    """An independent copy of a loaded model (weights, predictor and precision settings included).
+
+    The predictor's lock cannot be copied; the copy gets a fresh one. Raises if
+    the backend cannot be copied (ONNX Runtime and OpenVINO sessions).
+    """
+    import copy
+
+    memo: Dict[int, Any] = {}
+    predictor = getattr(model, "predictor", None)
+    if predictor is not None:
+        lock_types = (type(threading.Lock()), type(threading.RLock()))
+        for value in vars(predictor).values():
+            if isinstance(value, lock_types):
+                memo[id(value)] = type(value)()
+    return copy.deepcopy(model, memo)
+
+
+class ModelPool:
+    """Instances of one model, each running at most one forward pass at a time.
+
+    ``checkout()`` hands a caller an idle instance and blocks while all are busy.
+    With ``size`` 1 that serializes every forward pass on the model; with more,
+    up to ``size`` passes run in parallel on replicas (``replicate_model``), made
+    when the pool is created. Size 0 hands out the shared model without any
+    locking. A model that cannot be copied is served by a pool of one.
+    """
+
+    def __init__(self, model: Any, size: int = 1) -> None:
+        self.model = model
+        self.size = max(0, int(size))
+        self._cond = threading.Condition()
+        self._idle = [model]
+        for _ in range(self.size - 1):
             try:
-                print(f"Attempting to load model from: {resolved_path}")
-                _model_cache = YOLO(str(resolved_path))
-                print(f"[OK] Model loaded: {resolved_path}")
-                return _model_cache
+                self._idle.append(replicate_model(model))
             except Exception as e:
-                _last_error = f"Error loading model from {resolved_path}: {e}"
-                print(f"[ERROR] {_last_error}")
-                import traceback
-                print(f"   Traceback: {traceback.format_exc()}")
-                _model_cache = None
+                print(f"[WARN] Cannot replicate {type(model).__name__} ({e}) - its forward passes run one at a time")
+                break
+        self.instances = len(self._idle)
+        if self.size > 1:
+            print(f"[OK] Model pool: {self.instances} instance(s)")
+
+    @contextmanager
+    def checkout(self):
+        if not self.size:
+            yield self.model
+            return
+        with self._cond:
+            if not self._idle:
+                # Only contended checkouts are timed: the stage shows how long passes queue
+                with metrics.timed("model_wait"):
+                    while not self._idle:
+                        self._cond.wait()
+            instance = self._idle.pop()
+        try:
+            yield instance
+        finally:
+            with self._cond:
+                self._idle.append(instance)
+                self._cond.notify()
+
+
+_pools: Dict[int, ModelPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(model: Any) -> ModelPool:
+    """Return the instance pool for ``model``, sized by INFERENCE_REPLICAS."""
+    key = id(model)
+    pool = _pools.get(key)
+    if pool is None or pool.model is not model:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None or pool.model is not model:
+                pool = ModelPool(model, size=_replicas)
+                _pools[key] = pool
+    return pool
+
+
+def release_pool(model: Any) -> None:
+    """Forget ``model``'s pool and replicas; called when the registry unloads it."""
+    with _pools_lock:
+        pool = _pools.get(id(model))
+        if pool is not None and pool.model is model:
+            del _pools[id(model)]
+
+
+@contextmanager
+def checkout(model: Any):
+    """Borrow an instance of ``model`` for one forward pass (see ``ModelPool``)."""
+    _apply_thread_limits()
+    with get_pool(model).checkout() as instance:
+        yield instance
+
+
+def run_model(
+    model: Any, sources: List[Any], imgsz: int = 640, conf: float = 0.25, fast_preprocess: bool = True
+) -> List[Any]:
+    """One forward pass over ``sources``; returns their ``Results`` in order.
+
+    The pass runs on an instance checked out of the model's pool, so concurrent
+    callers never share a predictor (see ``ModelPool``).
+    """
+    with checkout(model) as instance:
+        return run_instance(instance, sources, imgsz=imgsz, conf=conf, fast_preprocess=fast_preprocess)
+
+
+def run_instance(
+    model: Any, sources: List[Any], imgsz: int = 640, conf: float = 0.25, fast_preprocess: bool = True
+) -> List[Any]:
+    """``run_model`` on an instance the caller already holds (from ``checkout``).
+
+    Frames that are all arrays go through ``preprocess.forward`` once the model's
+    predictor is set up, which letterboxes them into reused buffers; file paths,
+    unsupported models and ``fast_preprocess=False`` use ``model(...)``.
+    """
+    if fast_preprocess and sources and available(np) and all(isinstance(s, np.ndarray) for s in sources):
+        from app.services import preprocess
+
+        if preprocess.supports(model):
+            return preprocess.forward(model, sources, imgsz=imgsz, conf=conf)
+    return list(model(sources, imgsz=imgsz, conf=conf, verbose=False))
+
+
+def predict_one(model: Any, source: Any, imgsz: int = 640, conf: float = 0.25) -> Any:
+    """Run one image through the model and return its ``Results``.
+
+    Goes through the cross-request batcher when ``INFERENCE_BATCHING`` is on,
+    otherwise calls the model directly in the request thread.
+    """
+    batcher = get_batcher(model)
+    if batcher is None:
+        fast = current_app.config.get("PREPROCESS_FAST_PATH", True)
+        return run_model(model, [source], imgsz=imgsz, conf=conf, fast_preprocess=fast)[0]
+    return batcher.predict(source, imgsz=imgsz, conf=conf)
+
+
+def predict_many(model: Any, sources: List[Any], imgsz: int = 640, conf: float = 0.25) -> List[Any]:
+    """Run several images and return their ``Results`` in order.
+
+    With batching enabled the images are queued on the shared batcher, so they
+    are split into ``INFERENCE_BATCH_MAX_SIZE`` chunks and never run concurrently
+    with other requests' forward passes.
+    """
+    batcher = get_batcher(model)
+    if batcher is None:
+        fast = current_app.config.get("PREPROCESS_FAST_PATH", True)
+        return run_model(model, sources, imgsz=imgsz, conf=conf, fast_preprocess=fast)
+    futures = [batcher.submit(source, imgsz=imgsz, conf=conf) for source in sources]
+    return [future.result() for future in futures]
+
+
+def boxes_to_arrays(result: Any) -> Tuple[Any, Any, Any]:
+    """Columnar form of ``result.boxes``: (N, 4) float32 xyxy, (N,) float32 scores, (N,) int64 class ids.
+
+    The whole box tensor is copied to host in one transfer instead of three
+    ``.cpu().numpy()`` calls per box.
+    """
+    boxes = getattr(result, "boxes", None)
+    if boxes is None or len(boxes) == 0:
+        return np.zeros((0, 4), dtype=np.float32), np.zeros((0,), dtype=np.float32), np.zeros((0,), dtype=np.int64)
+    # Rows are x1, y1, x2, y2, [track id,] conf, cls
+    data = boxes.data.cpu().numpy()
+    return (
+        data[:, :4].astype(np.float32, copy=False),
+        data[:, -2].astype(np.float32, copy=False),
+        data[:, -1].astype(np.int64),
+    )
+
+
+def scale_boxes(xyxy: Any, scale: Tuple[float, float]) -> Any:
+    """``xyxy`` with x scaled by ``scale[0]`` and y by ``scale[1]``; a new array, same dtype."""
+    sx, sy = scale
+    return xyxy * np.array([sx, sy, sx, sy], dtype=xyxy.dtype)
+
+
+def class_name(names: Any, cls: int) -> str:
+    """Look up a class label in a ``Results.names`` dict/list, with a ``class_<id>`` fallback."""
+    try:
+        return str(names[cls])
+    except (KeyError, IndexError, TypeError):
+        return f"class_{cls}"
+
+
+def detections_from_arrays(xyxy: Any, scores: Any, classes: Any, names: Any) -> List[Dict[str, Any]]:
+    """Build the API's detection dicts from columnar arrays in one pass."""
+    if len(xyxy) == 0:
+        return []
+    class_ids = classes.tolist()
+    labels = {cls: class_name(names, cls) for cls in set(class_ids)}
+    return [
+        {"bbox": box, "confidence": score, "class": labels[cls], "class_id": cls}
+        for box, score, cls in zip(xyxy.tolist(), scores.tolist(), class_ids)
+    ]
+
+
+def detections_from_result(result: Any) -> List[Dict[str, Any]]:
+    """Detection dicts (bbox xyxy, confidence, class, class_id) for one ``Results``."""
+    return detections_from_arrays(*boxes_to_arrays(result), getattr(result, "names", None))
+
+
+def get_tiling_options(**overrides: Any) -> Dict[str, Any]:
+    """Tiling settings from config (TILE_*), with per-call overrides."""
+    config = current_app.config
+    options = {
+        "tile_size": config.get("TILE_SIZE", 640),
+        "overlap": config.get("TILE_OVERLAP", 0.2),
+        "max_tiles": config.get("TILE_MAX_TILES", 64),
+        "merge": config.get("TILE_MERGE", "nms"),
+        "merge_iou": config.get("TILE_MERGE_IOU", 0.5),
+        "include_full": config.get("TILE_INCLUDE_FULL_IMAGE", True),
+    }
+    options.update({k: v for k, v in overrides.items() if v is not None})
+    return options
+
+
+def predict_tiled(model: Any, img: Any, conf: float = 0.25, **overrides: Any) -> List[Dict[str, Any]]:
+    """Sliced inference for high-resolution images, as detection dicts (see ``predict_tiled_arrays``)."""
+    return detections_from_arrays(*predict_tiled_arrays(model, img, conf=conf, **overrides))
+
+
+def predict_tiled_arrays(model: Any, img: Any, conf: float = 0.25, **overrides: Any) -> Tuple[Any, Any, Any, Any]:
+    """Sliced inference for high-resolution images; returns ``(xyxy, scores, class_ids, names)``.
+
+    The image is cut into overlapping tiles that are run at their native
+    resolution, so small targets keep their pixels. The tile boxes are shifted
+    back into full-image coordinates and merged across tiles with NMS or WBF.
+    A downscaled pass over the whole image is included by default so that
+    objects larger than a tile are still found. Tiles are views into ``img``, and
+    at most ``TILE_MAX_TILES`` of them are run, ``TILE_BATCH_SIZE`` per forward
+    pass, so peak memory depends on the chunk size and not on the image size.
+    """
+    from app.services import tiling
+
+    options = get_tiling_options(**overrides)
+    height, width = img.shape[:2]
+    tiles = tiling.tile_grid(height, width, options["tile_size"], options["overlap"], options["max_tiles"])
+    sources = [img[y1:y2, x1:x2] for x1, y1, x2, y2 in tiles]
+    offsets = [(x1, y1) for x1, y1, _, _ in tiles]
+    if options["include_full"] and len(tiles) > 1:
+        sources.append(img)
+        offsets.append((0, 0))
+
+    tile_imgsz = int(max(32, options["tile_size"]))
+    chunk = max(1, int(current_app.config.get("TILE_BATCH_SIZE", 8)))
+
+    all_boxes, all_scores, all_classes = [], [], []
+    names: Dict[int, str] = {}
+    for start in range(0, len(sources), chunk):
+        # Each chunk's Results (and their tensors) are reduced to boxes before the next one runs
+        results = predict_many(model, sources[start:start + chunk], imgsz=tile_imgsz, conf=conf)
+        for (dx, dy), result in zip(offsets[start:start + chunk], results):
+            names = getattr(result, "names", names) or names
+            xyxy, scores, classes = boxes_to_arrays(result)
+            if len(xyxy) == 0:
                 continue
+            # Not in place: on CPU the arrays share memory with the Results tensors
+            all_boxes.append(xyxy + np.array([dx, dy, dx, dy], dtype=np.float32))
+            all_scores.append(scores)
+            all_classes.append(classes)
+        del results
+    if not all_boxes:
+        empty = boxes_to_arrays(None)
+        return (*empty, names)
+
+    merged_boxes, merged_scores, merged_classes = tiling.merge_boxes(
+        np.concatenate(all_boxes),
+        np.concatenate(all_scores),
+        np.concatenate(all_classes),
+        method=str(options["merge"]).lower(),
+        iou_threshold=float(options["merge_iou"]),
+    )
+    return merged_boxes, merged_scores, merged_classes, names
+
+
+def run_inference_on_path(
+    model: Any, path: str, conf: float = 0.25, tiled: bool = False, imgsz: Any = None, **tile_overrides: Any
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Run YOLO inference on file path; return detections and annotated path.
+
+    ``imgsz`` is a size from INFERENCE_IMGSZ_CHOICES, ``"auto"`` or None for
+    the configured policy (see ``resolution``). ``tiled=True`` switches to sliced
+    inference (see ``predict_tiled``) for large images. Identical image bytes
+    with the same model, ``conf``, imgsz and tiling settings are answered from
+    the result cache without touching the model.
+    """
+    from app.services import resolution
+
+    imgsz = resolution.resolve_imgsz(model, imgsz, lambda: resolution.image_shape(path))
+    cache = get_result_cache()
+    cache_key = None
+    if cache is not None:
+        variant = ""
+        if tiled:
+            variant = "tiled:" + ",".join(f"{k}={v}" for k, v in sorted(get_tiling_options(**tile_overrides).items()))
+        try:
+            with open(path, "rb") as f:
+                cache_key = make_cache_key(f.read(), get_model_identity(model), conf, imgsz, variant)
+        except OSError as e:
+            print(f"[WARN] Result cache: could not read {path}: {e}")
+        if cache_key is not None:
+            cached = cache.get(cache_key)
+            if cached is not None:
+                return list(cached["detections"]), cached.get("annotated_path")
+
+    if tiled:
+        return _run_tiled_inference_on_path(model, path, conf, cache, cache_key, tile_overrides)
+
+    metrics.IMGSZ_TOTAL.inc(imgsz)
+    with metrics.timed("forward"):
+        results = [predict_one(model, path, imgsz=imgsz, conf=conf)]
+    with metrics.timed("plot"):
+        annotated = results[0].plot(line_width=2)
+    store = get_upload_store()
+    annotated_path = store.annotated_path(path, f"{get_model_identity(model)}|{conf}|{imgsz}")
 
-    # fallback default
     try:
-        print("Loading default yolov8n.pt ...")
-        _model_cache = YOLO("yolov8n.pt")
-        return _model_cache
+        with metrics.timed("annotated_save"):
+            if not store.write_annotated(annotated, annotated_path):
+                raise RuntimeError(f"could not encode {store.annotated_format}")
     except Exception as e:
-        _last_error = f"Error loading default model: {e}"
-        print(f"[ERROR] {_last_error}")
-        _model_cache = None
-        return None
+        print(f"Could not save annotated image: {e}")
+        metrics.ERRORS_TOTAL.inc("run_inference_on_path", "annotated_save")
+        annotated_path = None
 
+    with metrics.timed("box_extract"):
+        detections = detections_from_result(results[0])
 
-def run_inference_on_path(model: Any, path: str, conf: float = 0.25) -> Tuple[List[Dict[str, Any]], Optional[str]]:
-    """Run YOLO inference on file path; return detections and annotated path."""
-    results = model(path, imgsz=640, conf=conf, verbose=False)
-    annotated = results[0].plot(line_width=2)
-    annotated_filename = f"annotated_{os.path.basename(path)}"
-    annotated_path = current_app.config["UPLOAD_FOLDER"] / annotated_filename
+    annotated_str = str(annotated_path) if annotated_path else None
+    if cache_key is not None:
+        cache.put(cache_key, {"detections": detections, "annotated_path": annotated_str})
+    return detections, annotated_str
 
+
+def _run_tiled_inference_on_path(
+    model: Any, path: str, conf: float, cache: Any, cache_key: Optional[str], tile_overrides: Dict[str, Any]
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    img = cv2.imread(path, cv2.IMREAD_COLOR) if available(cv2) else None
+    if img is None:
+        raise ValueError(f"Could not read image: {path}")
+    with metrics.timed("forward_tiled"):
+        detections = predict_tiled(model, img, conf=conf, **tile_overrides)
+
+    store = get_upload_store()
+    variant = ",".join(f"{k}={v}" for k, v in sorted(get_tiling_options(**tile_overrides).items()))
+    annotated_path = store.annotated_path(path, f"{get_model_identity(model)}|{conf}|tiled:{variant}")
     try:
-        if cv2 is not None and Image is not None:
-            annotated_rgb = cv2.cvtColor(annotated, cv2.COLOR_BGR2RGB)
-            im_pil = Image.fromarray(annotated_rgb)
-            im_pil.save(annotated_path)
-        elif Image is not None:
-            Image.fromarray(annotated).save(annotated_path)
-        elif cv2 is not None:
-            cv2.imwrite(str(annotated_path), annotated)
-        else:
+        # Scale the line width with the image so boxes stay visible on 4000+ px frames
+        line_width = max(2, int(round(max(img.shape[:2]) / 640)))
+        with metrics.timed("plot"):
+            annotated = render_detections(img, detections, line_width=line_width)
+        with metrics.timed("annotated_save"):
+            saved = store.write_annotated(annotated, annotated_path)
+        if not saved:
             annotated_path = None
     except Exception as e:
         print(f"Could not save annotated image: {e}")
+        metrics.ERRORS_TOTAL.inc("run_inference_on_path", "annotated_save")
         annotated_path = None
 
-    detections: List[Dict[str, Any]] = []
-    boxes = getattr(results[0], "boxes", None)
-    if boxes is not None:
-        for box in boxes:
-            try:
-                x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                conf_val = float(box.conf[0].cpu().numpy())
-                cls = int(box.cls[0].cpu().numpy())
-                class_name = (
-                    results[0].names[cls] if hasattr(results[0], "names") and cls < len(results[0].names) else f"class_{cls}"
-                )
-                detections.append(
-                    {
-                        "bbox": [float(x1), float(y1), float(x2), float(y2)],
-                        "confidence": conf_val,
-                        "class": class_name,
-                        "class_id": cls,
-                    }
-                )
-            except Exception as e:
-                print(f"Error processing box: {e}")
-                continue
-    return detections, str(annotated_path) if annotated_path else None
+    annotated_str = str(annotated_path) if annotated_path else None
+    if cache_key is not None:
+        cache.put(cache_key, {"detections": detections, "annotated_path": annotated_str})
+    return detections, annotated_str
 
 
-def decode_base64_image(image_b64: str) -> Optional[Any]:
-    """Decode data URL base64 image to numpy array (BGR)."""
-    if not image_b64 or not image_b64.startswith("data:image"):
-        print("[WARN] Invalid base64 image format - must start with 'data:image'")
+# BGR colours cycled by class id in render_detections()
+_BOX_COLORS = [(0, 255, 0), (255, 128, 0), (0, 128, 255), (255, 0, 255), (0, 255, 255), (255, 255, 0)]
+
+
+def render_detections(img: Any, detections: List[Dict[str, Any]], line_width: int = 3) -> Any:
+    """Draw detection boxes and labels onto a copy of the original BGR frame.
+
+    A lightweight alternative to ``Results.plot()``: it draws straight at frame
+    resolution, so no resize back from the model's input size is needed.
+    """
+    canvas = img.copy()
+    font_scale = max(0.4, line_width / 5)
+    for det in detections:
+        x1, y1, x2, y2 = (int(round(v)) for v in det["bbox"])
+        color = _BOX_COLORS[int(det.get("class_id", 0)) % len(_BOX_COLORS)]
+        cv2.rectangle(canvas, (x1, y1), (x2, y2), color, line_width)
+        label = f"{det.get('class', '')} {det.get('confidence', 0.0):.2f}"
+        (tw, th), baseline = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, font_scale, 1)
+        top = max(0, y1 - th - baseline - 4)
+        cv2.rectangle(canvas, (x1, top), (x1 + tw + 4, top + th + baseline + 4), color, -1)
+        cv2.putText(canvas, label, (x1 + 2, top + th + 2), cv2.FONT_HERSHEY_SIMPLEX, font_scale, (0, 0, 0), 1, cv2.LINE_AA)
+    return canvas
+
+
+def encode_jpeg_base64(img: Any, quality: int = 80) -> Optional[str]:
+    """JPEG-encode a BGR frame with OpenCV and return it as a base64 string."""
+    if not available(cv2):
+        return None
+    with metrics.timed("jpeg_encode"):
+        ok, buffer = cv2.imencode(".jpg", img, [int(cv2.IMWRITE_JPEG_QUALITY), int(quality)])
+    if not ok:
+        print("[WARN] JPEG encode of annotated frame failed")
+        return None
+    return base64.b64encode(buffer.tobytes()).decode("ascii")
+
+
+def decode_image_bytes(data: bytes) -> Optional[Any]:
+    """Decode encoded image bytes (JPEG/PNG/WEBP) to a numpy array (BGR)."""
+    if not data:
+        print("[WARN] Empty image payload")
+        return None
+    if not (available(np) and available(cv2)):
+        print("[ERROR] Image processing libraries (numpy/cv2) not available for image decode.")
         return None
     try:
-        header, encoded = image_b64.split(",", 1)
-        data = base64.b64decode(encoded)
-        if np is None or cv2 is None:
-            print("[ERROR] Image processing libraries (numpy/cv2) not available for base64 decode.")
-            return None
         image_array = np.frombuffer(data, dtype=np.uint8)
-        img = cv2.imdecode(image_array, cv2.IMREAD_COLOR)
+        with metrics.timed("imdecode"):
+            img = cv2.imdecode(image_array, cv2.IMREAD_COLOR)
         if img is None:
-            print("[ERROR] Failed to decode image from base64 data")
+            print("[ERROR] Failed to decode image bytes")
             return None
-        print(f"[OK] Successfully decoded base64 image: shape={img.shape}")
         return img
+    except Exception as e:
+        print(f"[ERROR] Image decode error: {e}")
+        return None
+
+
+def decode_frame(data: bytes, min_side: int = 0) -> Tuple[Optional[Any], Optional[Tuple[float, float]]]:
+    """Decode encoded image bytes for detection; returns ``(img, scale)``.
+
+    JPEGs whose longer side is at least twice ``min_side`` (the inference size)
+    are decoded at 1/2, 1/4 or 1/8 scale by libjpeg (see ``preprocess.decode_reduced``).
+    ``scale`` is the ``(sx, sy)`` that maps boxes on ``img`` back to the
+    full-size frame, or None when ``img`` is full size. ``min_side=0`` always
+    decodes at full size.
+    """
+    if min_side <= 0:
+        return decode_image_bytes(data), None
+    if not data:
+        print("[WARN] Empty image payload")
+        return None, None
+    if not (available(np) and available(cv2)):
+        print("[ERROR] Image processing libraries (numpy/cv2) not available for image decode.")
+        return None, None
+    from app.services import preprocess
+
+    try:
+        with metrics.timed("imdecode"):
+            img, scale = preprocess.decode_reduced(data, min_side)
+    except Exception as e:
+        print(f"[ERROR] Image decode error: {e}")
+        return None, None
+    if img is None:
+        print("[ERROR] Failed to decode image bytes")
+    return img, scale
+
+
+def decode_base64_payload(image_b64: str) -> Optional[bytes]:
+    """The encoded image bytes of a ``data:image/...;base64,`` URL, or None if it is malformed."""
+    if not image_b64 or not image_b64.startswith("data:image"):
+        print("[WARN] Invalid base64 image format - must start with 'data:image'")
+        return None
+    try:
+        header, encoded = image_b64.split(",", 1)
+        with metrics.timed("base64_decode"):
+            return base64.b64decode(encoded)
     except Exception as e:
         print(f"[ERROR] Base64 decode error: {e}")
         import traceback
@@ -227,6 +1068,12 @@ def decode_base64_image(image_b64: str) -> Optional[Any]:
         return None
 
 
+def decode_base64_image(image_b64: str) -> Optional[Any]:
+    """Decode data URL base64 image to numpy array (BGR)."""
+    data = decode_base64_payload(image_b64)
+    return decode_image_bytes(data) if data is not None else None
+
+
 def get_last_model_error() -> Optional[str]:
     """Return the last model/import error message, if any."""
     return _last_error
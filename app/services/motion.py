@@ -0,0 +1,204 @@
+"""Motion-gated inference for stream sessions from static cameras.
+
+With ``motion`` on (``STREAM_MOTION_GATING`` or ``motion=1`` per request), each
+stream session keeps a small blurred grayscale reference of the scene the last
+detections were computed on, ``MOTION_ANALYSIS_WIDTH`` pixels wide. When the
+detector would run (on keyframes, see ``tracking``), the frame is compared with
+that reference first:
+
+    idle  nothing changed by more than ``MOTION_THRESHOLD`` gray levels over
+          more than ``MOTION_MIN_AREA`` of the frame: the last detections are
+          reused and the detector does not run at all
+    roi   the changed regions (padded and merged, at most ``MAX_REGIONS``) are
+          cropped and only the crops go through the detector; their boxes are
+          moved back to frame coordinates and replace the old boxes inside the
+          regions, and the boxes elsewhere are kept
+    full  the regions together cover more than ``MOTION_MAX_AREA`` of the frame,
+          the frame size changed, nothing was detected yet, or the last full
+          pass is ``MOTION_REFRESH_S`` old: the whole frame is run as usual
+
+Slow global changes (daylight, auto exposure) are blended into the reference on
+idle frames, so they do not read as motion. Objects that stop moving keep their
+last boxes until the next full refresh.
+"""
+import time
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+from flask import current_app
+
+from app.services import model_service
+
+Region = Tuple[int, int, int, int]  # x1, y1, x2, y2 in frame pixels
+Detections = Tuple[Any, Any, Any, Any]  # xyxy, scores, classes, names
+
+# Crops beyond this many are not worth it: the whole frame is run instead
+MAX_REGIONS = 4
+# Padding around a changed region, as a share of its size (plus MIN_PADDING_PX)
+REGION_PADDING = 0.25
+MIN_PADDING_PX = 16
+# How fast the reference follows the scene on idle frames
+BACKGROUND_ALPHA = 0.05
+
+
+def merge_regions(regions: List[Region]) -> List[Region]:
+    """Union overlapping regions until none overlap."""
+    merged = list(regions)
+    changed = True
+    while changed:
+        changed = False
+        for i in range(len(merged)):
+            for j in range(i + 1, len(merged)):
+                a, b = merged[i], merged[j]
+                if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                    merged[i] = (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+                    del merged[j]
+                    changed = True
+                    break
+            if changed:
+                break
+    return merged
+
+
+class MotionGate:
+    """Per-session reference frame and the last detections it justifies reusing."""
+
+    def __init__(
+        self,
+        analysis_width: int = 160,
+        threshold: float = 25.0,
+        min_area: float = 0.002,
+        max_area: float = 0.5,
+        refresh_s: float = 10.0,
+    ) -> None:
+        self.analysis_width = max(16, int(analysis_width))
+        self.threshold = float(threshold)
+        self.min_area = max(0.0, float(min_area))
+        self.max_area = float(max_area)
+        self.refresh_s = float(refresh_s)
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget the reference and the last detections (another model, another scene)."""
+        self.reference: Optional[Any] = None
+        self.frame_shape: Optional[Tuple[int, ...]] = None
+        self.last: Optional[Detections] = None
+        self.last_full = 0.0
+
+    def _analysis_frame(self, img: Any) -> Any:
+        cv2, np = model_service.cv2, model_service.np
+        height, width = img.shape[:2]
+        size = (self.analysis_width, max(1, round(height * self.analysis_width / width)))
+        gray = cv2.cvtColor(cv2.resize(img, size, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+        # Blur so sensor noise and compression artefacts do not count as motion
+        return cv2.GaussianBlur(gray, (5, 5), 0).astype(np.float32)
+
+    def changed_regions(self, small: Any, frame_shape: Sequence[int]) -> List[Region]:
+        """Padded, merged frame-pixel regions where ``small`` differs from the reference."""
+        cv2, np = model_service.cv2, model_service.np
+        mask = (cv2.absdiff(small, self.reference) > self.threshold).astype(np.uint8)
+        mask = cv2.dilate(mask, np.ones((3, 3), np.uint8), iterations=2)
+        count, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+        height, width = frame_shape[:2]
+        sx, sy = width / small.shape[1], height / small.shape[0]
+        min_pixels = self.min_area * small.shape[0] * small.shape[1]
+        regions: List[Region] = []
+        for x, y, w, h, area in stats[1:count]:
+            if area < min_pixels:
+                continue
+            pad_x = w * sx * REGION_PADDING + MIN_PADDING_PX
+            pad_y = h * sy * REGION_PADDING + MIN_PADDING_PX
+            regions.append((
+                max(0, int(x * sx - pad_x)),
+                max(0, int(y * sy - pad_y)),
+                min(width, int((x + w) * sx + pad_x + 0.5)),
+                min(height, int((y + h) * sy + pad_y + 0.5)),
+            ))
+        return merge_regions(regions)
+
+    def run(
+        self,
+        img: Any,
+        detect: Callable[[Any], Detections],
+        detect_crops: Callable[[List[Any]], List[Detections]],
+    ) -> Tuple[Detections, str, List[Region]]:
+        """Detections for ``img``, running ``detect`` (whole frame) or ``detect_crops`` only if needed.
+
+        Returns ``(detections, decision, regions)`` with decision ``idle``, ``roi`` or ``full``.
+        """
+        small = self._analysis_frame(img)
+        now = time.monotonic()
+        regions: List[Region] = []
+        decision = "full"
+        if (
+            self.last is not None
+            and self.reference is not None
+            and img.shape == self.frame_shape
+            and now - self.last_full < self.refresh_s
+        ):
+            regions = self.changed_regions(small, img.shape)
+            area = sum((x2 - x1) * (y2 - y1) for x1, y1, x2, y2 in regions)
+            if not regions:
+                decision = "idle"
+            elif len(regions) <= MAX_REGIONS and area <= self.max_area * img.shape[0] * img.shape[1]:
+                decision = "roi"
+
+        if decision == "idle":
+            model_service.cv2.accumulateWeighted(small, self.reference, BACKGROUND_ALPHA)
+            return self.last, decision, regions
+        if decision == "full":
+            detections = detect(img)
+            self.reference = small
+            self.frame_shape = img.shape
+            self.last_full = now
+            self.last = detections
+            return detections, decision, []
+
+        crops = [img[y1:y2, x1:x2] for x1, y1, x2, y2 in regions]
+        detections = self._merge(regions, detect_crops(crops), img.shape)
+        sx, sy = small.shape[1] / img.shape[1], small.shape[0] / img.shape[0]
+        for x1, y1, x2, y2 in regions:
+            # Only the re-detected areas are up to date with this frame
+            ys = slice(int(y1 * sy), int(y2 * sy + 0.999))
+            xs = slice(int(x1 * sx), int(x2 * sx + 0.999))
+            self.reference[ys, xs] = small[ys, xs]
+        self.last = detections
+        return detections, decision, regions
+
+    def _merge(self, regions: List[Region], crop_detections: List[Detections], frame_shape: Sequence[int]) -> Detections:
+        """Old boxes outside the regions plus each crop's boxes moved to frame coordinates."""
+        from app.services import tiling
+
+        np = model_service.np
+        old_xyxy, old_scores, old_classes, names = self.last
+        keep = np.ones(len(old_xyxy), dtype=bool)
+        if len(old_xyxy):
+            cx = (old_xyxy[:, 0] + old_xyxy[:, 2]) / 2
+            cy = (old_xyxy[:, 1] + old_xyxy[:, 3]) / 2
+            for x1, y1, x2, y2 in regions:
+                keep &= ~((cx >= x1) & (cx < x2) & (cy >= y1) & (cy < y2))
+        boxes, scores, classes = [old_xyxy[keep]], [old_scores[keep]], [old_classes[keep]]
+        for (x1, y1, _, _), (xyxy, crop_scores, crop_classes, crop_names) in zip(regions, crop_detections):
+            names = crop_names or names
+            if len(xyxy):
+                # Not in place: on CPU the arrays share memory with the Results tensors
+                boxes.append(xyxy + np.array([x1, y1, x1, y1], dtype=np.float32))
+                scores.append(crop_scores)
+                classes.append(crop_classes)
+        merged = tiling.merge_boxes(
+            np.concatenate(boxes).astype(np.float32),
+            np.concatenate(scores).astype(np.float32),
+            np.concatenate(classes).astype(np.int64),
+        )
+        return (*merged, names)
+
+
+def new_gate() -> MotionGate:
+    """A gate with this app's MOTION_* settings."""
+    config = current_app.config
+    return MotionGate(
+        analysis_width=config.get("MOTION_ANALYSIS_WIDTH", 160),
+        threshold=config.get("MOTION_THRESHOLD", 25.0),
+        min_area=config.get("MOTION_MIN_AREA", 0.002),
+        max_area=config.get("MOTION_MAX_AREA", 0.5),
+        refresh_s=config.get("MOTION_REFRESH_S", 10.0),
+    )
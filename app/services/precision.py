@@ -0,0 +1,84 @@
+"""Reduced-precision execution for the PyTorch backend (fp16, bf16, channels_last).
+
+Imported lazily by ``model_service`` only when ``MODEL_PRECISION`` or
+``MODEL_CHANNELS_LAST`` asks for it, since it needs torch at import time.
+
+Ultralytics' AutoBackend casts the network back to fp32 when the predictor is
+built, so the conversion happens after that. The detection network inside the
+predictor is replaced by ``ReducedPrecisionForward``, which converts the weights
+once and casts each input batch on the way in. Outputs are cast back to fp32,
+so NMS and box extraction run in fp32 as before. INT8 is not done here: YOLOv8
+is convolution-only, and torch's dynamic quantization only covers Linear/RNN
+layers. INT8 goes through a statically quantized ONNX artifact instead (see
+``tools/quantize_model.py``).
+"""
+from typing import Any, Optional
+
+import torch
+
+REDUCED_DTYPES = {"fp16": torch.float16, "bf16": torch.bfloat16}
+
+
+def cpu_supports(precision: str) -> bool:
+    """Whether oneDNN has native kernels for ``precision`` on this CPU (fp32 always does)."""
+    if precision not in REDUCED_DTYPES:
+        return True
+    mkldnn = torch.ops.mkldnn
+    check = getattr(mkldnn, "_is_mkldnn_bf16_supported" if precision == "bf16" else "_is_mkldnn_fp16_supported", None)
+    try:
+        return bool(check()) if check is not None else False
+    except Exception:
+        return False
+
+
+def _to_float(value: Any) -> Any:
+    if isinstance(value, torch.Tensor):
+        return value.float() if value.is_floating_point() else value
+    if isinstance(value, (list, tuple)):
+        return type(value)(_to_float(v) for v in value)
+    return value
+
+
+class ReducedPrecisionForward(torch.nn.Module):
+    """Wraps the detection network: reduced-precision weights and inputs, fp32 outputs."""
+
+    def __init__(
+        self, inner: torch.nn.Module, dtype: Optional[torch.dtype], channels_last: bool, precision: str = "fp32"
+    ) -> None:
+        super().__init__()
+        self.inner = inner
+        self.dtype = dtype
+        self.precision = precision  # the mode applied, reported again if the model is re-wrapped
+        self.channels_last = channels_last
+        if dtype is not None:
+            self.inner.to(dtype)
+        if channels_last:
+            self.inner.to(memory_format=torch.channels_last)
+
+    def forward(self, x: torch.Tensor, *args: Any, **kwargs: Any) -> Any:
+        if self.channels_last:
+            x = x.contiguous(memory_format=torch.channels_last)
+        if self.dtype is not None:
+            x = x.to(self.dtype)
+        return _to_float(self.inner(x, *args, **kwargs))
+
+
+def enable_reduced_precision(model: Any, precision: str = "fp32", channels_last: bool = False) -> str:
+    """Switch a loaded ``YOLO`` model to ``precision`` in place; returns the mode actually applied."""
+    import numpy as np
+
+    dtype = REDUCED_DTYPES.get(precision)
+    # The predictor, and with it the AutoBackend that would undo the cast, is built on first use
+    if getattr(model, "predictor", None) is None:
+        model(np.zeros((64, 64, 3), dtype=np.uint8), imgsz=64, verbose=False)
+    backend = model.predictor.model
+    if isinstance(backend.model, ReducedPrecisionForward):
+        return backend.model.precision
+    device = next(backend.model.parameters()).device
+    if dtype is not None and device.type == "cpu" and not cpu_supports(precision):
+        print(f"[WARN] This CPU has no native {precision} kernels - keeping fp32")
+        dtype, precision = None, "fp32"
+    if dtype is None and not channels_last:
+        return precision
+    backend.model = ReducedPrecisionForward(backend.model, dtype, channels_last, precision)
+    return precision
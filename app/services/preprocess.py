@@ -0,0 +1,234 @@
+"""Frame preprocessing into reusable buffers, and the forward pass that uses them.
+
+Calling ``model(frames)`` costs several allocations per frame in ultralytics:
+a letterboxed copy, the stacked batch, an RGB/CHW copy and the float tensor.
+Here each thread keeps its own buffers for each input shape: a uint8
+letterbox canvas and the float input tensor, grown to the largest batch seen.
+A frame is resized straight into the canvas, with only the border repainted.
+It is then converted into the tensor one channel at a time, with BGR to RGB and
+the /255 scaling done on the way. The model's AutoBackend is called on that
+tensor. Ultralytics' own NMS and box scaling run on the output, so the
+detections are the same as from ``model(frames)``.
+
+``decode_reduced`` decodes JPEGs much larger than the model input at 1/2, 1/4
+or 1/8 scale inside libjpeg, which costs a fraction of a full-size decode
+followed by a resize.
+"""
+import math
+import threading
+from collections import OrderedDict
+from typing import Any, List, Optional, Tuple
+
+from app.services import model_service
+
+# Buffer sets kept per thread; a live stream needs one, tiles and mixed uploads a few more
+MAX_BUFFER_SHAPES = 4
+PAD_VALUE = 114  # ultralytics' letterbox grey
+
+# JPEG start-of-frame markers (baseline, extended, progressive, lossless, ...); C4/C8/CC are not frames
+_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+class BufferCache:
+    """Input buffers keyed by shape, device and dtype, grown to the largest batch seen.
+
+    Holds at most ``max_shapes`` buffer sets, dropping the least recently used.
+    Not thread-safe: each thread uses its own, and so does each slot of a
+    pipeline that prepares one batch while the previous one is being inferred.
+    """
+
+    def __init__(self, max_shapes: int = MAX_BUFFER_SHAPES) -> None:
+        self.max_shapes = max(1, int(max_shapes))
+        self.sets: "OrderedDict[Tuple[Any, ...], List[Any]]" = OrderedDict()
+
+    def get(self, count: int, height: int, width: int, device: Any, dtype: Any) -> Tuple[Any, Any, Any]:
+        """``(canvas, canvas_tensor, input_tensor)`` with room for ``count`` frames of this shape."""
+        import torch
+
+        np = model_service.np
+        key = (height, width, str(device), dtype)
+        entry = self.sets.get(key)
+        if entry is None or entry[0].shape[0] < count:
+            canvas = np.empty((count, height, width, 3), dtype=np.uint8)
+            tensor = torch.empty((count, 3, height, width), dtype=dtype, device=device)
+            entry = [canvas, torch.from_numpy(canvas), tensor]
+            self.sets[key] = entry
+            while len(self.sets) > self.max_shapes:
+                self.sets.popitem(last=False)
+        self.sets.move_to_end(key)
+        return entry[0], entry[1], entry[2]
+
+
+class _ThreadBuffers(threading.local):
+    def __init__(self) -> None:
+        self.cache = BufferCache()
+
+
+_buffers = _ThreadBuffers()
+
+
+def supports(model: Any) -> bool:
+    """True if ``model`` is an ultralytics detection model whose predictor is already set up.
+
+    The predictor is created by the first ordinary ``model(...)`` call (the warm-up
+    at startup), which also loads the backend; until then frames take the stock path.
+    """
+    predictor = getattr(model, "predictor", None)
+    net = getattr(predictor, "model", None)
+    return (
+        net is not None
+        and hasattr(net, "pt")
+        and hasattr(net, "stride")
+        and getattr(getattr(predictor, "args", None), "task", "detect") == "detect"
+    )
+
+
+def jpeg_size(data: Any) -> Optional[Tuple[int, int]]:
+    """``(height, width)`` from a JPEG's frame header without decoding it; None for other formats."""
+    n = len(data)
+    if n < 4 or data[0] != 0xFF or data[1] != 0xD8:
+        return None
+    i = 2
+    while i + 9 < n:
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:  # fill byte
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD7:  # standalone markers
+            i += 2
+            continue
+        if marker in _SOF_MARKERS:
+            return (data[i + 5] << 8) | data[i + 6], (data[i + 7] << 8) | data[i + 8]
+        i += 2 + ((data[i + 2] << 8) | data[i + 3])
+    return None
+
+
+def reduction_factor(size: Optional[Tuple[int, int]], min_side: int) -> int:
+    """Largest libjpeg scale-down (8, 4 or 2) that keeps the longer side at least ``min_side``."""
+    if size is None or min_side <= 0:
+        return 1
+    longest = max(size)
+    for factor in (8, 4, 2):
+        if longest // factor >= min_side:
+            return factor
+    return 1
+
+
+def decode_reduced(data: Any, min_side: int) -> Tuple[Optional[Any], Optional[Tuple[float, float]]]:
+    """Decode an encoded frame, at reduced scale if it is a JPEG much larger than ``min_side``.
+
+    Returns ``(img, scale)``. ``scale`` is the ``(sx, sy)`` that maps
+    coordinates in ``img`` back to the full-size frame, or None if the frame
+    was decoded at full size.
+    """
+    np, cv2 = model_service.np, model_service.cv2
+    size = jpeg_size(data)
+    factor = reduction_factor(size, min_side)
+    flags = {
+        1: cv2.IMREAD_COLOR,
+        2: cv2.IMREAD_REDUCED_COLOR_2,
+        4: cv2.IMREAD_REDUCED_COLOR_4,
+        8: cv2.IMREAD_REDUCED_COLOR_8,
+    }[factor]
+    img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), flags)
+    if img is None or factor == 1:
+        return img, None
+    height, width = size
+    expected = (math.ceil(height / factor), math.ceil(width / factor))
+    if img.shape[:2] != expected and img.shape[:2] == expected[::-1]:
+        height, width = width, height  # EXIF orientation rotated the frame
+    return img, (width / img.shape[1], height / img.shape[0])
+
+
+def letterbox_layout(
+    shape: Tuple[int, int], new_shape: Tuple[int, int], auto: bool, stride: int
+) -> Tuple[Tuple[int, int], Tuple[int, int], Tuple[int, int]]:
+    """``((resized_w, resized_h), (top, left), (padded_h, padded_w))``, as ultralytics' ``LetterBox``."""
+    r = min(new_shape[0] / shape[0], new_shape[1] / shape[1])
+    new_unpad = int(round(shape[1] * r)), int(round(shape[0] * r))
+    dw, dh = new_shape[1] - new_unpad[0], new_shape[0] - new_unpad[1]
+    if auto:
+        dw, dh = dw % stride, dh % stride
+    dw, dh = dw / 2, dh / 2
+    top, bottom = int(round(dh - 0.1)), int(round(dh + 0.1))
+    left, right = int(round(dw - 0.1)), int(round(dw + 0.1))
+    return new_unpad, (top, left), (new_unpad[1] + top + bottom, new_unpad[0] + left + right)
+
+
+def _letterbox_into(img: Any, canvas: Any, resized: Tuple[int, int], offset: Tuple[int, int]) -> None:
+    """Resize ``img`` into the middle of ``canvas`` and paint only the border around it."""
+    cv2 = model_service.cv2
+    (nw, nh), (top, left) = resized, offset
+    canvas[:top] = PAD_VALUE
+    canvas[top + nh:] = PAD_VALUE
+    canvas[top:top + nh, :left] = PAD_VALUE
+    canvas[top:top + nh, left + nw:] = PAD_VALUE
+    roi = canvas[top:top + nh, left:left + nw]
+    if img.shape[1] == nw and img.shape[0] == nh:
+        roi[...] = img
+        return
+    out = cv2.resize(img, (nw, nh), dst=roi, interpolation=cv2.INTER_LINEAR)
+    if out is not roi and not model_service.np.shares_memory(out, roi):
+        roi[...] = out  # OpenCV allocated instead of writing into the view
+
+
+def prepare(model: Any, images: List[Any], imgsz: int = 640, buffers: Optional[BufferCache] = None) -> Any:
+    """Letterbox ``images`` (BGR uint8) into the model's input tensor and return that batch.
+
+    The tensor is a view into ``buffers`` (this thread's cache by default) and is
+    overwritten by the next ``prepare`` on the same cache.
+    """
+    import torch
+    from ultralytics.utils.checks import check_imgsz
+
+    net = model.predictor.model
+    stride = int(net.stride.max() if hasattr(net.stride, "max") else net.stride)
+    new_shape = tuple(check_imgsz(imgsz, stride=stride, min_dim=2))
+    # Minimal-rectangle padding only when every frame has the same shape, like the predictor
+    same_shapes = len({img.shape for img in images}) == 1
+    auto = same_shapes and bool(net.pt)
+    layouts = [letterbox_layout(img.shape[:2], new_shape, auto, stride) for img in images]
+    height, width = layouts[0][2] if same_shapes else new_shape
+    cache = buffers if buffers is not None else _buffers.cache
+
+    with torch.inference_mode():
+        dtype = torch.float16 if getattr(net, "fp16", False) else torch.float32
+        canvas, canvas_t, tensor = cache.get(len(images), height, width, net.device, dtype)
+        for i, (img, (resized, offset, _)) in enumerate(zip(images, layouts)):
+            _letterbox_into(img, canvas[i], resized, offset)
+            for c in range(3):
+                tensor[i, c].copy_(canvas_t[i, :, :, 2 - c])  # BGR -> RGB, uint8 -> float
+        batch = tensor[: len(images)]
+        batch.div_(255)
+    return batch
+
+
+def infer(model: Any, images: List[Any], batch: Any, conf: float = 0.25) -> List[Any]:
+    """Run the network on a ``prepare``d batch; NMS and box scaling as ultralytics does them."""
+    import torch
+    from ultralytics.engine.results import Results
+    from ultralytics.utils import ops
+
+    predictor = model.predictor
+    net = predictor.model
+    args = predictor.args
+    with torch.inference_mode():
+        preds = net(batch)
+        preds = ops.non_max_suppression(
+            preds, conf, args.iou, agnostic=args.agnostic_nms, max_det=args.max_det, classes=args.classes
+        )
+        results = []
+        for i, (img, pred) in enumerate(zip(images, preds)):
+            pred[:, :4] = ops.scale_boxes(batch.shape[2:], pred[:, :4], img.shape)
+            results.append(Results(img, path=f"image{i}.jpg", names=net.names, boxes=pred))
+    return results
+
+
+def forward(model: Any, images: List[Any], imgsz: int = 640, conf: float = 0.25) -> List[Any]:
+    """``model(images, imgsz=imgsz, conf=conf)`` through the reusable buffers; returns ``Results``.
+
+    ``images`` are BGR uint8 arrays; ``supports(model)`` must be true.
+    """
+    return infer(model, images, prepare(model, images, imgsz=imgsz), conf=conf)
@@ -0,0 +1,185 @@
+"""Input-resolution policy: the ``imgsz`` each image or frame is run at.
+
+Inference cost grows with the square of the input size, so a webcam frame run
+at 320 or 416 costs roughly a third to a quarter of one at 640. Requests may
+ask for any size in ``INFERENCE_IMGSZ_CHOICES`` (``imgsz=416``) or for
+``imgsz=auto``, which picks the smallest choice covering the image's longer
+side but never more than ``INFERENCE_IMGSZ``: small inputs are not upscaled,
+large ones run at the default. Requests without ``imgsz`` run at
+``INFERENCE_IMGSZ`` (``INFERENCE_IMGSZ_POLICY=fixed``) or as ``auto``.
+
+Stream sessions adapt on top of that when ``STREAM_LATENCY_BUDGET_MS`` is set
+(see ``AdaptiveResolution``): a stream whose keyframes take longer than the
+budget steps down one size, and steps back up, never past the size it started
+at, once the next size up is predicted to fit.
+
+Exported backends (TorchScript, ONNX, OpenVINO) have a fixed input shape and
+always run at ``INFERENCE_IMGSZ``. Every choice is warmed up at startup with
+``WARMUP_ALL_IMGSZ`` (see ``model_service.warmup_model``), so the first frame
+at a new size does not pay for oneDNN kernel selection.
+"""
+from typing import Any, Callable, List, Optional, Sequence, Tuple, Union
+
+from flask import current_app
+
+from app.services import model_service
+
+DEFAULT_CHOICES = (320, 416, 512, 640, 960)
+STRIDE = 32
+# Keyframes measured at a size before the stream may leave it
+MIN_SAMPLES = 3
+# Step up only if the next size's predicted latency is within this share of the budget
+STEP_UP_HEADROOM = 0.8
+# Weight of the newest keyframe in the smoothed latency
+EWMA_ALPHA = 0.3
+
+
+def parse_choices(value: Union[str, Sequence[int], None], default_imgsz: int = 640) -> Tuple[int, ...]:
+    """``"320,416,640"`` -> ``(320, 416, 640)``: multiples of 32, sorted, always including ``default_imgsz``."""
+    if value is None or value == "":
+        sizes = list(DEFAULT_CHOICES)
+    elif isinstance(value, str):
+        sizes = [int(part) for part in value.replace(" ", "").split(",") if part]
+    else:
+        sizes = [int(part) for part in value]
+    sizes.append(int(default_imgsz))
+    return tuple(sorted({size for size in sizes if size >= STRIDE and size % STRIDE == 0}))
+
+
+def get_choices() -> Tuple[int, ...]:
+    config = current_app.config
+    return parse_choices(config.get("INFERENCE_IMGSZ_CHOICES"), config.get("INFERENCE_IMGSZ", 640))
+
+
+def parse_imgsz(value: Any, choices: Optional[Sequence[int]] = None) -> Union[int, str, None]:
+    """A request's ``imgsz``: None when absent, ``"auto"``, or one of ``choices``; ValueError otherwise."""
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return None
+    if str(value).strip().lower() == "auto":
+        return "auto"
+    choices = get_choices() if choices is None else choices
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        size = None
+    if size not in choices:
+        raise ValueError(f"imgsz must be auto or one of {', '.join(str(c) for c in choices)}")
+    return size
+
+
+def auto_imgsz(shape: Sequence[int], choices: Sequence[int], ceiling: int) -> int:
+    """Smallest choice covering the longer side of ``shape`` (h, w, ...), at most ``ceiling``."""
+    longest = max(int(shape[0]), int(shape[1]))
+    for size in sorted(choices):
+        if size > ceiling:
+            break
+        if size >= longest:
+            return size
+    return ceiling
+
+
+def fixed_input_size(model: Any) -> bool:
+    """True for backends whose input shape is baked into the artifact."""
+    info = model_service.get_model_info(model)
+    return bool(info) and info.get("backend", model_service.DEFAULT_BACKEND) != model_service.DEFAULT_BACKEND
+
+
+def resolve_imgsz(
+    model: Any,
+    requested: Union[int, str, None],
+    shape: Union[Sequence[int], Callable[[], Optional[Sequence[int]]], None] = None,
+) -> int:
+    """The size to run ``model`` at for a ``parse_imgsz`` value.
+
+    ``shape`` is the image's ``(h, w)``, or a function returning it that is only
+    called when the size depends on it (``auto``).
+    """
+    config = current_app.config
+    default = int(config.get("INFERENCE_IMGSZ", 640))
+    if fixed_input_size(model):
+        return default
+    if requested is None and str(config.get("INFERENCE_IMGSZ_POLICY", "fixed")).lower() == "auto":
+        requested = "auto"
+    if requested == "auto":
+        shape = shape() if callable(shape) else shape
+        return auto_imgsz(shape, get_choices(), default) if shape is not None else default
+    return int(requested) if requested is not None else default
+
+
+def image_shape(path: str) -> Optional[Tuple[int, int]]:
+    """``(height, width)`` of an image file from its header, without decoding the pixels."""
+    try:
+        with model_service.Image.open(path) as img:
+            width, height = img.size
+        return height, width
+    except Exception:
+        return None
+
+
+def warmup_sizes(model: Any) -> List[int]:
+    """Sizes to warm up besides ``INFERENCE_IMGSZ``."""
+    config = current_app.config
+    if not config.get("WARMUP_ALL_IMGSZ", True) or fixed_input_size(model):
+        return []
+    default = int(config.get("INFERENCE_IMGSZ", 640))
+    return [size for size in get_choices() if size != default]
+
+
+class AdaptiveResolution:
+    """Input size of one stream, stepped down and up by its keyframe latency against a budget.
+
+    Latency is smoothed per size. Past the budget the stream steps down one size;
+    it steps up once the latency scaled by the area of the next size up fits
+    within ``STEP_UP_HEADROOM`` of the budget. Either move waits for
+    ``MIN_SAMPLES`` keyframes at the current size, so one slow frame does not
+    change it.
+    """
+
+    def __init__(self, choices: Sequence[int], ceiling: int, budget_ms: float, floor: int = 0) -> None:
+        self.all_choices = tuple(sorted(choices))
+        self.budget = 0.0
+        self.floor = int(floor)
+        self.sizes: Tuple[int, ...] = ()
+        self.index = 0
+        self.latency: Optional[float] = None
+        self.samples = 0
+        self.configure(ceiling, budget_ms)
+
+    @property
+    def imgsz(self) -> int:
+        return self.sizes[self.index]
+
+    def configure(self, ceiling: int, budget_ms: float) -> None:
+        """Set the budget and the largest size the stream may use (what the client asked for).
+
+        A new ceiling restarts the stream at that size.
+        """
+        self.budget = max(0.0, float(budget_ms)) / 1000.0
+        sizes = tuple(s for s in self.all_choices if self.floor <= s <= ceiling) or (int(ceiling),)
+        if sizes == self.sizes:
+            return
+        self.sizes = sizes
+        self.index = len(sizes) - 1
+        self._reset()
+
+    def _reset(self) -> None:
+        self.latency = None
+        self.samples = 0
+
+    def observe(self, seconds: float) -> Optional[int]:
+        """Record one keyframe's detector time; returns the new size if it changed."""
+        self.latency = seconds if self.latency is None else EWMA_ALPHA * seconds + (1 - EWMA_ALPHA) * self.latency
+        self.samples += 1
+        if not self.budget or self.samples < MIN_SAMPLES:
+            return None
+        if self.latency > self.budget and self.index > 0:
+            self.index -= 1
+        elif self.index < len(self.sizes) - 1:
+            growth = (self.sizes[self.index + 1] / self.imgsz) ** 2
+            if self.latency * growth > self.budget * STEP_UP_HEADROOM:
+                return None
+            self.index += 1
+        else:
+            return None
+        self._reset()
+        return self.imgsz
@@ -0,0 +1,98 @@
+"""Compact detection payloads for clients that poll at frame rate.
+
+``full`` is the default list of ``{"bbox", "confidence", "class", "class_id"}``
+dicts. ``compact`` sends parallel arrays instead: a flat ``boxes`` list (4 values
+per box), ``scores`` and ``class_ids``. ``packed`` carries boxes and scores as
+little-endian float32 buffers (base64 in JSON, raw bytes in MessagePack). Both
+columnar forms send the class-name table only when the client's
+``classes_token`` does not match the current one.
+"""
+import base64
+import hashlib
+import json
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+
+from flask import Request, Response, jsonify
+
+from app.services import model_service
+
+try:
+    import msgpack
+except ImportError:  # optional: pip install msgpack
+    msgpack = None
+
+RESPONSE_FORMATS = ("full", "compact", "packed")
+MSGPACK_MIMETYPE = "application/msgpack"
+
+
+def normalize_format(value: Any, default: str = "full") -> Optional[str]:
+    """Return a known format name, ``default`` when unset, or None when unknown."""
+    if value is None or value == "":
+        return default
+    name = str(value).strip().lower()
+    return name if name in RESPONSE_FORMATS else None
+
+
+@lru_cache(maxsize=16)
+def _table_and_token(items: Tuple[Tuple[int, str], ...]) -> Tuple[Dict[str, str], str]:
+    table = {str(k): str(v) for k, v in items}
+    token = hashlib.sha1(json.dumps(table, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+    return table, token
+
+
+def class_table(names: Any) -> Tuple[Dict[str, str], str]:
+    """``({"0": "name", ...}, token)`` for a ``Results.names`` dict or list."""
+    if isinstance(names, dict):
+        items = tuple(sorted((int(k), v) for k, v in names.items()))
+    else:
+        items = tuple(enumerate(names or ()))
+    return _table_and_token(items)
+
+
+def compact_detections(
+    xyxy: Any,
+    scores: Any,
+    classes: Any,
+    names: Any,
+    packed: bool = False,
+    binary: bool = False,
+    known_token: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Columnar payload for arrays from ``model_service.boxes_to_arrays``.
+
+    ``binary`` keeps packed buffers as bytes (for MessagePack) instead of base64.
+    """
+    np = model_service.np
+    table, token = class_table(names)
+    payload: Dict[str, Any] = {"format": "packed" if packed else "compact", "count": int(len(scores)), "classes_token": token}
+    if known_token != token:
+        payload["classes"] = table
+    if packed:
+        boxes_buf = np.ascontiguousarray(xyxy, dtype="<f4").tobytes()
+        scores_buf = np.ascontiguousarray(scores, dtype="<f4").tobytes()
+        if binary:
+            payload["boxes"], payload["scores"] = boxes_buf, scores_buf
+        else:
+            payload["boxes"] = base64.b64encode(boxes_buf).decode("ascii")
+            payload["scores"] = base64.b64encode(scores_buf).decode("ascii")
+    else:
+        # Sub-pixel and 4th-decimal precision carry no information for drawing boxes; rounding
+        # in float64 also keeps float32 noise (0.8999999761...) out of the JSON
+        payload["boxes"] = np.round(np.asarray(xyxy, dtype=np.float64), 1).reshape(-1).tolist()
+        payload["scores"] = np.round(np.asarray(scores, dtype=np.float64), 4).tolist()
+    payload["class_ids"] = classes.tolist()
+    return payload
+
+
+def wants_msgpack(request: Request) -> bool:
+    """True when the client prefers MessagePack and the msgpack package is installed."""
+    if msgpack is None:
+        return False
+    return request.accept_mimetypes.best_match(["application/json", MSGPACK_MIMETYPE]) == MSGPACK_MIMETYPE
+
+
+def make_payload_response(payload: Dict[str, Any], use_msgpack: bool = False) -> Response:
+    if use_msgpack:
+        return Response(msgpack.packb(payload, use_bin_type=True), mimetype=MSGPACK_MIMETYPE)
+    return jsonify(payload)
@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from flask import current_app
+
+
+def make_cache_key(image_bytes: bytes, model_identity: str, conf: float, imgsz: int, variant: str = "") -> str:
+    """Content-addressed key: image bytes plus everything that changes the output.
+
+    ``variant`` distinguishes other inference modes (e.g. tiled settings).
+    """
+    digest = hashlib.sha256(image_bytes)
+    digest.update(f"|{model_identity}|{float(conf):.4f}|{int(imgsz)}|{variant}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """Two-tier inference result cache.
+
+    Entries are ``{"detections": [...], "annotated_path": str | None}``. The
+    in-memory tier is an LRU bounded by ``max_entries``; the optional disk tier
+    stores one JSON file per key under ``disk_dir`` so results survive restarts
+    and are shared between workers on the same host.
+    """
+
+    def __init__(self, max_entries: int = 256, disk_dir: Optional[Path] = None) -> None:
+        self.max_entries = max(0, int(max_entries))
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _disk_path(self, key: str) -> Path:
+        return self.disk_dir / key[:2] / f"{key}.json"
+
+    @staticmethod
+    def _is_valid(entry: Dict[str, Any]) -> bool:
+        # A hit must still be able to hand back its annotated image
+        annotated = entry.get("annotated_path")
+        return not annotated or os.path.exists(annotated)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if self._is_valid(entry):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry
+                del self._entries[key]
+
+        if self.disk_dir is not None:
+            path = self._disk_path(key)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+            except FileNotFoundError:
+                entry = None
+            except Exception as e:
+                print(f"[WARN] Result cache: unreadable entry {path}: {e}")
+                entry = None
+            if entry is not None and self._is_valid(entry):
+                self._remember(key, entry)
+                with self._lock:
+                    self.hits += 1
+                return entry
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, entry: Dict[str, Any]) -> None:
+        self._remember(key, entry)
+        if self.disk_dir is not None:
+            path = self._disk_path(key)
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(entry, f)
+                os.replace(tmp_path, path)
+            except Exception as e:
+                print(f"[WARN] Result cache: could not write {path}: {e}")
+
+    def _remember(self, key: str, entry: Dict[str, Any]) -> None:
+        if self.max_entries == 0:
+            return
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_dir": str(self.disk_dir) if self.disk_dir else None,
+            }
+
+
+_result_cache: Optional[ResultCache] = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> Optional[ResultCache]:
+    """Return the process-wide cache, or None when RESULT_CACHE_SIZE and RESULT_CACHE_DIR are both unset."""
+    global _result_cache
+    config = current_app.config
+    max_entries = int(config.get("RESULT_CACHE_SIZE", 0))
+    disk_dir = config.get("RESULT_CACHE_DIR") or None
+    if max_entries <= 0 and disk_dir is None:
+        return None
+    if _result_cache is None:
+        with _result_cache_lock:
+            if _result_cache is None:
+                _result_cache = ResultCache(max_entries=max_entries, disk_dir=disk_dir)
+    return _result_cache
@@ -0,0 +1,114 @@
+"""Tile layout and cross-tile box merging for sliced inference on large images."""
+import math
+from typing import Any, List, Tuple
+
+from app.services import model_service
+
+Tile = Tuple[int, int, int, int]  # x1, y1, x2, y2 in full-image pixels
+
+
+def _axis_starts(length: int, tile: int, step: int) -> List[int]:
+    if length <= tile:
+        return [0]
+    starts = list(range(0, length - tile, step))
+    # Last tile is pinned to the image edge instead of running past it
+    starts.append(length - tile)
+    return starts
+
+
+def tile_grid(height: int, width: int, tile_size: int = 640, overlap: float = 0.2, max_tiles: int = 64) -> List[Tile]:
+    """Overlapping tiles covering the image.
+
+    If the grid would exceed ``max_tiles`` the tile size grows until it fits, so
+    the number of forward passes stays bounded on very large images (each tile
+    is then downscaled to the model's input size).
+    """
+    overlap = min(max(float(overlap), 0.0), 0.9)
+    tile = max(32, int(tile_size))
+    while True:
+        step = max(1, int(tile * (1.0 - overlap)))
+        xs = _axis_starts(width, tile, step)
+        ys = _axis_starts(height, tile, step)
+        if len(xs) * len(ys) <= max(1, int(max_tiles)) or tile >= max(height, width):
+            break
+        tile = int(math.ceil(tile * 1.25))
+    return [(x, y, min(x + tile, width), min(y + tile, height)) for y in ys for x in xs]
+
+
+def box_iou(box: Any, boxes: Any) -> Any:
+    """IoU of one xyxy box against an (N, 4) array of boxes."""
+    np = model_service.np
+    x1 = np.maximum(box[0], boxes[:, 0])
+    y1 = np.maximum(box[1], boxes[:, 1])
+    x2 = np.minimum(box[2], boxes[:, 2])
+    y2 = np.minimum(box[3], boxes[:, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    return inter / np.maximum(area + areas - inter, 1e-9)
+
+
+def nms(boxes: Any, scores: Any, classes: Any, iou_threshold: float = 0.5) -> Any:
+    """Class-wise greedy NMS; returns indices of kept boxes, highest score first."""
+    np = model_service.np
+    keep: List[int] = []
+    for cls in np.unique(classes):
+        idx = np.where(classes == cls)[0]
+        idx = idx[np.argsort(-scores[idx])]
+        while idx.size:
+            best = idx[0]
+            keep.append(int(best))
+            if idx.size == 1:
+                break
+            ious = box_iou(boxes[best], boxes[idx[1:]])
+            idx = idx[1:][ious <= iou_threshold]
+    keep_arr = np.asarray(keep, dtype=np.int64)
+    return keep_arr[np.argsort(-scores[keep_arr])] if keep_arr.size else keep_arr
+
+
+def weighted_boxes_fusion(boxes: Any, scores: Any, classes: Any, iou_threshold: float = 0.55) -> Tuple[Any, Any, Any]:
+    """Class-wise box fusion: overlapping boxes are averaged, weighted by confidence.
+
+    Unlike NMS, which keeps only the top box of each cluster, this also uses the
+    boxes from neighbouring tiles that saw the other half of a split object.
+    """
+    np = model_service.np
+    fused_boxes, fused_scores, fused_classes = [], [], []
+    for cls in np.unique(classes):
+        idx = np.where(classes == cls)[0]
+        idx = idx[np.argsort(-scores[idx])]
+        clusters: List[List[int]] = []
+        cluster_boxes: List[Any] = []
+        for i in idx:
+            if cluster_boxes:
+                ious = box_iou(boxes[i], np.asarray(cluster_boxes))
+                best = int(np.argmax(ious))
+                if ious[best] > iou_threshold:
+                    members = clusters[best] + [int(i)]
+                    clusters[best] = members
+                    w = scores[members][:, None]
+                    cluster_boxes[best] = (boxes[members] * w).sum(axis=0) / w.sum()
+                    continue
+            clusters.append([int(i)])
+            cluster_boxes.append(boxes[i].astype(np.float64))
+        for members, fused in zip(clusters, cluster_boxes):
+            fused_boxes.append(fused)
+            fused_scores.append(float(scores[members].max()))
+            fused_classes.append(int(cls))
+    if not fused_boxes:
+        return boxes[:0], scores[:0], classes[:0]
+    order = np.argsort(-np.asarray(fused_scores))
+    return (
+        np.asarray(fused_boxes, dtype=np.float32)[order],
+        np.asarray(fused_scores, dtype=np.float32)[order],
+        np.asarray(fused_classes, dtype=np.int64)[order],
+    )
+
+
+def merge_boxes(boxes: Any, scores: Any, classes: Any, method: str = "nms", iou_threshold: float = 0.5) -> Tuple[Any, Any, Any]:
+    if len(boxes) == 0:
+        return boxes, scores, classes
+    if method == "wbf":
+        return weighted_boxes_fusion(boxes, scores, classes, iou_threshold)
+    keep = nms(boxes, scores, classes, iou_threshold)
+    return boxes[keep], scores[keep], classes[keep]
@@ -0,0 +1,258 @@
+"""Per-session stream mode for live video: keyframe detection plus box tracking.
+
+The detector runs only on keyframes: every ``STREAM_KEYFRAME_INTERVAL`` frames,
+on the first frame of a session, and whenever a scene change is detected
+(mean difference of small grayscale thumbnails). Between keyframes, tracked
+boxes are propagated by a constant-velocity Kalman filter. On keyframes, new
+detections are associated with existing tracks by class-aware greedy IoU
+matching, so each object keeps a stable ``track_id``.
+
+Sessions live in this worker process, so clients must stick to one worker
+(a single worker, or sticky routing) for stream mode to see its history.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from flask import current_app
+
+from app.services import model_service
+from app.services.tiling import box_iou
+
+
+class KalmanBoxFilter:
+    """Constant-velocity Kalman filter over a box's centre and size (cx, cy, w, h)."""
+
+    def __init__(self, box: Any) -> None:
+        np = model_service.np
+        self.x = np.zeros(8, dtype=np.float64)
+        self.x[:4] = self._to_cxcywh(box)
+        self.P = np.diag([10.0, 10.0, 10.0, 10.0, 1e3, 1e3, 1e3, 1e3])
+        self.F = np.eye(8)
+        self.F[:4, 4:] = np.eye(4)
+        self.H = np.eye(4, 8)
+        self.Q = np.diag([1.0, 1.0, 1.0, 1.0, 0.01, 0.01, 0.0001, 0.0001])
+        self.R = np.diag([4.0, 4.0, 10.0, 10.0])
+
+    @staticmethod
+    def _to_cxcywh(box: Any) -> Any:
+        np = model_service.np
+        x1, y1, x2, y2 = (float(v) for v in box)
+        return np.array([(x1 + x2) / 2, (y1 + y2) / 2, max(x2 - x1, 1.0), max(y2 - y1, 1.0)])
+
+    def predict(self) -> None:
+        self.x = self.F @ self.x
+        self.x[2:4] = self.x[2:4].clip(min=1.0)
+        self.P = self.F @ self.P @ self.F.T + self.Q
+
+    def update(self, box: Any) -> None:
+        np = model_service.np
+        y = self._to_cxcywh(box) - self.H @ self.x
+        S = self.H @ self.P @ self.H.T + self.R
+        K = self.P @ self.H.T @ np.linalg.inv(S)
+        self.x = self.x + K @ y
+        self.P = (np.eye(8) - K @ self.H) @ self.P
+
+    def box(self) -> Tuple[float, float, float, float]:
+        cx, cy, w, h = self.x[:4]
+        return cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2
+
+
+class Track:
+    __slots__ = ("track_id", "class_id", "score", "kf", "misses", "hits")
+
+    def __init__(self, track_id: int, box: Any, score: float, class_id: int) -> None:
+        self.track_id = track_id
+        self.class_id = class_id
+        self.score = score
+        self.kf = KalmanBoxFilter(box)
+        self.misses = 0  # consecutive keyframes without a matching detection
+        self.hits = 1
+
+
+class BoxTracker:
+    """IoU + Kalman multi-object tracker fed with detections on keyframes only."""
+
+    def __init__(self, iou_threshold: float = 0.3, max_misses: int = 2) -> None:
+        self.iou_threshold = float(iou_threshold)
+        self.max_misses = int(max_misses)
+        self.tracks: List[Track] = []
+        self._next_id = 1
+
+    def step(self) -> None:
+        """Advance every track by one frame."""
+        for track in self.tracks:
+            track.kf.predict()
+
+    def update(self, xyxy: Any, scores: Any, classes: Any) -> None:
+        """Associate a keyframe's detections with the (already stepped) tracks."""
+        np = model_service.np
+        matched_tracks, matched_dets = set(), set()
+        if self.tracks and len(xyxy):
+            predicted = np.array([t.kf.box() for t in self.tracks], dtype=np.float64)
+            ious = np.stack([box_iou(box, predicted) for box in xyxy.astype(np.float64)])
+            track_classes = np.array([t.class_id for t in self.tracks])
+            ious[classes[:, None] != track_classes[None, :]] = 0.0
+            # Greedy assignment, best overlap first
+            for flat in np.argsort(-ious, axis=None):
+                d, t = divmod(int(flat), len(self.tracks))
+                if ious[d, t] < self.iou_threshold:
+                    break
+                if d in matched_dets or t in matched_tracks:
+                    continue
+                track = self.tracks[t]
+                track.kf.update(xyxy[d])
+                track.score = float(scores[d])
+                track.misses = 0
+                track.hits += 1
+                matched_dets.add(d)
+                matched_tracks.add(t)
+
+        for t, track in enumerate(self.tracks):
+            if t not in matched_tracks:
+                track.misses += 1
+        self.tracks = [t for t in self.tracks if t.misses <= self.max_misses]
+
+        for d in range(len(xyxy)):
+            if d not in matched_dets:
+                self.tracks.append(Track(self._next_id, xyxy[d], float(scores[d]), int(classes[d])))
+                self._next_id += 1
+
+    def active(self) -> Tuple[Any, Any, Any, Any]:
+        """``(xyxy, scores, class_ids, track_ids)`` of tracks matched at the last keyframe."""
+        np = model_service.np
+        live = [t for t in self.tracks if t.misses == 0]
+        if not live:
+            return (
+                np.zeros((0, 4), dtype=np.float32),
+                np.zeros((0,), dtype=np.float32),
+                np.zeros((0,), dtype=np.int64),
+                np.zeros((0,), dtype=np.int64),
+            )
+        return (
+            np.array([t.kf.box() for t in live], dtype=np.float32),
+            np.array([t.score for t in live], dtype=np.float32),
+            np.array([t.class_id for t in live], dtype=np.int64),
+            np.array([t.track_id for t in live], dtype=np.int64),
+        )
+
+
+class StreamSession:
+    def __init__(self, iou_threshold: float, max_misses: int) -> None:
+        self.lock = threading.Lock()
+        self.tracker = BoxTracker(iou_threshold=iou_threshold, max_misses=max_misses)
+        self.frame_index = -1
+        self.last_keyframe = None  # frame index of the last detector run
+        self.thumbnail: Optional[Any] = None
+        self.names: Any = None
+        self.model: Optional[str] = None  # registry key of the model behind the tracks
+        self.frame_shape: Optional[Tuple[int, ...]] = None  # tracks are in this frame's pixel space
+        self.resolution: Optional[Any] = None  # resolution.AdaptiveResolution with a latency budget
+        self.motion: Optional[Any] = None  # motion.MotionGate when the stream is motion-gated
+        self.last_seen = time.monotonic()
+
+
+def scene_thumbnail(img: Any, size: int = 32) -> Any:
+    """Tiny grayscale copy of the frame used for cheap scene-change detection."""
+    cv2 = model_service.cv2
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    return cv2.resize(gray, (size, size), interpolation=cv2.INTER_AREA).astype(model_service.np.float32)
+
+
+class SessionStore:
+    """Stream sessions keyed by client-chosen id, expired after ``ttl`` seconds idle."""
+
+    def __init__(self, max_sessions: int = 256, ttl: float = 60.0) -> None:
+        self.max_sessions = max(1, int(max_sessions))
+        self.ttl = float(ttl)
+        self._sessions: "OrderedDict[str, StreamSession]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str, iou_threshold: float = 0.3, max_misses: int = 2) -> StreamSession:
+        now = time.monotonic()
+        with self._lock:
+            # Kept in last-seen order, so idle sessions are all at the front
+            while self._sessions:
+                oldest_id = next(iter(self._sessions))
+                if now - self._sessions[oldest_id].last_seen <= self.ttl:
+                    break
+                del self._sessions[oldest_id]
+            session = self._sessions.get(session_id)
+            if session is None:
+                while len(self._sessions) >= self.max_sessions:
+                    self._sessions.popitem(last=False)
+                session = self._sessions[session_id] = StreamSession(iou_threshold, max_misses)
+            session.last_seen = now
+            self._sessions.move_to_end(session_id)
+            return session
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+_session_store: Optional[SessionStore] = None
+_session_store_lock = threading.Lock()
+
+
+def get_session_store() -> SessionStore:
+    global _session_store
+    if _session_store is None:
+        with _session_store_lock:
+            if _session_store is None:
+                config = current_app.config
+                _session_store = SessionStore(
+                    max_sessions=config.get("STREAM_MAX_SESSIONS", 256),
+                    ttl=config.get("STREAM_SESSION_TTL", 60.0),
+                )
+    return _session_store
+
+
+def process_stream_frame(
+    session: StreamSession, img: Any, detect: Any, force_keyframe: bool = False
+) -> Dict[str, Any]:
+    """Advance ``session`` by one frame; ``detect(img)`` returns ``(xyxy, scores, classes, names)``.
+
+    Returns ``{"xyxy", "scores", "classes", "track_ids", "names", "keyframe", "frame"}``.
+    Callers hold ``session.lock``.
+    """
+    np = model_service.np
+    config = current_app.config
+    interval = max(1, int(config.get("STREAM_KEYFRAME_INTERVAL", 5)))
+    threshold = float(config.get("STREAM_SCENE_CHANGE_THRESHOLD", 12.0))
+
+    session.frame_index += 1
+    thumbnail = scene_thumbnail(img)
+    keyframe = (
+        force_keyframe
+        or session.last_keyframe is None
+        or session.frame_index - session.last_keyframe >= interval
+        or session.thumbnail is None
+        or thumbnail.shape != session.thumbnail.shape
+        or img.shape != session.frame_shape
+        or float(np.abs(thumbnail - session.thumbnail).mean()) > threshold
+    )
+
+    session.tracker.step()
+    if keyframe:
+        xyxy, scores, classes, names = detect(img)
+        session.tracker.update(xyxy, scores, classes)
+        session.names = names
+        session.last_keyframe = session.frame_index
+        # Scene changes are measured against the last frame the detector saw
+        session.thumbnail = thumbnail
+        session.frame_shape = img.shape
+
+    xyxy, scores, classes, track_ids = session.tracker.active()
+    height, width = img.shape[:2]
+    xyxy[:, [0, 2]] = xyxy[:, [0, 2]].clip(0, width)
+    xyxy[:, [1, 3]] = xyxy[:, [1, 3]].clip(0, height)
+    return {
+        "xyxy": xyxy,
+        "scores": scores,
+        "classes": classes,
+        "track_ids": track_ids,
+        "names": session.names,
+        "keyframe": keyframe,
+        "frame": session.frame_index,
+    }
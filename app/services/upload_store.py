@@ -0,0 +1,258 @@
+"""Content-addressed upload storage with bounded disk usage.
+
+Uploads are stored once per distinct content, under their SHA-256:
+``UPLOAD_FOLDER/<aa>/<bb>/<sha256><ext>``. Uploading the same bytes again reuses
+the existing file and refreshes its modification time. Annotated outputs go
+under ``annotated/<aa>/<bb>/`` and are written as JPEG or WebP
+(``ANNOTATED_FORMAT``) instead of lossless PNG. Two levels of 256 shards keep
+every directory small even with millions of files.
+
+A background thread in each process runs the retention policy every
+``UPLOAD_EVICT_INTERVAL_S``. It deletes files older than ``UPLOAD_MAX_AGE_HOURS``,
+then the least recently used ones (by modification time) until the folder fits in
+``UPLOAD_MAX_MB``. It covers everything under ``UPLOAD_FOLDER``, including files
+from before this layout and video outputs. Files younger than ``MIN_EVICT_AGE_S``
+are never evicted, so an upload is not deleted between its save and its inference.
+Several workers evicting the same folder at once is harmless: a file that is
+already gone is skipped.
+"""
+import hashlib
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from flask import current_app
+
+from app.services import metrics
+
+ANNOTATED_DIR = "annotated"
+ANNOTATED_FORMATS = ("jpg", "webp", "png")
+MIN_EVICT_AGE_S = 300.0
+_CHUNK = 1024 * 1024
+
+
+def _shard(digest: str) -> Path:
+    return Path(digest[:2]) / digest[2:4]
+
+
+class UploadStore:
+    """Deduplicated, sharded upload folder with age and size limits (0 disables a limit)."""
+
+    def __init__(
+        self,
+        root: Path,
+        max_bytes: int = 0,
+        max_age_s: float = 0.0,
+        evict_interval_s: float = 300.0,
+        annotated_format: str = "jpg",
+        annotated_quality: int = 85,
+    ) -> None:
+        self.root = Path(root)
+        self.max_bytes = max(0, int(max_bytes))
+        self.max_age_s = max(0.0, float(max_age_s))
+        self.evict_interval_s = max(1.0, float(evict_interval_s))
+        self.annotated_format = annotated_format if annotated_format in ANNOTATED_FORMATS else "jpg"
+        self.annotated_quality = max(1, min(100, int(annotated_quality)))
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self.last_eviction: Dict[str, Any] = {}
+
+    def save(self, stream: Any, ext: str) -> Tuple[Path, bool]:
+        """Store the bytes read from ``stream`` (file-like) under their hash; returns ``(path, duplicate)``.
+
+        The content is streamed to a temporary file while it is hashed, so large
+        videos are never held in memory.
+        """
+        ext = ext.lower() if ext.startswith(".") else f".{ext.lower()}"
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.root / f".upload-{uuid.uuid4().hex}.tmp"
+        digest = hashlib.sha256()
+        try:
+            with open(tmp_path, "wb") as f:
+                while True:
+                    chunk = stream.read(_CHUNK)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    f.write(chunk)
+            name = digest.hexdigest()
+            path = self.root / _shard(name) / f"{name}{ext}"
+            if path.exists():
+                os.utime(path)  # recently used again: last in line for size eviction
+                metrics.UPLOADS_TOTAL.inc("duplicate")
+                return path, True
+            path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp_path, path)
+            metrics.UPLOADS_TOTAL.inc("stored")
+            return path, False
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+
+    def save_bytes(self, data: bytes, ext: str) -> Tuple[Path, bool]:
+        from io import BytesIO
+
+        return self.save(BytesIO(data), ext)
+
+    def annotated_path(self, source_path: str, variant: str = "") -> Path:
+        """Where the annotated copy of ``source_path`` goes for this ``variant`` (model, conf, tiling)."""
+        stem = Path(source_path).stem
+        tag = hashlib.sha256(f"{source_path}|{variant}".encode("utf-8")).hexdigest()[:12]
+        name = f"{stem}_{tag}.{self.annotated_format}"
+        return self.root / ANNOTATED_DIR / _shard(tag) / name
+
+    def write_annotated(self, img: Any, path: Path) -> bool:
+        """Encode a BGR frame as ``annotated_format`` and write it atomically; False if encoding failed."""
+        from app.services import model_service
+
+        cv2 = model_service.cv2
+        params: List[int] = []
+        if self.annotated_format == "jpg":
+            params = [int(cv2.IMWRITE_JPEG_QUALITY), self.annotated_quality]
+        elif self.annotated_format == "webp":
+            params = [int(cv2.IMWRITE_WEBP_QUALITY), self.annotated_quality]
+        ok, buffer = cv2.imencode(f".{self.annotated_format}", img, params)
+        if not ok:
+            return False
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(buffer.tobytes())
+        os.replace(tmp_path, path)
+        return True
+
+    def usage(self) -> Tuple[int, int]:
+        """``(files, bytes)`` currently under the root."""
+        files = self._scan()
+        return len(files), sum(size for _, size, _ in files)
+
+    def _scan(self) -> List[Tuple[float, int, str]]:
+        """``(mtime, size, path)`` of every file under the root."""
+        found: List[Tuple[float, int, str]] = []
+        pending = [str(self.root)]
+        while pending:
+            directory = pending.pop()
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                pending.append(entry.path)
+                            elif entry.is_file(follow_symlinks=False):
+                                stat = entry.stat(follow_symlinks=False)
+                                found.append((stat.st_mtime, stat.st_size, entry.path))
+                        except FileNotFoundError:
+                            continue
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+        return found
+
+    def evict(self, now: Optional[float] = None) -> Dict[str, Any]:
+        """Apply the age and size limits once; returns what was removed and what is left."""
+        now = time.time() if now is None else now
+        files = sorted(self._scan())  # oldest first
+        total = sum(size for _, size, _ in files)
+        removed = {"age": 0, "size": 0}
+        freed = 0
+        kept = []
+        for mtime, size, path in files:
+            age = now - mtime
+            if self.max_age_s and age > self.max_age_s and age > MIN_EVICT_AGE_S:
+                if self._remove(path):
+                    removed["age"] += 1
+                    freed += size
+                total -= size
+            else:
+                kept.append((mtime, size, path))
+        if self.max_bytes:
+            for mtime, size, path in kept:
+                if total <= self.max_bytes:
+                    break
+                if now - mtime <= MIN_EVICT_AGE_S:
+                    break  # the rest is newer still
+                if self._remove(path):
+                    removed["size"] += 1
+                    freed += size
+                total -= size
+        for reason, count in removed.items():
+            if count:
+                metrics.UPLOAD_EVICTIONS_TOTAL.inc(reason, amount=count)
+        self.last_eviction = {
+            "at": now,
+            "removed_age": removed["age"],
+            "removed_size": removed["size"],
+            "freed_bytes": freed,
+            "bytes": total,
+            "files": len(files) - removed["age"] - removed["size"],
+        }
+        if removed["age"] or removed["size"]:
+            print(
+                f"[INFO] Upload store: evicted {removed['age']} expired and {removed['size']} over-budget "
+                f"file(s), freed {freed / 1e6:.1f} MB ({total / 1e6:.1f} MB left)"
+            )
+        return self.last_eviction
+
+    @staticmethod
+    def _remove(path: str) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            return False
+        except OSError as e:
+            print(f"[WARN] Upload store: could not remove {path}: {e}")
+            return False
+
+    def ensure_evictor(self) -> None:
+        """Start this process's background eviction thread if a limit is set and it is not running."""
+        if not (self.max_bytes or self.max_age_s):
+            return
+        pid = os.getpid()
+        if self._thread is not None and self._pid == pid and self._thread.is_alive():
+            return
+        with self._lock:
+            # Threads do not survive fork(): each worker starts its own
+            if self._thread is None or self._pid != pid or not self._thread.is_alive():
+                self._pid = pid
+                self._thread = threading.Thread(target=self._run, name="upload-evictor", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self.evict()
+            except Exception as e:
+                print(f"[WARN] Upload store: eviction pass failed: {e}")
+            time.sleep(self.evict_interval_s)
+
+
+_upload_store: Optional[UploadStore] = None
+_upload_store_lock = threading.Lock()
+
+
+def get_upload_store() -> UploadStore:
+    """Return the process-wide store for ``UPLOAD_FOLDER``, with its eviction thread running."""
+    global _upload_store
+    if _upload_store is None:
+        config = current_app.config
+        with _upload_store_lock:
+            if _upload_store is None:
+                _upload_store = UploadStore(
+                    config["UPLOAD_FOLDER"],
+                    max_bytes=int(float(config.get("UPLOAD_MAX_MB", 0)) * 1024 * 1024),
+                    max_age_s=float(config.get("UPLOAD_MAX_AGE_HOURS", 0)) * 3600.0,
+                    evict_interval_s=config.get("UPLOAD_EVICT_INTERVAL_S", 300),
+                    annotated_format=str(config.get("ANNOTATED_FORMAT", "jpg")).lower().lstrip("."),
+                    annotated_quality=config.get("ANNOTATED_QUALITY", 85),
+                )
+    _upload_store.ensure_evictor()
+    return _upload_store
+
+
+def peek_upload_store() -> Optional[UploadStore]:
+    """The store if this process created one; never creates it."""
+    return _upload_store
@@ -0,0 +1,356 @@
+"""Video files and streams through a pipelined decode -> preprocess -> infer -> encode stage graph.
+
+Each stage runs on its own thread, with bounded queues between stages, so
+decoding frame N+1, letterboxing batch K+1, the forward pass on batch K and
+annotating/encoding earlier frames overlap instead of running one after another:
+
+    decode      cv2.VideoCapture reads frames from a file or a stream URL
+    preprocess  groups frames into batches of up to ``batch_size`` and letterboxes
+                them into one of ``PREPARE_SLOTS`` buffer sets (``preprocess.prepare``)
+    infer       runs the network on the prepared batch, then hands the slot back
+    encode      draws the boxes, writes the annotated video and one JSONL line per frame
+
+A slow stage fills the queue in front of it and the stages upstream block on
+``put``, so at most ``queue_size`` frames wait between two stages. When the
+fast preprocessing path does not apply (``PREPROCESS_FAST_PATH=0``, exported
+backends before their first call, stand-in models) the frames pass through
+``preprocess`` untouched and ``infer`` runs them through the stock ultralytics
+path. Either way the forward pass runs on an instance checked out of the
+model's pool (``model_service.checkout``), like every other caller's.
+"""
+import json
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set, TextIO, Tuple
+from urllib.parse import unquote, urlparse
+
+from app.services import metrics, model_service
+from app.services.lazy_imports import available
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv", ".webm", ".m4v", ".mpg", ".mpeg")
+STREAM_SCHEMES = ("rtsp", "rtsps", "rtmp", "http", "https")
+# Buffer sets for prepared batches: one being filled while the other is inferred
+PREPARE_SLOTS = 2
+# Output container -> fourcc OpenCV's bundled FFmpeg can write without extra codecs
+FOURCCS = {".mp4": "mp4v", ".m4v": "mp4v", ".mov": "mp4v", ".avi": "MJPG", ".mkv": "MJPG", ".webm": "VP80"}
+DEFAULT_FPS = 25.0
+
+_DONE = object()
+
+
+def is_stream_url(source: str) -> bool:
+    return urlparse(str(source)).scheme.lower() in STREAM_SCHEMES
+
+
+def capture_target(source: str) -> str:
+    """What to hand ``cv2.VideoCapture``: ``file://`` URLs become local paths, the rest pass through.
+
+    A ``file://`` URL to a recorded clip therefore stands in for a live stream
+    in tests and offline runs.
+    """
+    parsed = urlparse(str(source))
+    if parsed.scheme.lower() == "file":
+        return unquote(parsed.path)
+    return str(source)
+
+
+def open_capture(source: str) -> Any:
+    cv2 = model_service.cv2
+    target = capture_target(source)
+    if not is_stream_url(target) and not os.path.exists(target):
+        raise FileNotFoundError(f"No such video: {target}")
+    capture = cv2.VideoCapture(target)
+    if not capture.isOpened():
+        capture.release()
+        raise RuntimeError(f"Could not open video source: {source}")
+    return capture
+
+
+class VideoStats:
+    """Frame counts and the time each stage spent working (not waiting on its queues)."""
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.frames = 0
+        self.batches = 0
+        self.detections = 0
+        self.width: Optional[int] = None
+        self.height: Optional[int] = None
+        self.source_fps: Optional[float] = None
+        self.stage_seconds = {"decode": 0.0, "preprocess": 0.0, "infer": 0.0, "encode": 0.0}
+
+    def as_dict(self) -> Dict[str, Any]:
+        elapsed = time.perf_counter() - self.started
+        return {
+            "frames": self.frames,
+            "batches": self.batches,
+            "detections": self.detections,
+            "width": self.width,
+            "height": self.height,
+            "source_fps": self.source_fps,
+            "seconds": round(elapsed, 3),
+            "frames_per_sec": round(self.frames / elapsed, 2) if elapsed > 0 else None,
+            "stage_seconds": {stage: round(seconds, 3) for stage, seconds in self.stage_seconds.items()},
+        }
+
+
+class VideoPipeline:
+    """Run ``model`` over every frame of ``source``; iterate ``run()`` for the per-frame records.
+
+    ``video_path`` and ``jsonl_path`` are optional outputs: the annotated video
+    (container picked by suffix, see ``FOURCCS``) and one JSON line per frame.
+    ``max_frames`` caps the frames read (0 = until the source ends), which
+    bounds endless streams. Closing the ``run()`` iterator early stops all stages.
+    """
+
+    def __init__(
+        self,
+        model: Any,
+        source: str,
+        video_path: Optional[Path] = None,
+        jsonl_path: Optional[Path] = None,
+        conf: float = 0.25,
+        imgsz: int = 640,
+        batch_size: int = 4,
+        queue_size: int = 8,
+        max_frames: int = 0,
+        fast_preprocess: bool = True,
+    ) -> None:
+        self.model = model
+        self.source = source
+        self.video_path = Path(video_path) if video_path else None
+        self.jsonl_path = Path(jsonl_path) if jsonl_path else None
+        self.conf = float(conf)
+        self.imgsz = int(imgsz)
+        self.batch_size = max(1, int(batch_size))
+        self.queue_size = max(1, int(queue_size))
+        self.max_frames = max(0, int(max_frames))
+        self.fast_preprocess = fast_preprocess
+        self.stats = VideoStats()
+        self.error: Optional[str] = None
+        self._stop = threading.Event()
+        self._decoded: "queue.Queue[Any]" = queue.Queue(maxsize=self.queue_size)
+        # Batches, not frames: bounded so that about queue_size frames wait here too
+        self._prepared: "queue.Queue[Any]" = queue.Queue(maxsize=max(1, self.queue_size // self.batch_size))
+        self._inferred: "queue.Queue[Any]" = queue.Queue(maxsize=self.queue_size)
+        self._records: "queue.Queue[Any]" = queue.Queue(maxsize=self.queue_size)
+        self._free_slots: "queue.Queue[Any]" = queue.Queue()
+        self._closed: Set[int] = set()
+
+    def run(self) -> Iterator[Dict[str, Any]]:
+        """Start the stages and yield ``{"frame", "time", "detections", "count"}`` per frame, in order."""
+        if not (available(model_service.np) and available(model_service.cv2)):
+            raise RuntimeError("Image processing libraries (numpy/cv2) not available for video decode")
+        capture = open_capture(self.source)
+        fps = capture.get(model_service.cv2.CAP_PROP_FPS)
+        self.stats.source_fps = round(fps, 3) if fps and fps > 0 else None
+
+        from app.services import preprocess
+
+        for _ in range(PREPARE_SLOTS):
+            self._free_slots.put(preprocess.BufferCache(max_shapes=1))
+        stages = [
+            ("decode", self._decode, None, self._decoded, capture),
+            ("preprocess", self._preprocess, self._decoded, self._prepared),
+            ("infer", self._infer, self._prepared, self._inferred),
+            ("encode", self._encode, self._inferred, self._records),
+        ]
+        threads = [
+            threading.Thread(target=self._stage, args=stage, name=f"video-{stage[0]}", daemon=True) for stage in stages
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            while True:
+                record = self._get(self._records)
+                if record is _DONE:
+                    break
+                yield record
+        finally:
+            self._close(self._records)
+            self._stop.set()
+            for thread in threads:
+                thread.join(timeout=10)
+            capture.release()
+
+    def stop(self) -> None:
+        """Abort: every stage exits without finishing the queued frames."""
+        self._stop.set()
+
+    def _stage(
+        self, name: str, body: Any, inbox: Optional["queue.Queue[Any]"], outbox: "queue.Queue[Any]", *args: Any
+    ) -> None:
+        try:
+            body(*args)
+        except Exception as e:
+            print(f"[ERROR] Video pipeline: {name} stage failed: {e}")
+            metrics.ERRORS_TOTAL.inc("video", name)
+            if self.error is None:
+                self.error = f"{name} failed: {e}"
+        finally:
+            # Upstream stages stop on their next put; downstream ones finish
+            # the frames already queued, then see the end marker
+            if inbox is not None:
+                self._close(inbox)
+            self._put(outbox, _DONE)
+
+    def _record(self, stage: str, started: float) -> None:
+        elapsed = time.perf_counter() - started
+        self.stats.stage_seconds[stage] += elapsed
+        metrics.STAGE_SECONDS.observe(elapsed, f"video_{stage}")
+
+    def _close(self, q: "queue.Queue[Any]") -> None:
+        """Mark ``q``'s consumer as gone, so puts into it give up instead of blocking."""
+        self._closed.add(id(q))
+
+    def _put(self, q: "queue.Queue[Any]", item: Any) -> bool:
+        """Blocking put; False (item dropped) if the consumer is gone or the pipeline was aborted."""
+        while id(q) not in self._closed and not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q: "queue.Queue[Any]", until: Optional["queue.Queue[Any]"] = None) -> Any:
+        """Blocking get; ``_DONE`` once the pipeline was aborted, or ``until``'s consumer is gone."""
+        while True:
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                if self._stop.is_set() or (until is not None and id(until) in self._closed):
+                    return _DONE
+
+    def _decode(self, capture: Any) -> None:
+        cv2 = model_service.cv2
+        index = 0
+        while not self._stop.is_set() and (not self.max_frames or index < self.max_frames):
+            started = time.perf_counter()
+            ok, frame = capture.read()
+            if not ok:
+                break
+            msec = capture.get(cv2.CAP_PROP_POS_MSEC)
+            self._record("decode", started)
+            timestamp = round(msec / 1000.0, 3) if msec is not None and msec >= 0 else None
+            if not self._put(self._decoded, (index, timestamp, frame)):
+                return
+            index += 1
+
+    def _preprocess(self) -> None:
+        from app.services import preprocess
+
+        finished = False
+        while not finished:
+            item = self._get(self._decoded)
+            if item is _DONE:
+                return
+            frames = [item]
+            # Batch whatever is already decoded; never wait for a full batch (live streams)
+            while len(frames) < self.batch_size:
+                try:
+                    item = self._decoded.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _DONE:
+                    finished = True
+                    break
+                frames.append(item)
+
+            slot, batch = None, None
+            if self.fast_preprocess and preprocess.supports(self.model):
+                # Both slots may sit in the prepared queue of an infer stage that died
+                slot = self._get(self._free_slots, until=self._prepared)
+                if slot is _DONE:
+                    return
+                started = time.perf_counter()
+                batch = preprocess.prepare(self.model, [frame for _, _, frame in frames], self.imgsz, buffers=slot)
+                self._record("preprocess", started)
+            if not self._put(self._prepared, (frames, batch, slot)):
+                return
+
+    def _infer(self) -> None:
+        from app.services import preprocess
+
+        while True:
+            item = self._get(self._prepared)
+            if item is _DONE:
+                return
+            frames, batch, slot = item
+            images = [frame for _, _, frame in frames]
+            started = time.perf_counter()
+            try:
+                with model_service.checkout(self.model) as instance:
+                    # A replica made before the model's first run has no predictor for the prepared batch yet
+                    if batch is not None and preprocess.supports(instance):
+                        results = preprocess.infer(instance, images, batch, conf=self.conf)
+                    else:
+                        results = model_service.run_instance(
+                            instance, images, imgsz=self.imgsz, conf=self.conf, fast_preprocess=self.fast_preprocess
+                        )
+            finally:
+                if slot is not None:
+                    self._free_slots.put(slot)
+            self._record("infer", started)
+            self.stats.batches += 1
+            for (index, timestamp, frame), result in zip(frames, results):
+                xyxy, scores, classes = model_service.boxes_to_arrays(result)
+                names = getattr(result, "names", None)
+                if not self._put(self._inferred, (index, timestamp, frame, xyxy, scores, classes, names)):
+                    return
+
+    def _encode(self) -> None:
+        writer: Any = None
+        jsonl: Optional[TextIO] = None
+        try:
+            if self.jsonl_path is not None:
+                self.jsonl_path.parent.mkdir(parents=True, exist_ok=True)
+                jsonl = open(self.jsonl_path, "w", encoding="utf-8")
+            while True:
+                item = self._get(self._inferred)
+                if item is _DONE:
+                    return
+                index, timestamp, frame, xyxy, scores, classes, names = item
+                started = time.perf_counter()
+                detections = model_service.detections_from_arrays(xyxy, scores, classes, names)
+                if self.video_path is not None:
+                    if writer is None:
+                        writer = self._open_writer(frame.shape[1], frame.shape[0])
+                    writer.write(model_service.render_detections(frame, detections))
+                record = {"frame": index, "time": timestamp, "detections": detections, "count": len(detections)}
+                if jsonl is not None:
+                    jsonl.write(json.dumps(record) + "\n")
+                self._record("encode", started)
+                self.stats.frames += 1
+                self.stats.detections += len(detections)
+                if self.stats.width is None:
+                    self.stats.height, self.stats.width = frame.shape[:2]
+                if not self._put(self._records, record):
+                    return
+        finally:
+            if writer is not None:
+                writer.release()
+            if jsonl is not None:
+                jsonl.close()
+
+    def _open_writer(self, width: int, height: int) -> Any:
+        cv2 = model_service.cv2
+        self.video_path.parent.mkdir(parents=True, exist_ok=True)
+        fourcc = FOURCCS.get(self.video_path.suffix.lower(), "mp4v")
+        fps = self.stats.source_fps or DEFAULT_FPS
+        writer = cv2.VideoWriter(str(self.video_path), cv2.VideoWriter_fourcc(*fourcc), fps, (width, height))
+        if not writer.isOpened():
+            raise RuntimeError(f"Could not open video writer for {self.video_path} ({fourcc})")
+        return writer
+
+
+def run_video(model: Any, source: str, **options: Any) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """Process a whole video; returns ``(records, stats)``. Raises if a stage failed."""
+    pipeline = VideoPipeline(model, source, **options)
+    records = list(pipeline.run())
+    if pipeline.error:
+        raise RuntimeError(pipeline.error)
+    return records, pipeline.stats.as_dict()
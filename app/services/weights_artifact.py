@@ -0,0 +1,186 @@
+"""Memory-mapped weights artifacts for the PyTorch backend.
+
+The file uses the safetensors layout: an 8-byte little-endian header length,
+a JSON header (``{name: {"dtype", "shape", "data_offsets"}, "__metadata__": {...}}``)
+and one flat tensor buffer. ``safetensors`` can read the files, but it is not
+needed to write or load them. Tensors are stored widest dtype first, so every
+tensor starts at an offset aligned for its dtype.
+
+Loading maps the buffer copy-on-write and views the tensors straight out of
+it, so nothing is unpickled and nothing is copied. The network skeleton is
+built on the meta device with the fused module layout AutoBackend expects,
+then given the mapped tensors with ``load_state_dict(assign=True)``. Workers
+that load the same file share one page-cache copy of the weights. A page only
+becomes private to a worker if that worker writes to it (for example by
+switching to fp16/bf16).
+
+Artifacts are written by ``tools/convert_ckpt.py``.
+"""
+import copy
+import itertools
+import json
+import os
+import struct
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import torch
+
+FORMAT_NAME = "camo-yolo-detect/1"
+_HEADER_ALIGN = 8
+
+_DTYPES = {
+    "F64": torch.float64,
+    "I64": torch.int64,
+    "F32": torch.float32,
+    "I32": torch.int32,
+    "F16": torch.float16,
+    "BF16": torch.bfloat16,
+    "I16": torch.int16,
+    "I8": torch.int8,
+    "U8": torch.uint8,
+    "BOOL": torch.bool,
+}
+_DTYPE_NAMES = {dtype: name for name, dtype in _DTYPES.items()}
+
+
+def save_tensors(path: Path, tensors: Dict[str, Any], metadata: Optional[Dict[str, str]] = None) -> int:
+    """Write ``tensors`` to ``path`` atomically; returns the size in bytes."""
+    ordered = sorted(tensors.items(), key=lambda kv: (-kv[1].element_size(), kv[0]))
+    header: Dict[str, Any] = {}
+    blobs = []
+    offset = 0
+    for name, tensor in ordered:
+        tensor = tensor.detach().cpu().contiguous()
+        if tensor.dtype not in _DTYPE_NAMES:
+            raise ValueError(f"{name}: unsupported dtype {tensor.dtype}")
+        nbytes = tensor.numel() * tensor.element_size()
+        header[name] = {
+            "dtype": _DTYPE_NAMES[tensor.dtype],
+            "shape": list(tensor.shape),
+            "data_offsets": [offset, offset + nbytes],
+        }
+        blobs.append(tensor)
+        offset += nbytes
+    if metadata:
+        header["__metadata__"] = {str(k): str(v) for k, v in metadata.items()}
+
+    raw = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    raw += b" " * (-(8 + len(raw)) % _HEADER_ALIGN)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(struct.pack("<Q", len(raw)))
+        f.write(raw)
+        for tensor in blobs:
+            if tensor.numel():
+                f.write(tensor.reshape(-1).view(torch.uint8).numpy().tobytes())
+    # A worker starting up concurrently never maps a half-written file
+    os.replace(tmp_path, path)
+    return 8 + len(raw) + offset
+
+
+def load_tensors(path: Path) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """``(tensors, metadata)`` with every tensor a zero-copy view of the mapped file."""
+    with open(path, "rb") as f:
+        (header_len,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(header_len))
+    metadata = header.pop("__metadata__", {})
+    data = np.memmap(path, dtype=np.uint8, mode="c")
+    base = 8 + header_len
+    tensors = {}
+    for name, spec in header.items():
+        start, end = spec["data_offsets"]
+        dtype = _DTYPES[spec["dtype"]]
+        if start == end:
+            tensors[name] = torch.empty(spec["shape"], dtype=dtype)
+        else:
+            tensors[name] = torch.from_numpy(data[base + start:base + end]).view(dtype).reshape(spec["shape"])
+    return tensors, metadata
+
+
+def save_model(model: Any, path: Path) -> int:
+    """Write a ``YOLO`` detection model (or its ``DetectionModel``) as a fused artifact."""
+    net = getattr(model, "model", model)
+    if type(net).__name__ != "DetectionModel":
+        raise ValueError(f"Only detection models can be saved, got {type(net).__name__}")
+    # Fuse a copy so the caller's model is left as it was
+    net = copy.deepcopy(net).float().eval()
+    net.fuse(verbose=False)
+    metadata = {
+        "format": FORMAT_NAME,
+        "yaml": json.dumps(net.yaml, default=str),
+        "names": json.dumps({int(k): str(v) for k, v in net.names.items()}),
+        "stride": json.dumps([float(s) for s in net.stride.tolist()]),
+        "imgsz": str(getattr(net, "args", {}).get("imgsz", 640)),
+    }
+    return save_tensors(path, net.state_dict(), metadata)
+
+
+def _fuse_skeleton(net: Any) -> None:
+    """Give a meta-device network the module structure ``net.fuse()`` produces.
+
+    Only the structure matters here, since the fused weights come from the
+    artifact. Building it directly avoids running the Conv/BN arithmetic on meta
+    tensors, which is slow.
+    """
+    from ultralytics.nn.modules import Conv, Conv2, ConvTranspose, DWConv, RepConv
+
+    modules = list(net.model.modules())
+    if any(isinstance(m, (Conv2, ConvTranspose, RepConv)) for m in modules):
+        net.fuse(verbose=False)  # blocks with more involved fusion; slower, but exact
+        return
+    for m in modules:
+        if isinstance(m, (Conv, DWConv)) and hasattr(m, "bn"):
+            c = m.conv
+            m.conv = torch.nn.Conv2d(
+                c.in_channels, c.out_channels, c.kernel_size, c.stride, c.padding, c.dilation, c.groups,
+                bias=True, device="meta",
+            ).requires_grad_(False)
+            delattr(m, "bn")
+            m.forward = m.forward_fuse
+
+
+def build_model(tensors: Dict[str, Any], metadata: Dict[str, str]) -> Any:
+    """Fused ``DetectionModel`` whose parameters are the given tensors (no copies)."""
+    from ultralytics.nn.tasks import DetectionModel, initialize_weights, parse_model
+    from ultralytics.utils import DEFAULT_CFG_DICT
+
+    if metadata.get("format") != FORMAT_NAME:
+        raise ValueError(f"Not a {FORMAT_NAME} artifact (format={metadata.get('format')!r})")
+    cfg = json.loads(metadata["yaml"])
+    # DetectionModel.__init__ runs a forward pass and bias init to find the strides, which
+    # cannot run on the meta device; the strides are stored in the artifact instead
+    with torch.device("meta"):
+        net = DetectionModel.__new__(DetectionModel)
+        torch.nn.Module.__init__(net)
+        net.yaml = cfg
+        net.model, net.save = parse_model(copy.deepcopy(cfg), ch=cfg.get("ch", 3), verbose=False)
+        initialize_weights(net)
+        _fuse_skeleton(net)
+    net.load_state_dict(tensors, strict=True, assign=True)
+
+    stride = torch.tensor(json.loads(metadata["stride"]), dtype=torch.float32)
+    net.names = {int(k): v for k, v in json.loads(metadata["names"]).items()}
+    net.inplace = cfg.get("inplace", True)
+    head = net.model[-1]
+    head.inplace = net.inplace
+    head.stride = net.stride = stride
+    missing = [n for n, t in itertools.chain(net.named_parameters(), net.named_buffers()) if t.is_meta]
+    if missing:
+        raise ValueError(f"Artifact does not provide {len(missing)} tensors, e.g. {missing[0]}")
+    net.task = "detect"
+    # Same defaults ultralytics gives a model built from YAML (export reads them)
+    net.args = {**DEFAULT_CFG_DICT, "task": "detect", "imgsz": int(metadata.get("imgsz", 640))}
+    return net.eval()
+
+
+def load_yolo(path: Path, yolo_cls: Any) -> Any:
+    """A ``yolo_cls`` (ultralytics ``YOLO``) instance serving the memory-mapped artifact at ``path``."""
+    tensors, metadata = load_tensors(path)
+    net = build_model(tensors, metadata)
+    net.pt_path = str(path)  # exports are written next to the artifact, like for a .pt
+    # Constructing from the artifact path only records it; the network is attached below
+    yolo = yolo_cls(str(path), task="detect")
+    yolo.model = net
+    return yolo
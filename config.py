@@ -9,6 +9,136 @@ class BaseConfig:
     UPLOAD_FOLDER = Path(__file__).resolve().parent / "static" / "uploads"
     DEBUG = False
 
+    # Inference backend: pytorch (.pt), torchscript, onnx or openvino (see tools/export_model.py)
+    MODEL_BACKEND = os.environ.get("MODEL_BACKEND", "pytorch").lower()
+    # Numeric precision: fp32, fp16/bf16 (pytorch backend, CPU permitting) or int8
+    # (quantized ONNX artifact from tools/quantize_model.py, with MODEL_BACKEND=onnx)
+    MODEL_PRECISION = os.environ.get("MODEL_PRECISION", "fp32").lower()
+    MODEL_CHANNELS_LAST = os.environ.get("MODEL_CHANNELS_LAST", "0").lower() in ("1", "true", "yes")
+    # Pickled .pt checkpoints run code when loaded; set to 0 once models/ holds .safetensors
+    # artifacts (tools/convert_ckpt.py) so only those are accepted
+    ALLOW_PICKLE_WEIGHTS = os.environ.get("ALLOW_PICKLE_WEIGHTS", "1").lower() in ("1", "true", "yes")
+
+    # Model registry: name@version artifacts in MODELS_DIR, the manifest naming default/current
+    # versions, how often it is re-read, and the memory cap for loaded models (0 = unlimited)
+    DEFAULT_MODEL = os.environ.get("DEFAULT_MODEL", "")
+    MODEL_REGISTRY_MANIFEST = os.environ.get("MODEL_REGISTRY_MANIFEST", "models.json")
+    MODEL_REGISTRY_REFRESH_S = float(os.environ.get("MODEL_REGISTRY_REFRESH_S", "2"))
+    MODEL_MEMORY_BUDGET_MB = float(os.environ.get("MODEL_MEMORY_BUDGET_MB", "1024"))
+
+    # Inference input size, and startup preload/warm-up (see gunicorn.conf.py for preload_app)
+    INFERENCE_IMGSZ = int(os.environ.get("INFERENCE_IMGSZ", "640"))
+    PRELOAD_MODEL = os.environ.get("PRELOAD_MODEL", "0").lower() in ("1", "true", "yes")
+    WARMUP_RUNS = int(os.environ.get("WARMUP_RUNS", "2"))
+
+    # Input sizes requests may ask for (imgsz=...), the size used when they do not (fixed =
+    # INFERENCE_IMGSZ, auto = from the image dimensions), and warming every size up at startup
+    INFERENCE_IMGSZ_CHOICES = os.environ.get("INFERENCE_IMGSZ_CHOICES", "320,416,512,640,960")
+    INFERENCE_IMGSZ_POLICY = os.environ.get("INFERENCE_IMGSZ_POLICY", "fixed").lower()
+    WARMUP_ALL_IMGSZ = os.environ.get("WARMUP_ALL_IMGSZ", "1").lower() in ("1", "true", "yes")
+
+    # Letterbox frames into reused per-thread buffers and feed the model a ready tensor, and
+    # decode JPEGs much larger than INFERENCE_IMGSZ at 1/2, 1/4 or 1/8 scale (live_detect)
+    PREPROCESS_FAST_PATH = os.environ.get("PREPROCESS_FAST_PATH", "1").lower() in ("1", "true", "yes")
+    DECODE_REDUCED_JPEG = os.environ.get("DECODE_REDUCED_JPEG", "1").lower() in ("1", "true", "yes")
+
+    # /api/live_detect returns only boxes unless a client asks for return_image
+    LIVE_DETECT_RETURN_IMAGE = os.environ.get("LIVE_DETECT_RETURN_IMAGE", "0").lower() in ("1", "true", "yes")
+    LIVE_DETECT_JPEG_QUALITY = int(os.environ.get("LIVE_DETECT_JPEG_QUALITY", "80"))
+    # Default detection layout when a request has no "format": full, compact or packed
+    LIVE_DETECT_RESPONSE_FORMAT = os.environ.get("LIVE_DETECT_RESPONSE_FORMAT", "full").lower()
+
+    # Stream mode (live_detect with a session id): detect on keyframes, track boxes in between
+    STREAM_KEYFRAME_INTERVAL = int(os.environ.get("STREAM_KEYFRAME_INTERVAL", "5"))
+    STREAM_SCENE_CHANGE_THRESHOLD = float(os.environ.get("STREAM_SCENE_CHANGE_THRESHOLD", "12"))
+    STREAM_TRACK_IOU = float(os.environ.get("STREAM_TRACK_IOU", "0.3"))
+    STREAM_TRACK_MAX_MISSES = int(os.environ.get("STREAM_TRACK_MAX_MISSES", "2"))
+    STREAM_SESSION_TTL = float(os.environ.get("STREAM_SESSION_TTL", "60"))
+    STREAM_MAX_SESSIONS = int(os.environ.get("STREAM_MAX_SESSIONS", "256"))
+    # Stream input size when the client sends none (0 = as other requests), and the keyframe
+    # latency budget it steps down from (0 = fixed size) but never below STREAM_MIN_IMGSZ
+    STREAM_IMGSZ = int(os.environ.get("STREAM_IMGSZ", "0"))
+    STREAM_LATENCY_BUDGET_MS = float(os.environ.get("STREAM_LATENCY_BUDGET_MS", "0"))
+    STREAM_MIN_IMGSZ = int(os.environ.get("STREAM_MIN_IMGSZ", "320"))
+    # Motion gating for static cameras (default for sessions without "motion"): per-pixel gray-level
+    # change, smallest changed area and largest before the whole frame runs (fractions of the
+    # frame), width of the motion analysis frame, and seconds between forced full-frame passes
+    STREAM_MOTION_GATING = os.environ.get("STREAM_MOTION_GATING", "0").lower() in ("1", "true", "yes")
+    MOTION_THRESHOLD = float(os.environ.get("MOTION_THRESHOLD", "25"))
+    MOTION_MIN_AREA = float(os.environ.get("MOTION_MIN_AREA", "0.002"))
+    MOTION_MAX_AREA = float(os.environ.get("MOTION_MAX_AREA", "0.5"))
+    MOTION_ANALYSIS_WIDTH = int(os.environ.get("MOTION_ANALYSIS_WIDTH", "160"))
+    MOTION_REFRESH_S = float(os.environ.get("MOTION_REFRESH_S", "10"))
+
+    # Admission control for live_detect: concurrent frames per worker, max wait for a slot before
+    # answering 429, and the bounds of the frame interval suggested to clients
+    ADMISSION_ENABLED = os.environ.get("ADMISSION_ENABLED", "1").lower() in ("1", "true", "yes")
+    ADMISSION_MAX_IN_FLIGHT = int(os.environ.get("ADMISSION_MAX_IN_FLIGHT", "8"))
+    ADMISSION_MAX_WAIT_MS = float(os.environ.get("ADMISSION_MAX_WAIT_MS", "50"))
+    LIVE_MIN_FRAME_INTERVAL_MS = float(os.environ.get("LIVE_MIN_FRAME_INTERVAL_MS", "66"))
+    LIVE_MAX_FRAME_INTERVAL_MS = float(os.environ.get("LIVE_MAX_FRAME_INTERVAL_MS", "2000"))
+
+    # Upload storage: deduplicated and sharded under UPLOAD_FOLDER, evicted in the background
+    # past a size cap or an age (0 disables either); annotated outputs as jpg, webp or png
+    UPLOAD_MAX_MB = float(os.environ.get("UPLOAD_MAX_MB", "2048"))
+    UPLOAD_MAX_AGE_HOURS = float(os.environ.get("UPLOAD_MAX_AGE_HOURS", "168"))
+    UPLOAD_EVICT_INTERVAL_S = float(os.environ.get("UPLOAD_EVICT_INTERVAL_S", "300"))
+    ANNOTATED_FORMAT = os.environ.get("ANNOTATED_FORMAT", "jpg").lower()
+    ANNOTATED_QUALITY = int(os.environ.get("ANNOTATED_QUALITY", "85"))
+
+    # Result cache for repeated images: in-memory LRU entries (0 disables) and optional disk tier
+    RESULT_CACHE_SIZE = int(os.environ.get("RESULT_CACHE_SIZE", "256"))
+    RESULT_CACHE_DIR = os.environ.get("RESULT_CACHE_DIR") or None
+
+    # Async upload inference: worker processes per web worker (0 = run inline in the request),
+    # seconds /predict holds the request for its job (0 = redirect at once, the page polls), and
+    # seconds finished jobs are kept in JOBS_DIR (0 = forever)
+    INFERENCE_WORKERS = int(os.environ.get("INFERENCE_WORKERS", "0"))
+    JOBS_DIR = Path(os.environ.get("JOBS_DIR", Path(__file__).resolve().parent / "instance" / "jobs"))
+    JOB_WAIT_TIMEOUT = float(os.environ.get("JOB_WAIT_TIMEOUT", "0"))
+    JOB_TTL = float(os.environ.get("JOB_TTL", "3600"))
+
+    # Tiled (sliced) inference for high-resolution images: tile size in px, overlap fraction,
+    # tile cap (tiles grow past TILE_SIZE to respect it), tiles per forward pass (bounds peak
+    # memory), merge method nms|wbf
+    TILE_SIZE = int(os.environ.get("TILE_SIZE", "640"))
+    TILE_OVERLAP = float(os.environ.get("TILE_OVERLAP", "0.2"))
+    TILE_MAX_TILES = int(os.environ.get("TILE_MAX_TILES", "64"))
+    TILE_BATCH_SIZE = int(os.environ.get("TILE_BATCH_SIZE", "8"))
+    TILE_MERGE = os.environ.get("TILE_MERGE", "nms").lower()
+    TILE_MERGE_IOU = float(os.environ.get("TILE_MERGE_IOU", "0.5"))
+    TILE_INCLUDE_FULL_IMAGE = os.environ.get("TILE_INCLUDE_FULL_IMAGE", "1").lower() in ("1", "true", "yes")
+
+    # Bulk inference (/api/batch_detect, tools/batch_detect.py); BATCH_INPUT_ROOT enables server-side paths
+    BATCH_DETECT_BATCH_SIZE = int(os.environ.get("BATCH_DETECT_BATCH_SIZE", "8"))
+    BATCH_DETECT_PREFETCH = int(os.environ.get("BATCH_DETECT_PREFETCH", "32"))
+    BATCH_DETECT_DECODE_WORKERS = int(os.environ.get("BATCH_DETECT_DECODE_WORKERS", "4"))
+    BATCH_INPUT_ROOT = Path(os.environ["BATCH_INPUT_ROOT"]) if os.environ.get("BATCH_INPUT_ROOT") else None
+
+    # Video ingestion (/api/video_detect, tools/video_detect.py): frames per forward pass, frames
+    # queued between pipeline stages, frame cap per request (0 = none), rtsp/http sources allowed
+    VIDEO_BATCH_SIZE = int(os.environ.get("VIDEO_BATCH_SIZE", "4"))
+    VIDEO_QUEUE_SIZE = int(os.environ.get("VIDEO_QUEUE_SIZE", "8"))
+    VIDEO_MAX_FRAMES = int(os.environ.get("VIDEO_MAX_FRAMES", "9000"))
+    VIDEO_STREAM_URLS = os.environ.get("VIDEO_STREAM_URLS", "0").lower() in ("1", "true", "yes")
+
+    # Cross-request micro-batching: frames from concurrent requests share one forward pass
+    INFERENCE_BATCHING = os.environ.get("INFERENCE_BATCHING", "1").lower() in ("1", "true", "yes")
+    INFERENCE_BATCH_MAX_SIZE = int(os.environ.get("INFERENCE_BATCH_MAX_SIZE", "8"))
+    INFERENCE_BATCH_MAX_WAIT_MS = float(os.environ.get("INFERENCE_BATCH_MAX_WAIT_MS", "10"))
+
+    # Concurrency per web worker: model instances running forward passes at once (1 = one pass at
+    # a time, N = up to N replicas in parallel, 0 = unsynchronized), and the torch / OpenCV threads
+    # per pass (0 = the cores divided by WEB_CONCURRENCY x INFERENCE_REPLICAS)
+    WEB_CONCURRENCY = int(os.environ.get("WEB_CONCURRENCY", "1"))
+    INFERENCE_REPLICAS = int(os.environ.get("INFERENCE_REPLICAS", "1"))
+    TORCH_NUM_THREADS = int(os.environ.get("TORCH_NUM_THREADS", "0"))
+    OPENCV_NUM_THREADS = int(os.environ.get("OPENCV_NUM_THREADS", "0"))
+
+    # Prometheus /metrics endpoint and per-stage timers; per-frame request logging is opt-in
+    METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1").lower() in ("1", "true", "yes")
+    VERBOSE_REQUEST_LOGS = os.environ.get("VERBOSE_REQUEST_LOGS", "0").lower() in ("1", "true", "yes")
+
 
 class DevConfig(BaseConfig):
     DEBUG = True
@@ -16,5 +146,6 @@ class DevConfig(BaseConfig):
 
 class ProdConfig(BaseConfig):
     DEBUG = False
+    PRELOAD_MODEL = os.environ.get("PRELOAD_MODEL", "1").lower() in ("1", "true", "yes")
 
 
@@ -0,0 +1,15 @@
+"""
+Gunicorn settings, picked up automatically from the working directory.
+Command-line flags (e.g. those in Procfile) take precedence over these values.
+"""
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "120"))
+workers = int(os.environ.get("WEB_CONCURRENCY", "1"))
+threads = int(os.environ.get("GUNICORN_THREADS", "1"))
+
+# Import the app (and, with PRELOAD_MODEL, load + warm the model) once in the
+# master before forking, so workers share the weights copy-on-write and none of
+# them pays the cold start inside its boot timeout.
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1").lower() in ("1", "true", "yes")
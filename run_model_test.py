@@ -32,12 +32,13 @@ with app.app_context():
     uploads_dir: Path = app.config['UPLOAD_FOLDER']
     uploads_dir.mkdir(parents=True, exist_ok=True)
 
-    # pick first image in uploads
+    # pick first uploaded image (uploads are sharded into subdirectories; skip annotated outputs)
     sample = None
-    for ext in ("*.jpg", "*.jpeg", "*.png", "*.webp"):
-        matches = list(uploads_dir.glob(ext))
-        if matches:
-            sample = matches[0]
+    for path in uploads_dir.rglob("*"):
+        if path.suffix.lower() not in (".jpg", ".jpeg", ".png", ".webp"):
+            continue
+        if "annotated" not in path.parts and not path.name.startswith("annotated_"):
+            sample = path
             break
 
     if sample is None:
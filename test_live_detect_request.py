@@ -37,6 +37,16 @@ def main() -> None:
 
     print("Response JSON:", data)
 
+    # Same frame as a raw JPEG body (the transport used by the live webcam page)
+    print(f"POST {live_url} (image/jpeg body) ...")
+    resp = requests.post(live_url, data=img_bytes, headers={"Content-Type": "image/jpeg"})
+    print("Status code:", resp.status_code)
+    try:
+        print("Response JSON:", resp.json())
+    except Exception as e:
+        print("✗ Failed to parse JSON response:", e)
+        print("Raw text:", resp.text[:400])
+
 
 if __name__ == "__main__":
     main()
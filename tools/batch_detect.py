@@ -0,0 +1,94 @@
+"""Bulk inference over directories, zip/tar archives and image files.
+
+Usage (from the repository root):
+    python tools/batch_detect.py field_imagery/ --out results.jsonl
+    python tools/batch_detect.py night1.zip night2.tar.gz --out results.parquet --batch-size 16
+    python tools/batch_detect.py a.jpg b.jpg --out - --conf 0.3
+
+Images are decoded by a thread pool with a bounded prefetch window and run
+through batched forward passes with the same model the web service loads.
+Throughput statistics are printed to stderr (and appended to JSONL output).
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from app import create_app  # noqa: E402
+from app.services import batch_inference, model_registry, model_service  # noqa: E402
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("sources", nargs="+", type=Path, help="directories, archives or image files")
+    parser.add_argument("--out", required=True, help="output .jsonl / .parquet file, or - for JSONL on stdout")
+    parser.add_argument("--format", choices=("jsonl", "parquet"), default=None, help="default: from --out suffix")
+    parser.add_argument(
+        "--detections", choices=("full", "compact", "packed"), default="full",
+        help="JSONL record layout: detection dicts, or columnar arrays with the class table sent once",
+    )
+    parser.add_argument("--model", default=None, help="registry model, NAME or NAME@VERSION (default: the default model)")
+    parser.add_argument("--conf", type=float, default=0.25)
+    parser.add_argument("--imgsz", type=int, default=None, help="default: INFERENCE_IMGSZ")
+    parser.add_argument("--batch-size", type=int, default=None, help="default: BATCH_DETECT_BATCH_SIZE")
+    parser.add_argument("--prefetch", type=int, default=None, help="max decoded images held in memory")
+    parser.add_argument("--decode-workers", type=int, default=None)
+    args = parser.parse_args()
+    out_format = args.format or ("parquet" if args.out.lower().endswith(".parquet") else "jsonl")
+    if out_format == "parquet" and args.detections != "full":
+        parser.error("--detections compact/packed only applies to JSONL output (Parquet is already columnar)")
+
+    app = create_app()
+    with app.app_context():
+        config = app.config
+        try:
+            model = model_service.load_model(args.model)
+        except model_registry.UnknownModelError as e:
+            print(e, file=sys.stderr)
+            return 2
+        if model is None:
+            print("Model could not be loaded:", model_service.get_last_model_error(), file=sys.stderr)
+            return 2
+
+        if args.out == "-":
+            writer = None
+        else:
+            writer = batch_inference.open_writer(Path(args.out), args.format)
+
+        stats = batch_inference.BatchStats()
+        records = batch_inference.run_batch(
+            model,
+            batch_inference.iter_sources(args.sources),
+            conf=args.conf,
+            imgsz=args.imgsz or config.get("INFERENCE_IMGSZ", 640),
+            batch_size=args.batch_size or config.get("BATCH_DETECT_BATCH_SIZE", 8),
+            prefetch=args.prefetch or config.get("BATCH_DETECT_PREFETCH", 32),
+            decode_workers=args.decode_workers or config.get("BATCH_DETECT_DECODE_WORKERS", 4),
+            stats=stats,
+            response_format=args.detections,
+            fast_preprocess=config.get("PREPROCESS_FAST_PATH", True),
+        )
+        try:
+            for record in records:
+                if writer is None:
+                    print(json.dumps(record))
+                else:
+                    writer.write(record)
+                if stats.images and stats.images % 500 == 0:
+                    print(f"... {stats.images} images, {stats.as_dict()['images_per_sec']} img/s", file=sys.stderr)
+        finally:
+            if writer is None:
+                print(json.dumps({"summary": stats.as_dict()}))
+            else:
+                writer.write_summary(stats.as_dict())
+                writer.close()
+
+    print("Summary:", json.dumps(stats.as_dict()), file=sys.stderr)
+    return 0 if stats.errors == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,375 @@
+"""Reproducible in-process benchmark of the inference service.
+
+Usage (from the repository root):
+    python tools/benchmark.py --json bench.json
+    python tools/benchmark.py --real --images field_imagery/ --json bench-real.json
+    python tools/benchmark.py --compare bench.json --max-regression 10
+
+Everything runs in this process. ``model_service`` is called directly and the
+Flask routes go through the test client, so no server, network or GPU is
+needed. By default a stand-in model (``FakeModel``) replaces the detector. It
+returns fixed boxes after a configurable per-batch and per-image delay, so the
+numbers measure the service around the model: decode, batching, serialization
+and admission. ``--real`` benchmarks the model the service would load instead
+(``--model`` picks a registry model).
+
+Scenarios:
+    single   predict_one() latency per image (mean/p50/p95/p99)
+    batch    /api/batch_detect throughput in images/s
+    live     /api/live_detect JPEG frames from --concurrency clients (p50/p95/p99, 429s)
+
+Peak RSS is recorded after each scenario. ``--json`` writes the report, and
+``--compare`` checks it against an earlier one: the exit status is 1 if a
+latency percentile or throughput got worse by more than ``--max-regression``
+percent.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from app import create_app  # noqa: E402
+from app.services import batch_inference, lazy_imports, model_registry, model_service  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+FAKE_MODEL_KEY = "fake"
+
+
+class _HostArray:
+    """Stands in for a CPU tensor: ``.cpu().numpy()`` is all the service calls."""
+
+    def __init__(self, array: Any) -> None:
+        self.array = array
+
+    def cpu(self) -> "_HostArray":
+        return self
+
+    def numpy(self) -> Any:
+        return self.array
+
+
+class _FakeBoxes:
+    def __init__(self, data: Any) -> None:
+        self.data = _HostArray(data)
+
+    def __len__(self) -> int:
+        return len(self.data.array)
+
+
+class _FakeResult:
+    def __init__(self, boxes: Any, names: Dict[int, str], shape: Any) -> None:
+        self.boxes = _FakeBoxes(boxes)
+        self.names = names
+        self.orig_shape = shape
+
+
+class FakeModel:
+    """Callable like ``ultralytics.YOLO``: sleeps, then returns ``boxes`` detections per image."""
+
+    names = {0: "camouflaged_object"}
+
+    def __init__(self, batch_ms: float = 5.0, image_ms: float = 2.0, boxes: int = 3) -> None:
+        self.batch_ms = batch_ms
+        self.image_ms = image_ms
+        self.boxes = boxes
+
+    def __call__(self, source: Any, imgsz: int = 640, conf: float = 0.25, verbose: bool = False, **_: Any) -> List[Any]:
+        np = model_service.np
+        sources = source if isinstance(source, list) else [source]
+        time.sleep((self.batch_ms + self.image_ms * len(sources)) / 1000.0)
+        results = []
+        for img in sources:
+            if isinstance(img, (str, Path)):
+                img = model_service.cv2.imread(str(img))
+            h, w = img.shape[:2]
+            rows = [
+                (w * 0.1 * (i + 1), h * 0.2, w * (0.1 * (i + 1) + 0.15), h * 0.6, 0.9 - 0.1 * i, 0)
+                for i in range(self.boxes)
+            ]
+            data = np.array(rows, dtype=np.float32).reshape(-1, 6)
+            results.append(_FakeResult(data[data[:, 4] >= conf], self.names, (h, w)))
+        return results
+
+
+def _percentiles(samples_ms: List[float]) -> Dict[str, Optional[float]]:
+    if not samples_ms:
+        return {"n": 0, "mean_ms": None, "p50_ms": None, "p95_ms": None, "p99_ms": None}
+    ordered = sorted(samples_ms)
+
+    def pct(q: float) -> float:
+        # Nearest-rank percentile, stable for small sample counts
+        return round(ordered[max(0, math.ceil(q * len(ordered)) - 1)], 3)
+
+    return {
+        "n": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered), 3),
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+    }
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process so far."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def load_images(paths: List[Path], limit: int, size: int) -> List[bytes]:
+    """Encoded JPEGs from ``paths``, or synthetic frames when none are given or found."""
+    np, cv2 = model_service.np, model_service.cv2
+    frames: List[bytes] = []
+    if paths:
+        for _, img, _ in batch_inference.decode_pipeline(batch_inference.iter_sources(paths)):
+            if img is not None:
+                frames.append(cv2.imencode(".jpg", img, [int(cv2.IMWRITE_JPEG_QUALITY), 90])[1].tobytes())
+            if len(frames) >= limit:
+                break
+    if not frames:
+        rng = np.random.default_rng(0)
+        for _ in range(min(limit, 8)):
+            # Smooth noise compresses like a photo rather than like static
+            img = cv2.resize(rng.integers(0, 255, (size // 16, size // 16, 3), dtype=np.uint8), (size, size))
+            frames.append(cv2.imencode(".jpg", img, [int(cv2.IMWRITE_JPEG_QUALITY), 90])[1].tobytes())
+    return frames
+
+
+def bench_single(model: Any, images: List[Any], imgsz: int, iterations: int, warmup: int) -> Dict[str, Any]:
+    for i in range(warmup):
+        model_service.predict_one(model, images[i % len(images)], imgsz=imgsz)
+    samples = []
+    for i in range(iterations):
+        started = time.perf_counter()
+        model_service.predict_one(model, images[i % len(images)], imgsz=imgsz)
+        samples.append((time.perf_counter() - started) * 1000.0)
+    return _percentiles(samples)
+
+
+def bench_batch(client: Any, frames: List[bytes], count: int, model: Optional[str]) -> Dict[str, Any]:
+    from io import BytesIO
+
+    data: Dict[str, Any] = {"files": [(BytesIO(frames[i % len(frames)]), f"img{i}.jpg") for i in range(count)]}
+    if model:
+        data["model"] = model
+    started = time.perf_counter()
+    response = client.post("/api/batch_detect", data=data, content_type="multipart/form-data")
+    lines = response.get_data(as_text=True).splitlines()
+    elapsed = time.perf_counter() - started
+    summary = json.loads(lines[-1]).get("summary", {}) if lines else {}
+    return {
+        "status": response.status_code,
+        "images": summary.get("images", 0),
+        "errors": summary.get("errors"),
+        "seconds": round(elapsed, 3),
+        "images_per_sec": round(summary.get("images", 0) / elapsed, 2) if elapsed > 0 else None,
+        "inference_seconds": summary.get("inference_seconds"),
+    }
+
+
+def bench_live(app: Any, frames: List[bytes], iterations: int, concurrency: int, warmup: int, model: Optional[str]) -> Dict[str, Any]:
+    query = f"?model={model}" if model else ""
+    samples: List[float] = []
+    statuses: Dict[int, int] = {}
+    lock = threading.Lock()
+    per_client = max(1, iterations // max(1, concurrency))
+
+    def client_loop(index: int) -> None:
+        client = app.test_client()
+        for i in range(warmup + per_client):
+            started = time.perf_counter()
+            response = client.post(
+                "/api/live_detect" + query, data=frames[(index + i) % len(frames)], content_type="image/jpeg"
+            )
+            elapsed = (time.perf_counter() - started) * 1000.0
+            if i < warmup:
+                continue
+            with lock:
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+                if response.status_code == 200:
+                    samples.append(elapsed)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client_loop, args=(i,)) for i in range(max(1, concurrency))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return {
+        **_percentiles(samples),
+        "concurrency": concurrency,
+        "frames_per_sec": round(len(samples) / elapsed, 2) if elapsed > 0 else None,
+        "status_counts": {str(k): v for k, v in sorted(statuses.items())},
+    }
+
+
+# Metrics compared by --compare: (scenario, key, True if higher is better)
+COMPARED = [
+    ("single", "p50_ms", False),
+    ("single", "p95_ms", False),
+    ("single", "p99_ms", False),
+    ("batch", "images_per_sec", True),
+    ("live", "p50_ms", False),
+    ("live", "p95_ms", False),
+    ("live", "p99_ms", False),
+    ("live", "frames_per_sec", True),
+    ("memory", "peak_rss_mb", False),
+]
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> List[str]:
+    """Print the change of every compared metric; return the ones that regressed past the limit."""
+    regressions = []
+    print(f"\n{'metric':<24}{'baseline':>12}{'current':>12}{'change':>10}")
+    for scenario, key, higher_is_better in COMPARED:
+        old = baseline.get("results", {}).get(scenario, {}).get(key)
+        new = report["results"].get(scenario, {}).get(key)
+        if not old or new is None:
+            continue
+        change = (new - old) / old * 100.0
+        worse = -change if higher_is_better else change
+        flag = "  REGRESSION" if worse > max_regression else ""
+        print(f"{scenario + '.' + key:<24}{old:>12}{new:>12}{change:>+9.1f}%{flag}")
+        if flag:
+            regressions.append(f"{scenario}.{key}")
+    return regressions
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--real", action="store_true", help="benchmark the real model instead of the stand-in")
+    parser.add_argument("--model", default=None, help="with --real: registry model, NAME or NAME@VERSION")
+    parser.add_argument("--images", nargs="*", type=Path, default=[], help="image dirs/archives/files (default: synthetic)")
+    parser.add_argument("--limit", type=int, default=32, help="max distinct images")
+    parser.add_argument("--imgsz", type=int, default=None, help="default: INFERENCE_IMGSZ")
+    parser.add_argument("--frame-size", type=int, default=640, help="synthetic frame size in px")
+    parser.add_argument("--scenarios", nargs="+", choices=("single", "batch", "live"), default=["single", "batch", "live"])
+    parser.add_argument("--iterations", type=int, default=200, help="timed calls per latency scenario")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--batch-images", type=int, default=64, help="images per /api/batch_detect request")
+    parser.add_argument("--concurrency", type=int, default=4, help="simultaneous live_detect clients")
+    parser.add_argument("--fake-batch-ms", type=float, default=5.0, help="stand-in model: delay per forward pass")
+    parser.add_argument("--fake-image-ms", type=float, default=2.0, help="stand-in model: delay per image in a pass")
+    parser.add_argument("--json", type=Path, default=None, help="write the report here")
+    parser.add_argument("--compare", type=Path, default=None, help="earlier report to check for regressions")
+    parser.add_argument("--max-regression", type=float, default=10.0, help="allowed slowdown in percent")
+    args = parser.parse_args()
+
+    if args.model and not args.real:
+        parser.error("--model needs --real")
+    # In-process runs: no startup preload, and per-frame logging would dominate the timings
+    os.environ["PRELOAD_MODEL"] = "0"
+    app = create_app()
+    app.config.update(PRELOAD_MODEL=False, VERBOSE_REQUEST_LOGS=False)
+    with app.app_context():
+        if not (lazy_imports.available(model_service.np) and lazy_imports.available(model_service.cv2)):
+            print("numpy and OpenCV are required:", model_service.get_last_model_error())
+            return 1
+        imgsz = args.imgsz or app.config.get("INFERENCE_IMGSZ", 640)
+        if not args.real:
+            app.config["DEFAULT_MODEL"] = FAKE_MODEL_KEY
+            model_registry.get_registry().register(
+                FAKE_MODEL_KEY, FakeModel(batch_ms=args.fake_batch_ms, image_ms=args.fake_image_ms)
+            )
+        started = time.perf_counter()
+        try:
+            model = model_service.load_model(args.model)
+        except model_registry.UnknownModelError as e:
+            print(e)
+            return 2
+        if model is None:
+            print("Model could not be loaded:", model_service.get_last_model_error())
+            return 2
+        load_seconds = time.perf_counter() - started
+        info = model_service.get_model_info(model)
+        model_key = info.get("model")
+
+        frames = load_images(args.images, args.limit, args.frame_size)
+        images = [model_service.decode_image_bytes(frame) for frame in frames]
+        print(f"Model {model_key} ({info.get('backend')}, {info.get('precision')}), {len(frames)} images, imgsz={imgsz}")
+
+        results: Dict[str, Any] = {"load": {"seconds": round(load_seconds, 3)}}
+        memory: Dict[str, Any] = {"after_load_mb": peak_rss_mb()}
+        client = app.test_client()
+        if "single" in args.scenarios:
+            results["single"] = bench_single(model, images, imgsz, args.iterations, args.warmup)
+            memory["after_single_mb"] = peak_rss_mb()
+            print("single:", results["single"])
+        if "batch" in args.scenarios:
+            results["batch"] = bench_batch(client, frames, args.batch_images, args.model)
+            memory["after_batch_mb"] = peak_rss_mb()
+            print("batch:", results["batch"])
+        if "live" in args.scenarios:
+            results["live"] = bench_live(app, frames, args.iterations, args.concurrency, args.warmup, args.model)
+            memory["after_live_mb"] = peak_rss_mb()
+            print("live:", results["live"])
+        results["memory"] = {**memory, "peak_rss_mb": peak_rss_mb()}
+        print("memory:", results["memory"])
+
+        config = app.config
+        report = {
+            "meta": {
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "git_commit": _git_commit(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "model": model_key if args.real else "fake",
+                "backend": info.get("backend"),
+                "precision": info.get("precision"),
+                "imgsz": imgsz,
+                "images": len(frames),
+                "synthetic_images": not args.images,
+                "iterations": args.iterations,
+                "concurrency": args.concurrency,
+                "fake_model_ms": None if args.real else {"batch": args.fake_batch_ms, "image": args.fake_image_ms},
+                "inference_batching": config.get("INFERENCE_BATCHING"),
+                "admission_enabled": config.get("ADMISSION_ENABLED"),
+                "result_cache_size": config.get("RESULT_CACHE_SIZE"),
+            },
+            "results": results,
+        }
+
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+        print("Report written to", args.json)
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())
+        if baseline.get("meta", {}).get("model") != report["meta"]["model"]:
+            print(f"[WARN] Baseline ran model {baseline.get('meta', {}).get('model')}, this run {report['meta']['model']}")
+        regressions = compare(report, baseline, args.max_regression)
+        if regressions:
+            print(f"Regressed by more than {args.max_regression}%: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,64 +1,96 @@
-import torch, traceback, sys, os
-p = 'models/best (1).pt'
-out = 'models/best_weights_only.pt'
-print('Loading checkpoint (weights_only=False):', p)
-try:
-    ckpt = torch.load(p, map_location='cpu', weights_only=False)
-    print('Loaded checkpoint type:', type(ckpt))
-except Exception as e:
-    print('ERROR loading checkpoint:', e)
-    traceback.print_exc()
-    sys.exit(1)
-
-model_obj = ckpt.get('model', None) if isinstance(ckpt, dict) else None
-if model_obj is None:
-    print('No model object in checkpoint -- trying to locate state_dict directly')
-    if isinstance(ckpt, dict) and any(isinstance(v, dict) for v in ckpt.values()):
-        # try to find a nested state_dict
-        for k,v in ckpt.items():
-            if isinstance(v, dict) and all(hasattr(val, 'dtype') if hasattr(val, 'dtype') else True for val in v.values()):
-                print('Found possible state_dict under key:', k)
-                sd = v
-                break
-        else:
-            print('Could not find state_dict in checkpoint')
-            sys.exit(2)
-else:
-    sd = None
-    # try common ways to get state dict
+"""Convert a pickled YOLO checkpoint into a memory-mapped ``.safetensors`` artifact.
+
+Usage (from the repository root):
+    python tools/convert_ckpt.py
+    python tools/convert_ckpt.py --weights "models/best (1).pt" --verify static/images/cod03.png
+
+The checkpoint is unpickled once here, on a trusted machine. That is the only
+time its pickle runs. The fused detection network is written next to it as
+``<stem>.safetensors``: raw tensors plus a JSON header with the architecture,
+class names and strides. ``load_model()`` prefers that artifact over the
+``.pt``. It memory-maps the weights instead of unpickling them, so every
+worker shares one page-cache copy. Once every host has the artifact, set
+``ALLOW_PICKLE_WEIGHTS=0`` to stop the service from loading pickled
+checkpoints at all.
+"""
+import argparse
+import sys
+import time
+import traceback
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from config import BaseConfig  # noqa: E402
+from app.services import model_service, weights_artifact  # noqa: E402
+
+
+def _default_weights() -> Path:
+    for path in model_service._discover_with_suffix(BaseConfig.MODELS_DIR, ".pt", int8=False):
+        if path.exists():
+            return path
+    return BaseConfig.MODELS_DIR / "best (1).pt"
+
+
+def _detections(model, image: str):
+    results = model(image, conf=0.25, verbose=False)
+    xyxy, conf, cls = model_service.boxes_to_arrays(results[0])
+    return sorted(zip(cls.tolist(), conf.round(3).tolist(), xyxy.round(1).tolist()), key=lambda d: -d[1])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--weights", type=Path, default=None, help="source .pt checkpoint (default: discovered model)")
+    parser.add_argument("--out", type=Path, default=None, help="default: <stem>.safetensors next to --weights")
+    parser.add_argument("--verify", metavar="IMAGE", default=None, help="compare detections with the .pt model on IMAGE")
+    args = parser.parse_args()
+
+    if not model_service.yolo_available():
+        print("ultralytics is not available:", model_service.get_last_model_error())
+        return 1
+
+    weights = args.weights or _default_weights()
+    suffix = model_service.MODEL_BACKENDS[model_service.DEFAULT_BACKEND]["mmap_suffix"]
+    out = args.out or weights.with_suffix(suffix)
+    print("Loading checkpoint (unpickling):", weights)
+    try:
+        model = model_service.load_pytorch_weights(weights)
+    except Exception as e:
+        print("ERROR loading checkpoint:", e)
+        traceback.print_exc()
+        return 2
+
     try:
-        sd = model_obj.state_dict()
-        print('Obtained state_dict via model_obj.state_dict()')
+        size = weights_artifact.save_model(model, out)
     except Exception as e:
-        print('state_dict() failed:', e)
-        try:
-            sd = getattr(model_obj, 'model').state_dict()
-            print('Obtained state_dict via model_obj.model.state_dict()')
-        except Exception as e2:
-            print('model_obj.model.state_dict() failed:', e2)
-
-if sd is None:
-    print('Failed to extract state_dict from checkpoint model object')
-    sys.exit(3)
-
-print('Saving weights-only checkpoint to:', out)
-try:
-    torch.save({'model': sd}, out)
-    print('Saved', out)
-except Exception as e:
-    print('ERROR saving weights-only checkpoint:', e)
-    traceback.print_exc()
-    sys.exit(4)
-
-# Try loading the new weights-only file with YOLO
-print('Verifying YOLO can load the new weights-only file...')
-try:
-    from ultralytics import YOLO
-    m = YOLO(out)
-    print('YOLO loaded weights-only file successfully:', type(m))
-except Exception as e:
-    print('YOLO failed to load weights-only file:', e)
-    traceback.print_exc()
-    sys.exit(5)
-
-print('Conversion and verification complete')
+        print("ERROR writing artifact:", e)
+        traceback.print_exc()
+        return 3
+    print(f"Wrote {out} ({size / 1e6:.1f} MB)")
+
+    print("Verifying the artifact loads without pickle...")
+    try:
+        started = time.perf_counter()
+        mapped = weights_artifact.load_yolo(out, model_service.YOLO)
+        print(f"Loaded in {time.perf_counter() - started:.3f}s")
+    except Exception as e:
+        print("ERROR loading artifact:", e)
+        traceback.print_exc()
+        return 4
+
+    if args.verify:
+        reference = _detections(model, args.verify)
+        candidate = _detections(mapped, args.verify)
+        print(f".pt detections: {len(reference)}, artifact detections: {len(candidate)}")
+        for ref, cand in zip(reference, candidate):
+            print("  pt:", ref, "| artifact:", cand)
+        if reference != candidate:
+            print("[WARN] Detections differ beyond rounding - check the artifact before deploying it")
+
+    print("Done. load_model() now picks up", out.name)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
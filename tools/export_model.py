@@ -0,0 +1,100 @@
+"""Export the service's YOLO weights to an alternative inference backend.
+
+Usage (from the repository root):
+    python tools/export_model.py --format onnx
+    python tools/export_model.py --format openvino --weights "models/best (1).pt"
+    python tools/export_model.py --format onnx --weights "models/best (1).safetensors"
+    python tools/export_model.py --format torchscript --verify static/images/cod03.png
+
+The exported artifact is written next to the source weights (i.e. into
+``models/``) with the same stem, which is where ``load_model()`` looks for it
+once ``MODEL_BACKEND`` is set to the matching backend name. If the original
+checkpoint does not load, run ``tools/convert_ckpt.py`` first and pass the
+converted file with ``--weights``.
+"""
+import argparse
+import sys
+import traceback
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from config import BaseConfig  # noqa: E402
+from app.services import model_service  # noqa: E402
+
+
+def _default_weights() -> Path:
+    for path in model_service._discover_model_paths(BaseConfig.MODELS_DIR):
+        resolved = path if path.is_absolute() else (ROOT / path)
+        if resolved.exists():
+            return resolved
+    return BaseConfig.MODELS_DIR / "best (1).pt"
+
+
+def _detections(model, image: str, imgsz: int):
+    results = model(image, imgsz=imgsz, conf=0.25, verbose=False)
+    xyxy, conf, cls = model_service.boxes_to_arrays(results[0])
+    return sorted(zip(cls.tolist(), conf.round(3).tolist(), xyxy.round(1).tolist()), key=lambda d: -d[1])
+
+
+def main() -> int:
+    backends = [name for name, spec in model_service.MODEL_BACKENDS.items() if spec["export_format"]]
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--format", required=True, choices=backends, help="target backend")
+    parser.add_argument("--weights", type=Path, default=None, help="source .pt weights (default: discovered model)")
+    parser.add_argument("--imgsz", type=int, default=640, help="inference size baked into the export")
+    parser.add_argument("--half", action="store_true", help="export FP16 weights (OpenVINO/ONNX on supported hosts)")
+    parser.add_argument("--verify", metavar="IMAGE", default=None, help="compare detections with the .pt model on IMAGE")
+    args = parser.parse_args()
+
+    if not model_service.yolo_available():
+        print("ultralytics is not available:", model_service.get_last_model_error())
+        return 1
+
+    weights = args.weights or _default_weights()
+    print("Loading weights:", weights)
+    try:
+        model = model_service.load_pytorch_weights(weights)
+    except Exception as e:
+        print("ERROR loading weights:", e)
+        print("Hint: convert the checkpoint with tools/convert_ckpt.py and pass it with --weights")
+        traceback.print_exc()
+        return 2
+
+    spec = model_service.MODEL_BACKENDS[args.format]
+    export_kwargs = {"format": spec["export_format"], "imgsz": args.imgsz, "half": args.half}
+    if spec["batching"]:
+        # Dynamic batch axis so the service's micro-batcher can send several frames per call
+        export_kwargs["dynamic"] = True
+    print("Exporting with:", export_kwargs)
+    try:
+        exported = model.export(**export_kwargs)
+    except Exception as e:
+        print("ERROR exporting model:", e)
+        traceback.print_exc()
+        return 3
+    print("Exported artifact:", exported)
+
+    print("Verifying the exported artifact loads...")
+    try:
+        exported_model = model_service.YOLO(str(exported), task="detect")
+    except Exception as e:
+        print("ERROR loading exported artifact:", e)
+        traceback.print_exc()
+        return 4
+
+    if args.verify:
+        reference = _detections(model, args.verify, args.imgsz)
+        candidate = _detections(exported_model, args.verify, args.imgsz)
+        print(f"PyTorch detections:  {len(reference)}")
+        print(f"{args.format} detections: {len(candidate)}")
+        for ref, cand in zip(reference, candidate):
+            print("  pt:", ref, "|", args.format + ":", cand)
+
+    print(f"Done. Set MODEL_BACKEND={args.format} to serve this artifact.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
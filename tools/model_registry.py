@@ -0,0 +1,80 @@
+"""Inspect the model registry and edit its manifest.
+
+Usage (from the repository root):
+    python tools/model_registry.py list
+    python tools/model_registry.py promote camo v4
+    python tools/model_registry.py set-default camo
+
+Artifacts in MODELS_DIR named ``<name>@<version>`` are versions of one model.
+``promote`` makes a version current for its name and ``set-default`` picks the
+model that requests without ``model`` get. Both rewrite the manifest
+atomically, and running workers switch over within MODEL_REGISTRY_REFRESH_S.
+No weights are loaded.
+"""
+import argparse
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from config import BaseConfig  # noqa: E402
+from app.services import model_registry, model_service  # noqa: E402
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--models-dir", type=Path, default=BaseConfig.MODELS_DIR)
+    parser.add_argument("--backend", choices=tuple(model_service.MODEL_BACKENDS), default=BaseConfig.MODEL_BACKEND)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="models, versions and their artifacts")
+    promote = commands.add_parser("promote", help="make VERSION the current version of NAME")
+    promote.add_argument("name")
+    promote.add_argument("version")
+    set_default = commands.add_parser("set-default", help="serve SPEC (NAME or NAME@VERSION) when a request names no model")
+    set_default.add_argument("spec")
+    args = parser.parse_args()
+
+    registry = model_registry.ModelRegistry(
+        args.models_dir,
+        backend=args.backend if args.backend in model_service.MODEL_BACKENDS else model_service.DEFAULT_BACKEND,
+        manifest_name=BaseConfig.MODEL_REGISTRY_MANIFEST,
+        default_model=BaseConfig.DEFAULT_MODEL,
+    )
+    registry.refresh(force=True)
+    manifest = registry._read_manifest()
+
+    if args.command == "list":
+        described = registry.describe()
+        print(f"Manifest: {registry.manifest_path}{'' if registry.manifest_path.exists() else ' (not present)'}")
+        print("Default:", described["default"])
+        for model in described["models"]:
+            current = model["version"] is not None and described["current"].get(model["name"]) == model["version"]
+            print(f"  {model['key']}{'  (current)' if current else ''}")
+            for artifact in model["artifacts"]:
+                print(f"      {artifact['backend']:<12}{artifact['path']}")
+        return 0
+
+    if args.command == "promote":
+        key = model_registry.model_key(args.name, args.version)
+        try:
+            registry.resolve(key)
+        except model_registry.UnknownModelError as e:
+            print(e)
+            return 2
+        manifest["current"] = {**(manifest.get("current") or {}), args.name: args.version}
+    else:
+        try:
+            registry.resolve(args.spec)
+        except model_registry.UnknownModelError as e:
+            print(e)
+            return 2
+        manifest["default"] = args.spec
+
+    model_registry.write_manifest(registry.manifest_path, manifest)
+    print("Updated", registry.manifest_path)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+"""Compare reduced-precision inference modes against the fp32 model.
+
+Usage (from the repository root):
+    python tools/precision_report.py --images static/images
+    python tools/precision_report.py --images field_imagery/ --modes fp32 bf16 int8 --limit 50 --json report.json
+
+For every mode the same images are run through the model: fp32, fp16, bf16 and
+channels_last variants of the PyTorch weights, plus ``int8`` (the
+``<stem>_int8.onnx`` artifact from tools/quantize_model.py) and ``onnx`` (the
+fp32 export). The report shows per-image latency and weight size. It also shows
+how closely each mode reproduces the fp32 detections: same-class matches at
+IoU >= 0.5, their mean IoU and mean score difference.
+"""
+import argparse
+import itertools
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from config import BaseConfig  # noqa: E402
+from app.services import batch_inference, model_service  # noqa: E402
+from app.services.tiling import box_iou  # noqa: E402
+
+MODES = ("fp32", "fp32-cl", "fp16", "bf16", "bf16-cl", "onnx", "int8")
+
+
+def _default_weights() -> Path:
+    for path in model_service._discover_model_paths(BaseConfig.MODELS_DIR):
+        resolved = path if path.is_absolute() else (ROOT / path)
+        if resolved.exists():
+            return resolved
+    return BaseConfig.MODELS_DIR / "best (1).pt"
+
+
+def load_mode(mode: str, weights: Path):
+    """``(model, weight_bytes)`` for ``mode``, or raise if its artifact is missing."""
+    if mode in ("onnx", "int8"):
+        stem = weights.stem + (model_service.INT8_STEM_SUFFIX if mode == "int8" else "")
+        path = weights.with_name(stem + ".onnx")
+        if not path.exists():
+            raise FileNotFoundError(f"{path} not found")
+        return model_service.YOLO(str(path), task="detect"), path.stat().st_size
+
+    from app.services import precision
+
+    model = model_service.load_pytorch_weights(weights)
+    dtype_name, _, layout = mode.partition("-")
+    applied = precision.enable_reduced_precision(model, dtype_name, channels_last=layout == "cl")
+    if applied != dtype_name:
+        raise RuntimeError(f"{dtype_name} is not supported on this CPU")
+    weight_bytes = sum(p.numel() * p.element_size() for p in model.predictor.model.parameters())
+    return model, weight_bytes
+
+
+def run_mode(model, images, imgsz: int, conf: float, repeats: int):
+    outputs, latencies = [], []
+    model(images[0], imgsz=imgsz, conf=conf, verbose=False)  # warm-up
+    for img in images:
+        for i in range(repeats):
+            started = time.perf_counter()
+            results = model(img, imgsz=imgsz, conf=conf, verbose=False)
+            latencies.append((time.perf_counter() - started) * 1000.0)
+        outputs.append(model_service.boxes_to_arrays(results[0]))
+    return outputs, latencies
+
+
+def agreement(reference, candidate, iou_threshold: float = 0.5):
+    """Greedy same-class matching of ``candidate`` detections to the ``reference`` ones."""
+    np = model_service.np
+    ref_total = cand_total = matched = 0
+    ious, score_deltas = [], []
+    for (ref_xyxy, ref_scores, ref_cls), (xyxy, scores, cls) in zip(reference, candidate):
+        ref_total += len(ref_scores)
+        cand_total += len(scores)
+        used = set()
+        for i in np.argsort(-ref_scores):
+            if not len(scores):
+                break
+            overlap = box_iou(ref_xyxy[i].astype(np.float64), xyxy.astype(np.float64))
+            overlap[cls != ref_cls[i]] = 0.0
+            overlap[list(used)] = 0.0
+            j = int(overlap.argmax())
+            if overlap[j] >= iou_threshold:
+                used.add(j)
+                matched += 1
+                ious.append(float(overlap[j]))
+                score_deltas.append(abs(float(scores[j]) - float(ref_scores[i])))
+    return {
+        "recall": round(matched / ref_total, 4) if ref_total else 1.0,
+        "precision": round(matched / cand_total, 4) if cand_total else 1.0,
+        "mean_iou": round(statistics.fmean(ious), 4) if ious else None,
+        "mean_score_delta": round(statistics.fmean(score_deltas), 4) if score_deltas else None,
+        "detections": cand_total,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", nargs="+", type=Path, required=True, help="image directories/archives/files")
+    parser.add_argument("--weights", type=Path, default=None, help=".safetensors/.pt weights (default: discovered model)")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=["fp32", "bf16", "fp16", "int8"])
+    parser.add_argument("--limit", type=int, default=20, help="max images")
+    parser.add_argument("--repeats", type=int, default=3, help="timed runs per image")
+    parser.add_argument("--imgsz", type=int, default=BaseConfig.INFERENCE_IMGSZ)
+    parser.add_argument("--conf", type=float, default=0.25)
+    parser.add_argument("--json", type=Path, default=None, help="also write the report here")
+    args = parser.parse_args()
+
+    if not model_service.yolo_available():
+        print("ultralytics is not available:", model_service.get_last_model_error())
+        return 1
+    decoded = batch_inference.decode_pipeline(batch_inference.iter_sources(args.images))
+    images = [img for _, img, _ in itertools.islice((d for d in decoded if d[1] is not None), args.limit)]
+    if not images:
+        print("No images could be decoded from", ", ".join(map(str, args.images)))
+        return 1
+    weights = args.weights or _default_weights()
+    print(f"{len(images)} images, weights {weights}, imgsz={args.imgsz}")
+
+    baseline = None
+    report = {}
+    for mode in ["fp32"] + [m for m in args.modes if m != "fp32"]:
+        try:
+            model, weight_bytes = load_mode(mode, weights)
+        except Exception as e:
+            print(f"[WARN] Skipping {mode}: {e}")
+            report[mode] = {"error": str(e)}
+            continue
+        outputs, latencies = run_mode(model, images, args.imgsz, args.conf, args.repeats)
+        if baseline is None:
+            baseline = outputs
+        report[mode] = {
+            "latency_ms_mean": round(statistics.fmean(latencies), 2),
+            "latency_ms_p50": round(statistics.median(latencies), 2),
+            "weights_mb": round(weight_bytes / 1e6, 2),
+            **agreement(baseline, outputs),
+        }
+
+    print(f"\n{'mode':<9}{'mean ms':>9}{'p50 ms':>9}{'weights MB':>12}{'recall':>8}{'precision':>11}{'IoU':>7}{'dscore':>8}")
+    for mode, row in report.items():
+        if "error" in row:
+            print(f"{mode:<9}  skipped: {row['error']}")
+            continue
+        print(
+            f"{mode:<9}{row['latency_ms_mean']:>9}{row['latency_ms_p50']:>9}{row['weights_mb']:>12}"
+            f"{row['recall']:>8}{row['precision']:>11}{str(row['mean_iou']):>7}{str(row['mean_score_delta']):>8}"
+        )
+    if args.json:
+        args.json.write_text(json.dumps({"images": len(images), "imgsz": args.imgsz, "modes": report}, indent=2))
+        print("Report written to", args.json)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
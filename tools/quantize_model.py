@@ -0,0 +1,164 @@
+"""Statically quantize an exported ONNX model to INT8 for MODEL_PRECISION=int8.
+
+Usage (from the repository root):
+    python tools/export_model.py --format onnx
+    python tools/quantize_model.py --calib static/uploads --num 200
+    python tools/quantize_model.py --weights "models/best (1).onnx" --calib field_imagery.zip
+
+Activation ranges are calibrated on representative images (directories or
+archives, letterboxed the way the predictor feeds the model). The result is a
+QDQ model with per-channel INT8 weights, written next to the input as
+``<stem>_int8.onnx``. The service loads that file when ``MODEL_BACKEND=onnx`` and
+``MODEL_PRECISION=int8``. By default the Detect head's box decoding (DFL,
+concat, sigmoid) stays in fp32. Only its convolutions are quantized, because the
+box coordinates are the outputs most sensitive to quantization error. Compare
+the result with tools/precision_report.py before deploying it.
+"""
+import argparse
+import itertools
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from config import BaseConfig  # noqa: E402
+from app.services import batch_inference, model_service  # noqa: E402
+
+
+def _default_weights() -> Path:
+    for path in model_service._discover_model_paths(BaseConfig.MODELS_DIR, "onnx"):
+        if path.exists():
+            return path
+    return BaseConfig.MODELS_DIR / "best (1).onnx"
+
+
+def letterbox(img, size: int):
+    """Resize keeping aspect ratio, pad to ``size`` x ``size`` with grey 114, return a 1x3xHxW float32 RGB tensor."""
+    np, cv2 = model_service.np, model_service.cv2
+    h, w = img.shape[:2]
+    ratio = min(size / h, size / w)
+    new_w, new_h = int(round(w * ratio)), int(round(h * ratio))
+    if (new_w, new_h) != (w, h):
+        img = cv2.resize(img, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    canvas = np.full((size, size, 3), 114, dtype=np.uint8)
+    top, left = (size - new_h) // 2, (size - new_w) // 2
+    canvas[top:top + new_h, left:left + new_w] = img
+    return (canvas[:, :, ::-1].transpose(2, 0, 1)[None].astype(np.float32) / 255.0)
+
+
+def make_reader(input_name: str, sources, size: int, limit: int):
+    from onnxruntime.quantization import CalibrationDataReader
+
+    class LetterboxReader(CalibrationDataReader):
+        def __init__(self) -> None:
+            self.count = 0
+            decoded = batch_inference.decode_pipeline(sources, prefetch=8, workers=2)
+            self._images = itertools.islice((img for _, img, _ in decoded if img is not None), limit)
+
+        def get_next(self):
+            img = next(self._images, None)
+            if img is None:
+                return None
+            self.count += 1
+            if self.count % 25 == 0:
+                print(f"... calibrated on {self.count} images")
+            return {input_name: letterbox(img, size)}
+
+    return LetterboxReader()
+
+
+def head_nodes_to_exclude(graph) -> list:
+    """Box-decoding nodes between the Detect head's branch convolutions and the graph outputs.
+
+    Found by walking back from the outputs and stopping at convolutions, so it does
+    not depend on exporter node naming. The DFL's fixed 1-output-channel convolution
+    is part of the decoding and is walked through.
+    """
+    producers = {out: node for node in graph.node for out in node.output}
+    single_out = {
+        init.name for init in graph.initializer if len(init.dims) == 4 and init.dims[0] == 1
+    }
+    excluded, seen = [], set()
+    stack = [producers[o.name] for o in graph.output if o.name in producers]
+    while stack:
+        node = stack.pop()
+        if id(node) in seen:
+            continue
+        seen.add(id(node))
+        if node.op_type == "Conv" and not (len(node.input) > 1 and node.input[1] in single_out):
+            continue
+        excluded.append(node.name)
+        stack.extend(producers[i] for i in node.input if i in producers)
+    return excluded
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--weights", type=Path, default=None, help="fp32 .onnx model (default: discovered artifact)")
+    parser.add_argument("--calib", nargs="+", type=Path, required=True, help="calibration image directories/archives")
+    parser.add_argument("--num", type=int, default=200, help="max calibration images")
+    parser.add_argument("--imgsz", type=int, default=None, help="default: the model's static input size, else 640")
+    parser.add_argument("--out", type=Path, default=None, help="default: <stem>_int8.onnx next to --weights")
+    parser.add_argument("--no-per-channel", dest="per_channel", action="store_false", help="per-tensor weight scales")
+    parser.add_argument("--quantize-head", action="store_true", help="also quantize the Detect head's box decoding")
+    args = parser.parse_args()
+
+    try:
+        import onnx
+        from onnxruntime.quantization import CalibrationMethod, QuantFormat, QuantType, quantize_static
+    except ImportError as e:
+        print("onnx and onnxruntime are required:", e)
+        return 1
+
+    weights = args.weights or _default_weights()
+    if not weights.exists():
+        print("ONNX model not found:", weights)
+        print("Hint: export it first with tools/export_model.py --format onnx")
+        return 1
+    out = args.out or weights.with_name(weights.stem + model_service.INT8_STEM_SUFFIX + ".onnx")
+
+    model = onnx.load(str(weights))
+    model_input = model.graph.input[0]
+    dims = [d.dim_value for d in model_input.type.tensor_type.shape.dim]
+    imgsz = args.imgsz or (dims[2] if len(dims) == 4 and dims[2] > 0 else 640)
+    exclude = [] if args.quantize_head else head_nodes_to_exclude(model.graph)
+    print(f"Quantizing {weights} at imgsz={imgsz} ({len(exclude)} head nodes kept in fp32)")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = weights
+        try:
+            from onnxruntime.quantization.shape_inference import quant_pre_process
+
+            source = Path(tmp) / "preprocessed.onnx"
+            quant_pre_process(str(weights), str(source), skip_symbolic_shape=True)
+        except Exception as e:
+            print(f"[WARN] Pre-processing skipped ({e}); quantizing the model as exported")
+            source = weights
+
+        reader = make_reader(model_input.name, batch_inference.iter_sources(args.calib), imgsz, args.num)
+        quantize_static(
+            str(source),
+            str(out),
+            reader,
+            quant_format=QuantFormat.QDQ,
+            per_channel=args.per_channel,
+            weight_type=QuantType.QInt8,
+            activation_type=QuantType.QUInt8,
+            calibrate_method=CalibrationMethod.MinMax,
+            nodes_to_exclude=exclude,
+        )
+    if reader.count == 0:
+        out.unlink(missing_ok=True)
+        print("No calibration images could be decoded from", ", ".join(map(str, args.calib)))
+        return 1
+
+    print(f"Calibrated on {reader.count} images")
+    print(f"Wrote {out} ({out.stat().st_size / 1e6:.1f} MB, fp32 model {weights.stat().st_size / 1e6:.1f} MB)")
+    print("Serve it with MODEL_BACKEND=onnx MODEL_PRECISION=int8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+"""Measure cold-start time of the service in fresh interpreters.
+
+Usage (from the repository root):
+    python tools/startup_report.py
+    python tools/startup_report.py --runs 5 --with-model --json startup.json
+    python tools/startup_report.py --budget 1.0     # exit 1 if a cold boot to /api/status takes longer
+
+Every run starts a new Python process, because imports are cached per process.
+It times the stages a new worker goes through: importing the app, create_app(),
+the first ``GET /``, and the first ``GET /api/status``. With ``--with-model``
+it also times the first model load and the first ``/api/live_detect`` frame.
+The time to the first status response is checked against ``--budget``.
+Heavy dependencies are imported lazily, so the HTML and status stages should
+not import torch, ultralytics or OpenCV. The report lists any that were.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+HEAVY_MODULES = ("torch", "ultralytics", "cv2", "numpy", "PIL")
+
+# Runs in the child process; prints one JSON line with cumulative timings
+CHILD = r"""
+import json, sys, time
+t0 = time.perf_counter()
+marks = {}
+from app import create_app
+marks["import_app"] = time.perf_counter() - t0
+app = create_app()
+marks["create_app"] = time.perf_counter() - t0
+client = app.test_client()
+assert client.get("/").status_code == 200
+marks["first_html"] = time.perf_counter() - t0
+status = client.get("/api/status").get_json()
+marks["first_status"] = time.perf_counter() - t0
+heavy = [m for m in HEAVY if m in sys.modules]
+if WITH_MODEL:
+    from app.services import model_service
+    with app.app_context():
+        model = model_service.load_model()
+    marks["model_load"] = time.perf_counter() - t0
+    if model is not None:
+        import numpy as np, cv2
+        frame = cv2.imencode(".jpg", np.zeros((480, 640, 3), dtype=np.uint8))[1].tobytes()
+        client.post("/api/live_detect", data=frame, content_type="image/jpeg")
+        marks["first_frame"] = time.perf_counter() - t0
+print("STARTUP_REPORT " + json.dumps({"marks": marks, "heavy_modules_at_status": heavy, "startup": status.get("startup")}))
+"""
+
+
+def run_once(with_model: bool) -> dict:
+    code = f"HEAVY = {HEAVY_MODULES!r}\nWITH_MODEL = {with_model!r}\n" + CHILD
+    env = {**os.environ, "PRELOAD_MODEL": "0"}
+    proc = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True)
+    for line in proc.stdout.splitlines():
+        if line.startswith("STARTUP_REPORT "):
+            return json.loads(line[len("STARTUP_REPORT "):])
+    raise RuntimeError(f"child process failed (exit {proc.returncode}):\n{proc.stderr[-2000:]}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--with-model", action="store_true", help="also time the first model load and frame")
+    parser.add_argument("--budget", type=float, default=None, help="max seconds to the first /api/status response")
+    parser.add_argument("--json", type=Path, default=None, help="also write the report here")
+    args = parser.parse_args()
+
+    runs = []
+    for i in range(max(1, args.runs)):
+        try:
+            runs.append(run_once(args.with_model))
+        except RuntimeError as e:
+            print(f"[ERROR] Run {i + 1}: {e}")
+            return 2
+
+    stages = list(runs[0]["marks"])
+    summary = {
+        stage: {
+            "median_s": round(statistics.median(r["marks"][stage] for r in runs if stage in r["marks"]), 3),
+            "max_s": round(max(r["marks"][stage] for r in runs if stage in r["marks"]), 3),
+        }
+        for stage in stages
+    }
+    heavy = sorted({m for r in runs for m in r["heavy_modules_at_status"]})
+
+    print(f"{'stage (cumulative)':<20}{'median s':>10}{'max s':>10}")
+    for stage, row in summary.items():
+        print(f"{stage:<20}{row['median_s']:>10}{row['max_s']:>10}")
+    print("Heavy modules imported before the first status response:", ", ".join(heavy) or "none")
+
+    report = {"runs": len(runs), "stages": summary, "heavy_modules_at_status": heavy, "last_run": runs[-1]}
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+        print("Report written to", args.json)
+    if args.budget is not None and summary["first_status"]["max_s"] > args.budget:
+        print(f"Cold start to /api/status took {summary['first_status']['max_s']}s, over the {args.budget}s budget")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())